@@ -0,0 +1,202 @@
+import os
+import re
+import hashlib
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+ASSET_DIRS = ['img', 'resource']
+# 需要改写引用的文件类型
+REFERENCE_EXTENSIONS = {'.json', '.html', '.htm', '.css', '.js', '.md'}
+EXCLUDE_DIRS = {'img', 'resource', '.git', '.cache', '__pycache__', 'node_modules'}
+# 下载中的临时文件与静态服务器生成的预压缩副本，不算独立资源
+IGNORED_SUFFIXES = ('.part', '.br', '.gz')
+
+# 匹配 ./img/xxx、/img/xxx、img/xxx 以及 /resource/xxx 形式的引用
+REFERENCE_PATTERN = re.compile(
+    r'(?<![\w./-])(?P<prefix>\.?/)?(?P<dir>img|resource)/(?P<name>[^"\'\s()<>?#\\/`]+)')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """分块计算文件的 SHA-256，hashlib 在大块数据上会释放 GIL，可以多线程并行"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_name(digest, extension):
+    """内容寻址文件名：哈希前 32 位加小写扩展名"""
+    return f"{digest[:32]}{extension.lower()}"
+
+
+def store_file(src_path, folder):
+    """
+    将下载好的文件按内容哈希放入目录：同内容的文件已存在时直接丢弃新文件。
+    返回最终文件名
+    """
+    extension = os.path.splitext(src_path)[1]
+    filename = content_name(file_digest(src_path), extension)
+    final_path = os.path.join(folder, filename)
+    if os.path.exists(final_path):
+        os.remove(src_path)
+    else:
+        os.replace(src_path, final_path)
+    return filename
+
+
+def index_assets(root):
+    """列出资源目录下的文件（只看顶层，不进入 fontawesome 等子目录）"""
+    assets = []
+    for asset_dir in ASSET_DIRS:
+        folder = os.path.join(root, asset_dir)
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(IGNORED_SUFFIXES):
+                    assets.append((asset_dir, entry.name, entry.stat().st_size))
+    return assets
+
+
+def hash_assets(root, assets, workers=None, only_shared_sizes=True):
+    """
+    并行计算资源哈希。只查重时先按大小分组，大小唯一的文件不可能重复，无需读取
+    返回 {(目录, 文件名): 哈希}
+    """
+    if only_shared_sizes:
+        size_counts = {}
+        for _, _, size in assets:
+            size_counts[size] = size_counts.get(size, 0) + 1
+        assets = [a for a in assets if size_counts[a[2]] > 1]
+    paths = [os.path.join(root, asset_dir, name) for asset_dir, name, _ in assets]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        digests = list(executor.map(file_digest, paths))
+    return {(asset_dir, name): digest for (asset_dir, name, _), digest in zip(assets, digests)}
+
+
+def plan_renames(assets, digests, rename_all=False):
+    """
+    为每组相同内容的文件选出一个内容寻址的目标位置。
+    有成员在 img/ 时放在 img/，否则放在 resource/。返回 (改名映射, 节省字节数)
+    """
+    sizes = {(asset_dir, name): size for asset_dir, name, size in assets}
+    groups = {}
+    for key, digest in digests.items():
+        groups.setdefault(digest, []).append(key)
+
+    rename_map = {}
+    duplicates = 0
+    saved_bytes = 0
+    for digest, members in groups.items():
+        if len(members) == 1 and not rename_all:
+            continue
+        members.sort()
+        target_dir = 'img' if any(d == 'img' for d, _ in members) else 'resource'
+        # 优先保留有意义的扩展名，resource/ 中无法识别类型的文件才是 .dat
+        extensions = [os.path.splitext(name)[1] for _, name in members]
+        extension = next((e for e in extensions if e.lower() != '.dat'), extensions[0])
+        target = (target_dir, content_name(digest, extension))
+        for key in members:
+            if key != target:
+                rename_map[key] = target
+        duplicates += len(members) - 1
+        saved_bytes += sizes[members[0]] * (len(members) - 1)
+    return rename_map, duplicates, saved_bytes
+
+
+def find_reference_files(root, extensions=REFERENCE_EXTENSIONS):
+    """查找所有可能引用资源的文本文件"""
+    files = []
+    for current, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
+        for name in names:
+            if os.path.splitext(name)[1].lower() in extensions:
+                files.append(os.path.join(current, name))
+    return files
+
+
+def rewrite_references(root, rename_map, dry_run=False):
+    """一次扫描改写每个文件中的资源引用，保持原有的 ./、/ 前缀。返回 {文件: 替换次数}"""
+    changed = {}
+
+    for file_path in find_reference_files(root):
+        with open(file_path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            content = f.read()
+        count = 0
+
+        def substitute(match):
+            nonlocal count
+            target = rename_map.get((match.group('dir'), match.group('name')))
+            if target is None:
+                return match.group(0)
+            count += 1
+            return f"{match.group('prefix') or ''}{target[0]}/{target[1]}"
+
+        new_content = REFERENCE_PATTERN.sub(substitute, content)
+        if count:
+            changed[file_path] = count
+            if not dry_run:
+                with open(file_path, 'w', encoding='utf-8', errors='surrogateescape') as f:
+                    f.write(new_content)
+    return changed
+
+
+def apply_renames(root, rename_map):
+    """目标已存在时删除重复文件，否则改名为内容寻址的名字"""
+    for (src_dir, src_name), (dst_dir, dst_name) in sorted(rename_map.items()):
+        src_path = os.path.join(root, src_dir, src_name)
+        dst_path = os.path.join(root, dst_dir, dst_name)
+        if os.path.exists(dst_path):
+            os.remove(src_path)
+        else:
+            os.replace(src_path, dst_path)
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并 img/ 与 resource/ 中内容相同的资源')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    parser.add_argument('--all', action='store_true', help='把所有资源都改为内容哈希文件名')
+    parser.add_argument('--dry-run', action='store_true', help='只报告，不修改文件')
+    parser.add_argument('--workers', type=int, default=None, help='并行哈希线程数')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    assets = index_assets(args.root)
+    digests = hash_assets(args.root, assets, args.workers, only_shared_sizes=not args.all)
+    rename_map, duplicates, saved_bytes = plan_renames(assets, digests, rename_all=args.all)
+    print(f"共 {len(assets)} 个资源，计算了 {len(digests)} 个哈希，耗时 {time.perf_counter() - start:.2f}s")
+
+    if not rename_map:
+        print("没有发现重复资源")
+        return
+
+    for (src_dir, src_name), (dst_dir, dst_name) in sorted(rename_map.items()):
+        print(f"  {src_dir}/{src_name} -> {dst_dir}/{dst_name}")
+
+    changed = rewrite_references(args.root, rename_map, dry_run=args.dry_run)
+    if not args.dry_run:
+        apply_renames(args.root, rename_map)
+
+    print(f"\n{'(预览) ' if args.dry_run else ''}改名 {len(rename_map)} 个文件，其中 {duplicates} 个为重复文件")
+    print(f"改写了 {len(changed)} 个文件中的 {sum(changed.values())} 处引用")
+    print(f"节省空间: {format_size(saved_bytes)}")
+
+
+if __name__ == "__main__":
+    main()
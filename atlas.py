@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from manifest import Manifest, default_manifest_path
+from optimizeimg import Image, VARIANTS, WEBP_QUALITY, WEBP_METHOD, iter_item_records, variant_paths
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+ATLAS_DIR = os.path.join('img', 'atlas')
+ATLAS_VERSION = 1
+
+# 单张图集的最大尺寸，超出后另开一张
+SHEET_SIZE = 2048
+CELL_SIZE = VARIANTS['thumb']
+PADDING = 2
+
+POOL_PATTERNS = [
+    'pools/*/pool.json',
+    'XYZT/*/pool.json',
+    'JYXB/*/pool.json',
+]
+
+
+def find_pool_files(root):
+    files = []
+    for pattern in POOL_PATTERNS:
+        files.extend(sorted(glob.glob(os.path.join(root, pattern))))
+    return files
+
+
+def pool_members(pool_file):
+    """返回 ({物品名: img}, 图片列表)，同名不同图的物品以先出现的为准，图片仍会打包"""
+    with open(pool_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    names = {}
+    images = []
+    seen = set()
+    for record in iter_item_records(data):
+        img = record['img']
+        name = record.get('name')
+        if name and name not in names:
+            names[name] = img
+        if img not in seen:
+            seen.add(img)
+            images.append(img)
+    return names, sorted(images)
+
+
+def image_hash(root, img, manifest):
+    """借助清单缓存图片内容哈希，大小与修改时间不变时不读文件"""
+    path = os.path.join(root, img)
+    if manifest.is_clean(path):
+        return manifest.entries[manifest.key(path)]['hash']
+    with open(path, 'rb') as f:
+        data = f.read()
+    manifest.record(path, data, False)
+    return manifest.entries[manifest.key(path)]['hash']
+
+
+def atlas_signature(names, hashes):
+    """成员、图片内容与打包参数共同决定图集，任一变化才需要重建"""
+    digest = hashlib.sha1()
+    digest.update(f"{ATLAS_VERSION}|{SHEET_SIZE}|{CELL_SIZE}|{PADDING}\n".encode('utf-8'))
+    for img in sorted(hashes):
+        digest.update(f"{img}|{hashes[img]}\n".encode('utf-8'))
+    for name in sorted(names):
+        digest.update(f"{name}|{names[name]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def pack_shelves(sizes):
+    """
+    货架式装箱：按高度降序、图片路径升序排列，逐行放置，保证结果确定。
+    sizes 为 {img: (w, h)}，返回 ({img: [图集序号, x, y, w, h]}, [(图集宽, 图集高)])
+    """
+    order = sorted(sizes, key=lambda img: (-sizes[img][1], img))
+    placements = {}
+    sheets = []
+    sheet = x = y = shelf_height = width_used = 0
+    for img in order:
+        w, h = sizes[img]
+        if x + w > SHEET_SIZE:
+            # 换行
+            y += shelf_height + PADDING
+            x = shelf_height = 0
+        if y + h > SHEET_SIZE:
+            # 当前图集已满
+            sheets.append((width_used, y - PADDING))
+            sheet += 1
+            x = y = shelf_height = width_used = 0
+        placements[img] = [sheet, x, y, w, h]
+        x += w + PADDING
+        width_used = max(width_used, x - PADDING)
+        shelf_height = max(shelf_height, h)
+    if placements:
+        sheets.append((width_used, y + shelf_height))
+    return placements, sheets
+
+
+def load_thumbnail(root, img):
+    """优先使用 optimizeimg 生成的缩略图，没有时从原图缩放"""
+    thumb_path = os.path.join(root, variant_paths(img)['thumb']['png'])
+    path = thumb_path if os.path.exists(thumb_path) else os.path.join(root, img)
+    with Image.open(path) as image:
+        image = image.convert('RGBA')
+    image.thumbnail((CELL_SIZE, CELL_SIZE), Image.LANCZOS)
+    return image
+
+
+def sheet_paths(atlas_id, index):
+    base = f"./img/atlas/{atlas_id}-{index}"
+    return {'webp': base + '.webp', 'png': base + '.png'}
+
+
+def build_atlas(root, atlas_id, names, images, signature):
+    """在工作进程中生成一个池子的图集与坐标文件，返回 (池子, 图集数量, 错误信息或 None)"""
+    try:
+        thumbnails = {}
+        for img in images:
+            thumbnails[img] = load_thumbnail(root, img)
+        placements, sheets = pack_shelves({img: t.size for img, t in thumbnails.items()})
+
+        canvases = [Image.new('RGBA', size, (0, 0, 0, 0)) for size in sheets]
+        for img, (index, x, y, _, _) in placements.items():
+            canvases[index].paste(thumbnails[img], (x, y))
+
+        sheet_info = []
+        for index, canvas in enumerate(canvases):
+            paths = sheet_paths(atlas_id, index)
+            for fmt, path in paths.items():
+                full_path = os.path.join(root, path)
+                tmp_path = full_path + '.tmp'
+                if fmt == 'webp':
+                    canvas.save(tmp_path, format='WEBP', quality=WEBP_QUALITY, method=WEBP_METHOD)
+                else:
+                    canvas.save(tmp_path, format='PNG')
+                os.replace(tmp_path, full_path)
+            sheet_info.append({**paths, 'width': canvas.width, 'height': canvas.height})
+
+        coords = {
+            'version': ATLAS_VERSION,
+            'signature': signature,
+            'sheets': sheet_info,
+            # 图片路径 → [图集序号, x, y, 宽, 高]
+            'images': {img: placements[img] for img in sorted(placements)},
+            # 物品名 → 图片路径
+            'items': {name: names[name] for name in sorted(names)},
+        }
+        write_json(os.path.join(root, ATLAS_DIR, f"{atlas_id}.json"), coords)
+        remove_stale_sheets(root, atlas_id, len(canvases))
+        return atlas_id, len(canvases), None
+    except Exception as e:
+        return atlas_id, 0, str(e)
+
+
+def write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def remove_stale_sheets(root, atlas_id, count):
+    """成员减少后多出来的旧图集需要删除"""
+    index = count
+    while True:
+        paths = [os.path.join(root, p) for p in sheet_paths(atlas_id, index).values()]
+        existing = [p for p in paths if os.path.exists(p)]
+        if not existing:
+            break
+        for path in existing:
+            os.remove(path)
+        index += 1
+
+
+def is_up_to_date(root, atlas_id, signature):
+    try:
+        with open(os.path.join(root, ATLAS_DIR, f"{atlas_id}.json"), 'r', encoding='utf-8') as f:
+            coords = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    if coords.get('version') != ATLAS_VERSION or coords.get('signature') != signature:
+        return False
+    return all(os.path.exists(os.path.join(root, sheet[fmt]))
+               for sheet in coords.get('sheets', []) for fmt in ('webp', 'png'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把每个池子的物品缩略图打包成图集')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+    parser.add_argument('--full', action='store_true', help='忽略缓存，重建全部图集')
+    args = parser.parse_args()
+
+    if Image is None:
+        print("需要安装 Pillow: pip install Pillow")
+        return 1
+
+    start = time.perf_counter()
+    root = args.root
+    os.makedirs(os.path.join(root, ATLAS_DIR), exist_ok=True)
+    manifest = Manifest(default_manifest_path(root, 'atlas'), root)
+
+    jobs = []
+    skipped = 0
+    try:
+        for pool_file in find_pool_files(root):
+            atlas_id = os.path.basename(os.path.dirname(pool_file))
+            names, images = pool_members(pool_file)
+            images = [img for img in images if os.path.isfile(os.path.join(root, img))]
+            if not images:
+                continue
+            hashes = {img: image_hash(root, img, manifest) for img in images}
+            signature = atlas_signature(names, hashes)
+            if not args.full and is_up_to_date(root, atlas_id, signature):
+                skipped += 1
+                continue
+            jobs.append((atlas_id, names, images, signature))
+    finally:
+        manifest.save()
+    print(f"共 {len(jobs) + skipped} 个池子，需要重建 {len(jobs)} 个")
+
+    failed = []
+    if jobs:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(build_atlas, root, *job) for job in jobs]
+            for future in futures:
+                atlas_id, sheet_count, error = future.result()
+                if error:
+                    print(f"  ✗ {atlas_id}: {error}")
+                    failed.append(atlas_id)
+                else:
+                    print(f"  ✓ {atlas_id}: {sheet_count} 张图集")
+
+    print(f"\n重建 {len(jobs) - len(failed)} 个，跳过 {skipped} 个，失败 {len(failed)} 个，"
+          f"耗时 {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
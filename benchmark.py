@@ -0,0 +1,498 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import zlib
+import shutil
+import struct
+import random
+import hashlib
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from requests.adapters import HTTPAdapter
+
+import replace
+import replaceimg
+import jiusaiji
+from fetcher import Fetcher, get_fetcher
+from manifest import Manifest, default_manifest_path
+from poolrepo import PoolRepository
+
+try:
+    import engine
+except ImportError:  # 模拟阶段依赖 numpy，缺失时跳过
+    engine = None
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join('.cache', 'benchmarks')
+RESULTS_VERSION = 1
+# 写入结果文件，用于在结果目录中只挑出本脚本生成的文件
+RESULTS_GENERATOR = 'benchmark.py'
+DEFAULT_SCALES = (1, 10, 100)
+
+# 合成数据中的远程链接都指向这个主机，由 OriginAdapter 转发到本地假源站
+ORIGIN_HOST = 'cdn.bench.test'
+# 拼接而成：本文件也是 replace.py 扫描的文本文件，不能出现可被识别为资源的完整链接
+ORIGIN_URL = 'https://' + ORIGIN_HOST
+# 生成时从真实仓库复制的数据
+POOL_FOLDERS = ('pools', 'XYZT', 'JYXB')
+LIST_FILES = (os.path.join('more', 'list.json'), os.path.join('XYZT', 'list.json'),
+              os.path.join('JYXB', 'list.json'))
+COPY_FILES = ('types.json',)
+SEASON_POOL_PATTERN = re.compile(r'^S(\d+)(E\d+|Rank)$')
+LOCAL_IMAGE_PATTERN = re.compile(r'^\./img/([^/]+)$')
+# 模板中已有的外部链接全部改到假源站，基准测试不访问真实网络
+EXTERNAL_URL_PATTERN = re.compile(r'https?://(?!' + re.escape(ORIGIN_HOST) + r')(?=[\w.-]+/)')
+
+
+def to_origin(text):
+    """外部链接 host/path → 假源站 ORIGIN_URL/host/path"""
+    return EXTERNAL_URL_PATTERN.sub(ORIGIN_URL + '/', text)
+
+
+def synthetic_png(token):
+    """每个令牌对应唯一且完整的 1x1 PNG，内容不同才不会被按内容哈希合并"""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 6, 0, 0, 0))
+            + chunk(b'tEXt', b'bench\x00' + token.encode('utf-8'))
+            + chunk(b'IDAT', zlib.compress(b'\x00\x00\x00\x00\x00'))
+            + chunk(b'IEND', b''))
+
+
+class SyntheticTree:
+    """
+    以真实仓库为模板生成 N 倍规模的数据树：奖池按赛季号平移复制 N 轮，
+    图片按 (原图, 轮次) 生成不同文件，一部分物品图片换成假源站上的远程链接
+    """
+
+    def __init__(self, source_root, scale, remote_ratio=0.01, seed=0):
+        self.source_root = source_root
+        self.scale = scale
+        self.remote_ratio = remote_ratio
+        self.rng = random.Random(seed)
+        self.images = set()
+        self.remote_urls = set()
+        self.season_count = self._season_count()
+
+    def _season_count(self):
+        seasons = [int(m.group(1)) for m in
+                   (SEASON_POOL_PATTERN.match(name) for name in os.listdir(os.path.join(self.source_root, 'pools')))
+                   if m]
+        return max(seasons, default=0)
+
+    def pool_id(self, pool_id, cycle):
+        """第 cycle 轮的奖池 id：赛季池平移赛季号，其他池子加后缀"""
+        if cycle == 0:
+            return pool_id
+        match = SEASON_POOL_PATTERN.match(pool_id)
+        if match:
+            return f"S{int(match.group(1)) + self.season_count * cycle}{match.group(2)}"
+        return f"{pool_id}-{cycle}"
+
+    def image_name(self, name, cycle):
+        stem, ext = os.path.splitext(name)
+        if cycle == 0:
+            return name
+        return f"{hashlib.sha1(f'{stem}|{cycle}'.encode('utf-8')).hexdigest()[:31]}{ext}"
+
+    def remap(self, value, cycle, key=None):
+        """递归替换本地图片路径；物品的 img 字段按比例换成远程链接"""
+        if isinstance(value, dict):
+            return {k: self.remap(v, cycle, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.remap(v, cycle) for v in value]
+        if isinstance(value, str):
+            if value.startswith(('http://', 'https://')):
+                return to_origin(value)
+            match = LOCAL_IMAGE_PATTERN.match(value)
+            if match:
+                name = self.image_name(match.group(1), cycle)
+                if key == 'img' and self.rng.random() < self.remote_ratio:
+                    # 少量链接不带扩展名，触发下载脚本的 HEAD 请求
+                    stem = os.path.splitext(name)[0]
+                    url = f"{ORIGIN_URL}/img/{stem if self.rng.random() < 0.1 else name}"
+                    self.remote_urls.add(url)
+                    return url
+                self.images.add(name)
+                return f"./img/{name}"
+        return value
+
+    def write(self, dest, with_images=True):
+        """生成到 dest，返回规模统计"""
+        start = time.perf_counter()
+        pool_count = 0
+        for folder in POOL_FOLDERS:
+            for pool_dir in sorted(glob.glob(os.path.join(self.source_root, folder, '*', ''))):
+                pool_id = os.path.basename(os.path.dirname(pool_dir))
+                # 旧赛季合并池由 jiusaiji 阶段生成，只保留一份
+                cycles = 1 if pool_id == 'jiusaiji' else self.scale
+                for cycle in range(cycles):
+                    target = os.path.join(dest, folder, self.pool_id(pool_id, cycle))
+                    os.makedirs(target, exist_ok=True)
+                    for path in glob.glob(os.path.join(pool_dir, '*.json')):
+                        data = self.remap(read_json(path), cycle)
+                        write_json(os.path.join(target, os.path.basename(path)), data)
+                    pool_count += 1
+
+        for list_path in LIST_FILES:
+            entries = read_json(os.path.join(self.source_root, list_path), [])
+            output = [{**self.remap(entry, cycle), 'id': self.pool_id(entry['id'], cycle)}
+                      for cycle in range(self.scale) for entry in entries]
+            write_json(os.path.join(dest, list_path), output)
+
+        goods = read_json(os.path.join(self.source_root, 'store', 'goods.json'), [])
+        write_json(os.path.join(dest, 'store', 'goods.json'),
+                   [self.remap(g, cycle) for cycle in range(self.scale) for g in goods])
+
+        for name in COPY_FILES:
+            shutil.copy(os.path.join(self.source_root, name), os.path.join(dest, name))
+        # 页面文件参与文本扫描
+        for path in glob.glob(os.path.join(self.source_root, '*.html')):
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            with open(os.path.join(dest, os.path.basename(path)), 'w', encoding='utf-8') as f:
+                f.write(to_origin(content))
+
+        img_dir = os.path.join(dest, 'img')
+        os.makedirs(img_dir, exist_ok=True)
+        if with_images:
+            for name in self.images:
+                with open(os.path.join(img_dir, name), 'wb') as f:
+                    f.write(synthetic_png(name))
+        return {
+            'pools': pool_count,
+            'images': len(self.images) if with_images else 0,
+            'remoteUrls': len(self.remote_urls),
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    """假源站：任意路径都返回由路径决定的 PNG，支持 HEAD 与 If-None-Match"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头与正文一次写出，避免小包与延迟确认叠加出的几十毫秒等待
+    wbufsize = 64 * 1024
+
+    def _respond(self, include_body):
+        self.server.count(self.command)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = synthetic_png(self.path)
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.count('notModified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+            self.server.count('bytes', len(body))
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOrigin(ThreadingHTTPServer):
+    """在后台线程运行的本地源站，统计各类请求次数"""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), OriginHandler)
+        self.latency = latency
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def take_counts(self):
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class OriginAdapter(HTTPAdapter):
+    """把发往 ORIGIN_URL 的请求改发到本地假源站，下载代码无需任何改动"""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace(ORIGIN_URL, self.base_url, 1)
+        return super().send(request, **kwargs)
+
+
+def route_to_origin(fetcher, origin):
+    fetcher.session.mount(ORIGIN_URL + '/', OriginAdapter(origin.base_url))
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+@contextlib.contextmanager
+def quiet():
+    """被测脚本逐文件打印进度，计时时丢弃输出"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def timed(stages, name, func, *args):
+    start = time.perf_counter()
+    with quiet():
+        result = func(*args)
+    stages[name] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def stage_scan(root):
+    """replace.py 的阶段一：遍历、分类并在全部文件中查找链接"""
+    json_files, text_files, _ = replace.classify_files(replace.find_all_files(root))
+    return sum(len(replace.scan_file_urls(path)[1]) for path in json_files + text_files)
+
+
+def stage_parse(root):
+    """通过 PoolRepository 加载全部奖池与商店"""
+    repo = PoolRepository(root)
+    count = sum(len(pool.items) for pool in repo.all_pools())
+    return count + len(repo.store_items())
+
+
+def stage_replace(root, fetcher):
+    manifest = Manifest(default_manifest_path(root, 'replace'), root)
+    try:
+        return asyncio.run(replace.run_pipeline(root, os.path.join(root, 'resource'), fetcher,
+                                                manifest=manifest))
+    finally:
+        manifest.save()
+
+
+def stage_replaceimg(root):
+    manifest = Manifest(default_manifest_path(root, 'replaceimg'), root)
+    img_folder = os.path.join(root, 'img')
+    try:
+        return [replaceimg.process_json_file(path, img_folder, manifest)
+                for path in replaceimg.find_all_json_files(root)]
+    finally:
+        manifest.save()
+
+
+def largest_season_pool(root):
+    repo = PoolRepository(root)
+    return max((p for p in repo.pools('pools') if SEASON_POOL_PATTERN.match(p.id)),
+               key=lambda p: len(p.items)).id
+
+
+def stage_simulate(root, pool_id, players, seed):
+    """模拟所有玩家抽到稀世为止"""
+    model = engine.load_pool(pool_id, root)
+    pulls, _ = engine.Engine(model, players, seed=seed).run_until('S')
+    return int(pulls.sum())
+
+
+def run_scale(source_root, work_root, scale, args):
+    """生成一个规模的数据树并依次计时各阶段，返回 {'counts', 'stages', 'origin'}"""
+    stages = {}
+    counts = {}
+    tree_root = os.path.join(work_root, f"x{scale}")
+    tree = SyntheticTree(source_root, scale, args.remote_ratio, args.seed)
+    # 生成耗时只记录在 counts 中，不参与退化对比
+    counts['tree'] = tree.write(tree_root)
+
+    counts['urls'] = timed(stages, 'scan', stage_scan, tree_root)
+    counts['items'] = timed(stages, 'parse', stage_parse, tree_root)
+
+    origin_counts = {}
+    with FakeOrigin(args.latency / 1000) as origin:
+        fetcher = Fetcher(concurrency=args.concurrency, per_host=args.concurrency)
+        route_to_origin(fetcher, origin)
+        try:
+            timed(stages, 'replace_cold', stage_replace, tree_root, fetcher)
+            origin_counts['replace_cold'] = origin.take_counts()
+            timed(stages, 'replace_warm', stage_replace, tree_root, fetcher)
+            origin_counts['replace_warm'] = origin.take_counts()
+        finally:
+            fetcher.close()
+
+        # replaceimg 需要仍含远程链接的数据，另外生成一份不带图片的树
+        img_root = os.path.join(work_root, f"x{scale}-replaceimg")
+        SyntheticTree(source_root, scale, args.remote_ratio, args.seed).write(img_root, with_images=False)
+        route_to_origin(get_fetcher(), origin)
+        timed(stages, 'replaceimg_cold', stage_replaceimg, img_root)
+        origin_counts['replaceimg_cold'] = origin.take_counts()
+        timed(stages, 'replaceimg_warm', stage_replaceimg, img_root)
+        origin_counts['replaceimg_warm'] = origin.take_counts()
+        shutil.rmtree(img_root, ignore_errors=True)
+
+    result = timed(stages, 'merge_cold', jiusaiji.rebuild, tree_root)
+    counts['mergedItems'] = sum(result['counts'].values())
+    timed(stages, 'merge_warm', jiusaiji.rebuild, tree_root)
+
+    if engine is not None:
+        counts['simulatedPulls'] = timed(stages, 'simulate', stage_simulate, tree_root,
+                                         largest_season_pool(tree_root), args.players, args.seed)
+    if not args.keep:
+        shutil.rmtree(tree_root, ignore_errors=True)
+    return {'counts': counts, 'stages': stages, 'origin': origin_counts}
+
+
+def latest_result(results_dir, exclude=None):
+    paths = sorted(p for p in glob.glob(os.path.join(results_dir, '*.json')) if p != exclude)
+    for path in reversed(paths):
+        data = read_json(path, {})
+        if (isinstance(data, dict) and data.get('generator') == RESULTS_GENERATOR
+                and data.get('version') == RESULTS_VERSION):
+            return path
+    return None
+
+
+def compare(current, previous, threshold, min_delta=0.05):
+    """
+    逐阶段对比两次结果，只比较两次都有的项。返回 (退化项, 全部项)，每项为 (规模, 阶段, 之前, 现在, 倍数)。
+    变慢不足 min_delta 秒的视为计时噪声
+    """
+    rows = []
+    for scale, result in current['scales'].items():
+        old = previous.get('scales', {}).get(scale)
+        if not old:
+            continue
+        for stage, seconds in result['stages'].items():
+            before = old['stages'].get(stage)
+            if before:
+                rows.append((scale, stage, before, seconds, seconds / before))
+    return [row for row in rows if row[4] >= threshold and row[3] - row[2] >= min_delta], rows
+
+
+def git_revision(root):
+    head_path = os.path.join(root, '.git', 'HEAD')
+    try:
+        with open(head_path, 'r', encoding='utf-8') as f:
+            head = f.read().strip()
+        if head.startswith('ref: '):
+            with open(os.path.join(root, '.git', head[5:]), 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        return head
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在 1×/10×/100× 的合成数据树上测量各脚本的耗时')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='作为模板的项目根目录')
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help='逗号分隔的规模倍数')
+    parser.add_argument('--remote-ratio', type=float, default=0.01, help='物品图片换成远程链接的比例')
+    parser.add_argument('--latency', type=float, default=0.0, help='假源站每个请求的延迟（毫秒）')
+    parser.add_argument('--concurrency', type=int, default=16, help='下载并发数')
+    parser.add_argument('--players', type=int, default=10000, help='模拟阶段的玩家数')
+    parser.add_argument('--seed', type=int, default=0, help='生成与模拟的随机种子')
+    parser.add_argument('--workdir', default=None, help='合成数据树的位置，默认为临时目录')
+    parser.add_argument('--keep', action='store_true', help='保留生成的数据树')
+    parser.add_argument('--output', default=None, help=f'结果文件，默认写入 {RESULTS_DIR}/')
+    parser.add_argument('--compare', default=None, help='对比的历史结果，默认为上一次的结果')
+    parser.add_argument('--threshold', type=float, default=1.2, help='慢于该倍数视为退化')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='变慢不足该秒数时忽略')
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(',') if s.strip()]
+    work_root = args.workdir or tempfile.mkdtemp(prefix='bench-')
+    os.makedirs(work_root, exist_ok=True)
+
+    report = {
+        'generator': RESULTS_GENERATOR,
+        'version': RESULTS_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(args.root),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {'remoteRatio': args.remote_ratio, 'latencyMs': args.latency,
+                     'concurrency': args.concurrency, 'players': args.players, 'seed': args.seed},
+        'scales': {},
+    }
+    try:
+        for scale in scales:
+            print(f"规模 {scale}×")
+            result = run_scale(args.root, work_root, scale, args)
+            report['scales'][str(scale)] = result
+            tree = result['counts']['tree']
+            print(f"  {tree['pools']} 个奖池，{tree['images']} 张图片，{tree['remoteUrls']} 个远程链接")
+            for stage, seconds in result['stages'].items():
+                print(f"  {stage:<16} {seconds:>9.3f}s")
+    finally:
+        if not args.workdir and not args.keep:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    output = args.output or os.path.join(args.root, RESULTS_DIR,
+                                         f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    previous_path = args.compare or latest_result(os.path.dirname(output), exclude=output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+    if previous_path:
+        previous = read_json(previous_path, {})
+        regressions, rows = compare(report, previous, args.threshold, args.min_delta)
+        print(f"与 {previous_path} 对比了 {len(rows)} 项")
+        for scale, stage, before, after, ratio in regressions:
+            print(f"  ⚠ {scale}× {stage}: {before:.3f}s → {after:.3f}s ({ratio:.2f}×)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
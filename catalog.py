@@ -0,0 +1,209 @@
+import os
+import re
+import sys
+import json
+import gzip
+import glob
+import hashlib
+import argparse
+
+from poolrepo import get_repository
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只生成 .gz
+    brotli = None
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+CATALOG_VERSION = 1
+CATALOG_DIR = 'more'
+CATALOG_PREFIX = 'catalog.'
+# 带内容哈希的目录文件，相对于根目录
+CATALOG_GLOB = f"{CATALOG_DIR}/{CATALOG_PREFIX}*.json"
+INDEX_FILE = 'index.html'
+# index.html 中指向当前目录文件的常量，构建时改写
+CATALOG_URL_PATTERN = re.compile(r"(const CATALOG_URL = ')[^']*(';)")
+
+OLD_SEASON_MARKER = '珍宝·旧赛季'
+STORE_SOURCE = '商店'
+
+
+def item_key(item):
+    """与 index.html 相同：name、img、type、rarity 都相同才算同一物品"""
+    return f"{item['name']}|{item['img']}|{item['type']}|{item['rarity']}"
+
+
+class CatalogBuilder:
+    """按 index.html 加载顺序合并所有物品，记录每个物品的来源"""
+
+    def __init__(self):
+        self.sources = []
+        self.source_ids = {}
+        self.items = {}
+        self.item_sources = {}
+
+    def source(self, name, kind, source_id=None):
+        key = (name, kind)
+        if key not in self.source_ids:
+            self.source_ids[key] = len(self.sources)
+            entry = {'name': name, 'kind': kind}
+            if source_id is not None:
+                entry['id'] = source_id
+            self.sources.append(entry)
+        return self.source_ids[key]
+
+    def add(self, item, rarity, source, first=False):
+        """
+        添加物品并记录来源。first 对应前端的 unshift：普通池子的来源排在旧赛季池子前面
+        """
+        record = dict(item)
+        record['name'] = (item.get('name') or '').strip()
+        record['img'] = (item.get('img') or '').strip()
+        record['type'] = (item.get('type') or '').strip()
+        record['rarity'] = (item.get('rarity') or rarity).strip()
+        key = item_key(record)
+        if key not in self.items:
+            self.items[key] = record
+            self.item_sources[key] = []
+        sources = self.item_sources[key]
+        if source in sources:
+            return
+        if first:
+            sources.insert(0, source)
+        else:
+            sources.append(source)
+
+    def to_dict(self, essence_list, types):
+        items = []
+        for key, record in self.items.items():
+            items.append({**record, 'sources': self.item_sources[key]})
+        return {
+            'version': CATALOG_VERSION,
+            'list': essence_list,
+            'types': types,
+            'sources': self.sources,
+            'items': items,
+        }
+
+
+def build_catalog(root):
+    """合并精华池、商店、鉴影寻宝与幸运之骰的物品数据"""
+    builder = CatalogBuilder()
+    repo = get_repository(root)
+    essence_list = repo.entries('pools')
+    types = repo.read_json('types.json')
+
+    for pool in essence_list:
+        if not os.path.exists(os.path.join(root, 'pools', pool['id'], 'pool.json')):
+            print(f"  跳过缺失的卡池: {pool['id']}")
+            continue
+        loaded = repo.get(pool['id'])
+        source = builder.source(pool['name'], 'pool', pool['id'])
+        first = OLD_SEASON_MARKER not in pool['name']
+        for item in loaded.items:
+            builder.add(item.to_dict(), item.rarity, source, first)
+        if loaded.frame_item is not None:
+            builder.add(loaded.frame_item.to_dict(), 'F', builder.source(STORE_SOURCE, 'store'))
+
+    store_items = repo.store_items()
+    if store_items:
+        store_source = builder.source(STORE_SOURCE, 'store')
+        for item in store_items:
+            # 商店商品只保留展示需要的字段，默认 B 级
+            builder.add({
+                'name': item.get('name'),
+                'img': item.get('img'),
+                'type': item.get('type'),
+                'rarity': item.rarity,
+                'description': item.get('description') or '商店商品',
+            }, 'B', store_source)
+
+    for kind, source_name in (('jyxb', '鉴影寻宝{id}'), ('xyzt', '{name}')):
+        for pool in repo.pools(kind):
+            source = builder.source(source_name.format(**pool.entry), kind, pool.id)
+            for item in pool.items:
+                builder.add(item.to_dict(), item.rarity, source)
+
+    return builder.to_dict(essence_list, types)
+
+
+def encode_catalog(catalog):
+    """紧凑且确定的序列化，相同数据总是得到相同字节与哈希"""
+    return json.dumps(catalog, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def catalog_filename(data):
+    return f"{CATALOG_PREFIX}{hashlib.sha256(data).hexdigest()[:12]}.json"
+
+
+def write_if_changed(path, data):
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_bundle(root, data):
+    """写入带内容哈希的目录文件及预压缩版本，删除旧版本。返回文件名"""
+    folder = os.path.join(root, CATALOG_DIR)
+    filename = catalog_filename(data)
+    path = os.path.join(folder, filename)
+    write_if_changed(path, data)
+    # mtime=0 保证 gzip 输出确定
+    write_if_changed(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_if_changed(path + '.br', brotli.compress(data, quality=11))
+
+    keep = {filename, filename + '.gz', filename + '.br'}
+    for old_path in glob.glob(os.path.join(folder, f"{CATALOG_PREFIX}*.json*")):
+        if os.path.basename(old_path) not in keep:
+            os.remove(old_path)
+    return filename
+
+
+def update_index(root, filename):
+    """把 index.html 中的 CATALOG_URL 指向新文件，返回是否有修改"""
+    index_path = os.path.join(root, INDEX_FILE)
+    with open(index_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    new_content, count = CATALOG_URL_PATTERN.subn(
+        lambda m: f"{m.group(1)}/{CATALOG_DIR}/{filename}{m.group(2)}", content, count=1)
+    if count == 0:
+        print(f"  警告: {INDEX_FILE} 中没有找到 CATALOG_URL")
+        return False
+    return write_if_changed(index_path, new_content.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把所有卡池与商店物品编译成一个可长期缓存的目录文件')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.root)
+    data = encode_catalog(catalog)
+    filename = write_bundle(args.root, data)
+    index_changed = update_index(args.root, filename)
+
+    sizes = [len(data)]
+    print(f"物品: {len(catalog['items'])} 个，来源: {len(catalog['sources'])} 个")
+    for suffix in ('.gz', '.br'):
+        path = os.path.join(args.root, CATALOG_DIR, filename + suffix)
+        if os.path.exists(path):
+            sizes.append(os.path.getsize(path))
+    print(f"输出: {CATALOG_DIR}/{filename} ({' / '.join(f'{s // 1024} KB' for s in sizes)})")
+    if brotli is None:
+        print("  未安装 brotli，跳过 .br（pip install brotli）")
+    print(f"index.html: {'已更新' if index_changed else '无变化'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import zlib
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from engine import RARITIES, RARITY_INDEX, Engine, get_item_key, load_pool, summarize
+from sampler import OwnedSet
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'more', 'collection.json')
+
+DEFAULT_PLAYERS = 2000
+# 每个任务模拟的玩家数；任务划分只取决于玩家数，与进程数无关
+CHUNK_SIZE = 500
+DEFAULT_SEED = 0
+MAX_SESSIONS = 200000
+PERCENTILES = (50, 90, 99)
+
+
+class CollectionEngine(Engine):
+    """
+    在 Engine 的基础上记录每个玩家拥有的全部物品（按 getItemKey 区分）与重复获得的碎片，
+    直到集齐奖池中的所有物品。奇珍仍由 Engine 按 diff_A 规则挑选，其余品质在池内等概率抽取
+    """
+
+    def __init__(self, model, n_players, seed=None):
+        super().__init__(model, n_players, seed)
+        self.fragments = np.zeros(n_players, dtype=np.int64)
+        self.a_repeat = np.array([item.get('repeat') or 0 for item in model.items['A']], dtype=np.int64)
+
+        # 其余品质：(稀有度编号, 物品 → 标识编号, 物品的碎片数)，拥有状态按稀有度分开保存
+        self.collectors = []
+        self.owned = {}
+        for rarity in RARITIES:
+            items = model.items[rarity]
+            if rarity == 'A' or not items or (rarity == 'S' and not model.has_gold):
+                continue
+            keys = {}
+            key_ids = np.array([keys.setdefault(get_item_key(item), len(keys)) for item in items],
+                               dtype=np.int64)
+            repeat = np.array([item.get('repeat') or 0 for item in items], dtype=np.int64)
+            self.collectors.append((RARITY_INDEX[rarity], key_ids, repeat))
+            self.owned[rarity] = OwnedSet(n_players, len(keys))
+        self.item_count = len(model.a_keys) + sum(owned.n_keys for owned in self.owned.values())
+
+    def compress(self, keep):
+        super().compress(keep)
+        self.fragments = self.fragments[keep]
+        for owned in self.owned.values():
+            owned.take(keep)
+
+    def _select_a(self, got_a):
+        players, chosen, repeat = super()._select_a(got_a)
+        self.fragments[players[repeat]] += self.a_repeat[chosen[repeat]]
+        return players, chosen, repeat
+
+    def session(self, count=10):
+        results = super().session(count)
+        # 非奇珍物品的挑选不影响抽取过程，按抽取顺序补记即可正确判断重复
+        for r in results:
+            for (rarity, key_ids, repeat), owned in zip(self.collectors, self.owned.values()):
+                players = np.flatnonzero(r == rarity)
+                if len(players) == 0:
+                    continue
+                chosen = (self.rng.random(len(players)) * len(key_ids)).astype(np.int64)
+                duplicate = owned.add(players, key_ids[chosen])
+                self.fragments[players[duplicate]] += repeat[chosen[duplicate]]
+        return results
+
+    def complete(self):
+        done = self.owned_a.complete()
+        for owned in self.owned.values():
+            done &= owned.complete()
+        return done
+
+    def run_collection(self, count=10, max_sessions=MAX_SESSIONS):
+        """持续抽取直到每名玩家集齐全部物品，返回 (抽数, 花费, 碎片)；集齐时所在的十连照常付费"""
+        n_total = self.n
+        pulls = np.zeros(n_total, dtype=np.int64)
+        spent = np.zeros(n_total, dtype=np.int64)
+        fragments = np.zeros(n_total, dtype=np.int64)
+        for _ in range(max_sessions):
+            if self.n == 0:
+                break
+            self.session(count)
+            done = self.complete()
+            if done.any():
+                ids = self.player_ids[done]
+                pulls[ids] = self.total[done]
+                spent[ids] = self.spent[done]
+                fragments[ids] = self.fragments[done]
+                self.compress(~done)
+        if self.n:
+            raise RuntimeError(f"{self.n} 名玩家在 {max_sessions} 次抽取内未集齐")
+        return pulls, spent, fragments
+
+
+def chunk_seed(master_seed, pool_id, chunk):
+    """
+    每个 (奖池, 分块) 一条独立的随机数流，只由主种子、奖池 ID 与分块序号决定，
+    与进程数、任务完成顺序以及列表中其他奖池的增删无关
+    """
+    return np.random.SeedSequence(master_seed, spawn_key=(zlib.crc32(pool_id.encode('utf-8')), chunk))
+
+
+def simulate_chunk(root, pool_id, players, master_seed, chunk):
+    """进程池任务：模拟一个分块的玩家"""
+    model = load_pool(pool_id, root)
+    engine = CollectionEngine(model, players, seed=chunk_seed(master_seed, pool_id, chunk))
+    pulls, spent, fragments = engine.run_collection()
+    return pool_id, chunk, engine.item_count, pulls, spent, fragments
+
+
+def find_pools(root, only=None):
+    """more/list.json 中的 V1 精华池；V2 排位珍宝共享保底，单池全收集没有意义"""
+    with open(os.path.join(root, 'more', 'list.json'), 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    pools, skipped = [], []
+    for entry in entries:
+        if only and entry['id'] not in only:
+            continue
+        if (entry.get('version') or 'V1.html') == 'V1.html':
+            pools.append(entry)
+        else:
+            skipped.append(entry['id'])
+    return pools, skipped
+
+
+def rounded_summary(values, digits=1):
+    return {key: round(value, digits) for key, value in summarize(values, PERCENTILES).items()}
+
+
+def build_table(root=PROJECT_ROOT, players=DEFAULT_PLAYERS, seed=DEFAULT_SEED, workers=None,
+                only=None, chunk_size=CHUNK_SIZE, verbose=True):
+    pools, skipped = find_pools(root, only)
+    tasks = []
+    for entry in pools:
+        for chunk, start in enumerate(range(0, players, chunk_size)):
+            tasks.append((root, entry['id'], min(chunk_size, players - start), seed, chunk))
+
+    chunks = {}
+    item_counts = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(simulate_chunk, *task) for task in tasks]
+        remaining = {entry['id']: -(-players // chunk_size) for entry in pools}
+        for future in as_completed(futures):
+            pool_id, chunk, item_count, *arrays = future.result()
+            chunks[(pool_id, chunk)] = arrays
+            item_counts[pool_id] = item_count
+            remaining[pool_id] -= 1
+            if verbose and remaining[pool_id] == 0:
+                print(f"  ✓ {pool_id}")
+
+    table = {}
+    for entry in pools:
+        pool_id = entry['id']
+        # 按分块序号拼接，结果与完成顺序无关
+        parts = [chunks[(pool_id, chunk)] for chunk in range(-(-players // chunk_size))]
+        pulls, spent, fragments = (np.concatenate(values) for values in zip(*parts))
+        table[f"pools/{pool_id}"] = {
+            'cost_type': entry.get('cost_type') or 'inspiration',
+            'items': item_counts[pool_id],
+            'pulls': rounded_summary(pulls),
+            'spent': rounded_summary(spent),
+            'fragments': rounded_summary(fragments),
+        }
+    return {
+        'comment': '十连抽取直到集齐奖池全部物品的抽数、花费与重复物品转换的碎片。',
+        'seed': seed,
+        'players': players,
+        'percentiles': list(PERCENTILES),
+        'pools': table,
+        'skipped': skipped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程模拟每个精华池集齐全部物品的花费')
+    parser.add_argument('pools', nargs='*', help='只模拟这些奖池 ID，默认为 more/list.json 中的全部 V1 奖池')
+    parser.add_argument('--players', type=int, default=DEFAULT_PLAYERS, help='每个奖池模拟的玩家数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='主随机种子')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='输出 JSON 路径')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build_table(PROJECT_ROOT, args.players, args.seed, args.workers, set(args.pools) or None)
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"已模拟 {len(table['pools'])} 个奖池，每池 {args.players} 名玩家，耗时 {elapsed:.1f}s")
+    if table['skipped']:
+        print(f"跳过 {len(table['skipped'])} 个共享保底的 V2 奖池")
+    print(f"输出文件: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
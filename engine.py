@@ -0,0 +1,316 @@
+import os
+import json
+import argparse
+import time
+
+import numpy as np
+
+from sampler import ExcludingSampler, OwnedSet, UnownedSampler
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+LIST_JSON_PATH = os.path.join(PROJECT_ROOT, 'more', 'list.json')
+
+# 与 V1.html 保持一致的稀有度编号
+RARITIES = ['S', 'A', 'B', 'C', 'D']
+RARITY_INDEX = {r: i for i, r in enumerate(RARITIES)}
+S, A, B, C, D = range(5)
+
+DEFAULT_PULL_COST = 96
+DEFAULT_COST_TYPE = 'inspiration'
+
+
+def get_item_key(item):
+    """生成物品唯一标识符，与 V1.html 的 getItemKey 一致"""
+    return f"{item.get('name')}|{item.get('type')}|{item.get('img') or ''}"
+
+
+def load_list_entry(pool_id, list_path=LIST_JSON_PATH):
+    """从 more/list.json 中读取精华的成本信息"""
+    try:
+        with open(list_path, 'r', encoding='utf-8') as f:
+            list_data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    for entry in list_data:
+        if entry.get('id') == pool_id:
+            return entry
+    return {}
+
+
+class PoolModel:
+    """单个精华池的模拟参数，加载方式与 EssenceApp.init 相同"""
+
+    def __init__(self, pool_id, config, probabilities, pull_cost=DEFAULT_PULL_COST,
+                 cost_type=DEFAULT_COST_TYPE):
+        self.pool_id = pool_id
+        self.config = config
+        self.probabilities = probabilities
+        self.pull_cost = pull_cost
+        self.cost_type = cost_type
+
+        self.diff_A = config.get('diff_A', 2)
+        pity = config.get('pitySettings', {})
+        self.pity_gold = pity.get('gold', 250)
+        self.pity_purple = pity.get('purple', 60)
+        self.pity_blue = pity.get('blue', 10)
+        self.discounts = [(d.get('rate', 1.0), d.get('chance', 0.0))
+                          for d in config.get('discounts') or []]
+
+        # 概率数组：索引为保底计数-1，超出长度时取最后一个值
+        self.hazard_S = np.asarray(probabilities.get('S') or [0.0], dtype=np.float64)
+        self.hazard_A = np.asarray(probabilities.get('A') or [0.0], dtype=np.float64)
+        self.hazard_B = np.asarray(probabilities.get('B') or [0.0], dtype=np.float64)
+        c_chance = probabilities.get('C_chance', 0)
+        d_chance = probabilities.get('D_chance', 0)
+        total_cd = c_chance + d_chance
+        self.c_share = c_chance / total_cd if total_cd > 0 else 0.0
+
+        items = config.get('items', {})
+        self.items = {r: items.get(r) or [] for r in RARITIES}
+
+        # 奇珍物品：名称编号（diff_A=1 的连续规则）与拥有状态编号（diff_A=0/3 的未拥有优先）
+        a_items = self.items['A']
+        names = {}
+        keys = {}
+        self.a_name_ids = np.array([names.setdefault(i.get('name'), len(names)) for i in a_items],
+                                   dtype=np.int32)
+        self.a_key_ids = np.array([keys.setdefault(get_item_key(i), len(keys)) for i in a_items],
+                                  dtype=np.int32)
+        self.a_names = list(names)
+        self.a_keys = list(keys)
+
+        # 对每个名称预先算出"名称不同"的候选列表，使连续规则的抽取为 O(1)
+        self.a_other = ExcludingSampler(self.a_name_ids)
+
+    @property
+    def has_gold(self):
+        """diff_A=3 的池子没有稀世保底与稀世抽取"""
+        return self.diff_A != 3
+
+    def ten_pull_cost(self, rate=1.0):
+        """十连的价格，折扣按 Math.round 取整"""
+        cost = self.pull_cost * 10
+        if rate < 1.0:
+            cost = int(np.floor(cost * rate + 0.5))
+        return cost
+
+
+def load_pool(pool_id, root=PROJECT_ROOT, list_path=None):
+    """加载 pools/<id> 下的 pool.json 与 possibility.json"""
+    base_path = os.path.join(root, 'pools', pool_id)
+    with open(os.path.join(base_path, 'pool.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    with open(os.path.join(base_path, 'possibility.json'), 'r', encoding='utf-8') as f:
+        probabilities = json.load(f)['probabilities']
+
+    entry = load_list_entry(pool_id, list_path or os.path.join(root, 'more', 'list.json'))
+    pull_cost = int(entry['cost']) if entry.get('cost') else DEFAULT_PULL_COST
+    cost_type = entry.get('cost_type') or DEFAULT_COST_TYPE
+    return PoolModel(pool_id, config, probabilities, pull_cost, cost_type)
+
+
+class Engine:
+    """批量推进大量互相独立的玩家，每一抽对所有玩家做一次数组运算"""
+
+    def __init__(self, model, n_players, seed=None):
+        self.model = model
+        self.n = n_players
+        self.rng = np.random.default_rng(seed)
+
+        self.player_ids = np.arange(n_players)
+        self.total = np.zeros(n_players, dtype=np.int64)
+        self.spent = np.zeros(n_players, dtype=np.int64)
+        self.pity_gold = np.zeros(n_players, dtype=np.int32)
+        self.pity_purple = np.zeros(n_players, dtype=np.int32)
+        self.pity_blue = np.zeros(n_players, dtype=np.int32)
+        self.discount_rate = np.ones(n_players, dtype=np.float64)
+        self.counts = np.zeros((n_players, len(RARITIES)), dtype=np.int32)
+
+        # 奇珍规则相关状态；未拥有优先的池子需要按玩家维护未拥有物品的下标数组
+        self.last_a_name = np.full(n_players, -1, dtype=np.int32)
+        self.consecutive_a = np.zeros(n_players, dtype=np.int32)
+        if model.diff_A in (0, 3):
+            self.owned_a = UnownedSampler(n_players, model.a_key_ids)
+        else:
+            self.owned_a = OwnedSet(n_players, len(model.a_keys))
+
+    _STATE_FIELDS = ('player_ids', 'total', 'spent', 'pity_gold', 'pity_purple', 'pity_blue',
+                     'discount_rate', 'counts', 'last_a_name', 'consecutive_a')
+
+    def compress(self, keep):
+        """只保留仍需模拟的玩家，减少后续每抽的数组长度"""
+        for field in self._STATE_FIELDS:
+            setattr(self, field, getattr(self, field)[keep])
+        self.owned_a.take(keep)
+        self.n = len(self.player_ids)
+
+    def _lookup(self, hazard, pity):
+        """按保底计数查表，超出数组长度时取最后一个值"""
+        idx = np.minimum(pity, len(hazard)) - 1
+        return hazard[np.maximum(idx, 0)]
+
+    def _random_rarity(self):
+        """determineRandomRarity：依次判定 S、A、B，否则按 C/D 比例"""
+        model = self.model
+        n = self.n
+        u = self.rng.random((4, n))
+        result = np.where(u[3] < model.c_share, C, D).astype(np.int8)
+        hit_b = u[2] < self._lookup(model.hazard_B, self.pity_blue)
+        result[hit_b] = B
+        hit_a = u[1] < self._lookup(model.hazard_A, self.pity_purple)
+        result[hit_a] = A
+        if model.has_gold:
+            hit_s = u[0] < self._lookup(model.hazard_S, self.pity_gold)
+            result[hit_s] = S
+        return result
+
+    def _select_a(self, got_a):
+        """
+        selectAItemBasedOnRules：为抽到奇珍的玩家挑选具体物品。
+        返回 (玩家下标, 物品下标, 是否为重复获得)
+        """
+        model = self.model
+        n_a = len(model.a_name_ids)
+        players = np.flatnonzero(got_a)
+        if n_a == 0 or len(players) == 0:
+            return players, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=bool)
+        u = self.rng.random(len(players))
+
+        if model.diff_A in (0, 3):
+            # 优先从未拥有的奇珍中等概率抽取，全部拥有后在整个池子中抽取
+            chosen = self.owned_a.pick(players, u).astype(np.int32)
+        elif model.diff_A == 1:
+            # 连续两次相同后排除上一次的奇珍
+            last = self.last_a_name[players]
+            limited = (self.consecutive_a[players] >= 2) & (last >= 0)
+            chosen = (u * n_a).astype(np.int32)
+            if limited.any():
+                chosen[limited] = model.a_other.pick(last[limited], u[limited])
+            name = model.a_name_ids[chosen]
+            same = name == last
+            self.consecutive_a[players] = np.where(same, self.consecutive_a[players] + 1, 1)
+            self.last_a_name[players] = name
+        else:
+            chosen = (u * n_a).astype(np.int32)
+
+        repeat = self.owned_a.add(players, model.a_key_ids[chosen])
+        return players, chosen, repeat
+
+    def session(self, count=10):
+        """对所有玩家执行一次单抽或十连，返回本次每抽的稀有度 (count, n)"""
+        model = self.model
+        n = self.n
+
+        # 扣费：十连可使用折扣，使用后折扣清空
+        if count == 10:
+            cost = np.full(n, model.pull_cost * 10, dtype=np.int64)
+            discounted = self.discount_rate < 1.0
+            if discounted.any():
+                cost[discounted] = np.floor(cost[discounted] * self.discount_rate[discounted] + 0.5)
+                self.discount_rate[discounted] = 1.0
+        else:
+            cost = np.full(n, model.pull_cost * count, dtype=np.int64)
+        self.spent += cost
+
+        # 本次抽取开始前建立保底队列，优先级 S > A > B
+        queue_s = (self.pity_gold >= model.pity_gold) if model.has_gold else np.zeros(n, dtype=bool)
+        queue_a = self.pity_purple >= model.pity_purple
+        queue_b = self.pity_blue >= model.pity_blue
+
+        results = np.empty((count, n), dtype=np.int8)
+        for i in range(count):
+            self.total += 1
+            if model.has_gold:
+                self.pity_gold += 1
+            self.pity_purple += 1
+            self.pity_blue += 1
+
+            r = self._random_rarity()
+            # 保底队列中每一项只消耗一次
+            take_b = queue_b & ~queue_a & ~queue_s
+            take_a = queue_a & ~queue_s
+            r[take_b] = B
+            r[take_a] = A
+            r[queue_s] = S
+            queue_b &= ~take_b
+            queue_a &= ~take_a
+            queue_s = np.zeros(n, dtype=bool) if queue_s.any() else queue_s
+
+            self._select_a(r == A)
+
+            if model.has_gold:
+                self.pity_gold[r == S] = 0
+            self.pity_purple[r == A] = 0
+            self.pity_blue[r == B] = 0
+
+            self.counts[np.arange(n), r] += 1
+            results[i] = r
+
+        # 抽取结束后触发折扣，同一时间只能持有一种折扣
+        if model.discounts:
+            pending = self.discount_rate == 1.0
+            for rate, chance in model.discounts:
+                hit = pending & (self.rng.random(n) < chance)
+                self.discount_rate[hit] = rate
+                pending &= ~hit
+        return results
+
+    def run_until(self, target='S', hits=1, count=10, max_sessions=100000):
+        """持续抽取直到每名玩家获得 hits 个目标稀有度，返回 (抽数, 花费)"""
+        rarity = RARITY_INDEX[target]
+        if rarity == S and not self.model.has_gold:
+            raise ValueError(f"{self.model.pool_id} 不包含稀世抽取 (diff_A=3)")
+        n_total = self.n
+        pulls = np.zeros(n_total, dtype=np.int64)
+        spent = np.zeros(n_total, dtype=np.int64)
+        for _ in range(max_sessions):
+            if self.n == 0:
+                break
+            self.session(count)
+            done = self.counts[:, rarity] >= hits
+            if done.any():
+                ids = self.player_ids[done]
+                pulls[ids] = self.total[done]
+                spent[ids] = self.spent[done]
+                self.compress(~done)
+        if self.n:
+            raise RuntimeError(f"{self.n} 名玩家在 {max_sessions} 次抽取内未达成目标")
+        return pulls, spent
+
+
+def summarize(values, percentiles=(50, 90, 99, 99.9)):
+    """计算均值与分位数"""
+    values = np.asarray(values, dtype=np.float64)
+    summary = {'mean': float(values.mean()), 'std': float(values.std())}
+    for p, v in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f'p{p:g}'] = float(v)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='V1 精华抽卡蒙特卡洛模拟')
+    parser.add_argument('pool_id', help='pools/ 下的奖池 ID，例如 S41E1')
+    parser.add_argument('--players', type=int, default=1_000_000, help='模拟玩家数')
+    parser.add_argument('--target', default='S', choices=['S', 'A', 'B'], help='目标稀有度')
+    parser.add_argument('--hits', type=int, default=1, help='需要获得的目标次数')
+    parser.add_argument('--single', action='store_true', help='使用单抽而不是十连')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    model = load_pool(args.pool_id)
+    engine = Engine(model, args.players, seed=args.seed)
+    start = time.perf_counter()
+    pulls, spent = engine.run_until(args.target, args.hits, count=1 if args.single else 10)
+    elapsed = time.perf_counter() - start
+
+    print(f"奖池: {model.pool_id} ({model.config.get('name', '')})")
+    print(f"玩家数: {args.players}，目标: {args.hits} 个 {args.target}")
+    print(f"总抽数: {int(pulls.sum())}，耗时 {elapsed:.2f}s ({pulls.sum() / elapsed / 1e6:.1f}M 抽/秒)")
+    for label, values in (('抽数', pulls), (f'花费({model.cost_type})', spent)):
+        stats = summarize(values)
+        print(f"{label}: " + ', '.join(f"{k}={v:.1f}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+import os
+import json
+import hashlib
+import argparse
+import time
+
+import numpy as np
+
+import jyxb
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'more', 'distribution.json')
+
+# 各目录的列表文件、默认单抽价格及稀有度对应的 pitySettings 字段
+SOURCES = [
+    ('pools', os.path.join('more', 'list.json'), 96, {'S': 'gold', 'A': 'purple', 'B': 'blue'}),
+    ('XYZT', os.path.join('XYZT', 'list.json'), 35, {}),
+    ('JYXB', os.path.join('JYXB', 'list.json'), 10, {}),
+]
+# 鉴影寻宝的页面不读取 possibility.json，按 jyxb.RULESETS 中的页面规则计算
+JYXB_FOLDER = 'JYXB'
+MAX_PULLS = 100000
+
+PERCENTILES = (50, 90, 99)
+# 没有硬保底的分布在生存概率低于该值时截断
+TAIL_EPSILON = 1e-12
+
+
+def hazard_distribution(hazard, cap=None, inclusive=False):
+    """
+    根据每抽的独立概率计算"距离下一次出货的抽数"分布
+    hazard[k-1] 为计数为 k 时的概率，超出长度取最后一个值；
+    V1 计数达到 cap 仍未出货时下一抽由保底队列必出，V2 (inclusive) 在第 cap 抽当抽必出
+    """
+    hazard = np.clip(np.asarray(hazard, dtype=np.float64), 0.0, 1.0)
+    if len(hazard) == 0:
+        return None
+    if cap is not None:
+        length = cap if inclusive else cap + 1
+        if len(hazard) < length:
+            hazard = np.concatenate([hazard, np.full(length - len(hazard), hazard[-1])])
+        hazard = hazard[:length].copy()
+        hazard[-1] = 1.0
+    elif hazard[-1] < 1.0:
+        # 无保底：尾部按几何分布延伸到可忽略的生存概率
+        tail = hazard[-1]
+        if tail <= 0:
+            return None
+        survival = np.prod(1 - hazard)
+        extra = int(np.ceil(np.log(TAIL_EPSILON / max(survival, TAIL_EPSILON)) / np.log1p(-tail))) + 1
+        hazard = np.concatenate([hazard, np.full(max(extra, 0), tail)])
+
+    survival = np.cumprod(1 - hazard)
+    pmf = hazard * np.concatenate([[1.0], survival[:-1]])
+    cdf = np.cumsum(pmf)
+    return pmf, cdf
+
+
+def geometric_summary(p, pull_cost):
+    """恒定概率的抽数分布为几何分布，直接给出闭式结果"""
+    if p <= 0:
+        return None
+    mean = 1.0 / p
+    summary = {
+        'kind': 'geometric',
+        'p': p,
+        'mean': round(mean, 4),
+        'cost_mean': round(mean * pull_cost, 2),
+    }
+    for q in PERCENTILES:
+        pulls = 1 if p >= 1 else int(np.ceil(np.log1p(-q / 100) / np.log1p(-p)))
+        summary[f'p{q}'] = max(pulls, 1)
+    return summary
+
+
+def hazard_summary(hazard, cap, inclusive, pull_cost, curves):
+    """保底概率表的摘要"""
+    result = hazard_distribution(hazard, cap, inclusive)
+    if result is None:
+        return None
+    return distribution_summary(*result, cap, pull_cost, curves)
+
+
+def distribution_summary(pmf, cdf, cap, pull_cost, curves, kind='hazard'):
+    """抽数分布的摘要，相同的 CDF 曲线只保存一次"""
+    pulls = np.arange(1, len(pmf) + 1)
+    mean = float((pulls * pmf).sum() / pmf.sum())
+    summary = {
+        'kind': kind,
+        'cap': cap,
+        'mean': round(mean, 4),
+        'cost_mean': round(mean * pull_cost, 2),
+    }
+    for q in PERCENTILES:
+        summary[f'p{q}'] = int(np.searchsorted(cdf, q / 100 - 1e-12) + 1)
+
+    # CDF 保留 6 位小数并去掉末尾的 1.0，按内容哈希去重
+    rounded = np.round(cdf, 6)
+    end = int(np.searchsorted(rounded, 1.0)) + 1
+    curve = rounded[:end].tolist()
+    curve_id = hashlib.md5(json.dumps(curve).encode()).hexdigest()[:12]
+    curves.setdefault(curve_id, curve)
+    summary['curve'] = curve_id
+    return summary
+
+
+def pity_chain(probabilities, config, pity_keys, inclusive):
+    """
+    单抽时同时推进的保底计数，按判定顺序 S > A > B (> F) 返回 [(稀有度, 概率表, 保底, 超出概率表后的概率)]。
+    V1 的 diff_A=3 不抽稀世，也不累计稀世计数
+    """
+    pity_settings = config.get('pitySettings') or {}
+    frame_settings = config.get('frameSettings') or {}
+    chain = []
+    for rarity, pity_key in pity_keys.items():
+        if rarity == 'S' and config.get('diff_A') == 3 and not inclusive:
+            continue
+        values = probabilities.get(rarity)
+        values = np.clip(np.asarray(values if isinstance(values, list) and values else [0.0],
+                                    dtype=np.float64), 0.0, 1.0)
+        # V1 超出概率表取最后一个值；V2 为 p.X[pity-1] || 1.0，0 也按 1.0 处理
+        fallback = values[-1] if not inclusive else 1.0
+        if inclusive:
+            values = np.where(values > 0, values, 1.0)
+        chain.append((rarity, values, pity_settings.get(pity_key), fallback))
+    frame_values = probabilities.get('F')
+    if inclusive and isinstance(frame_values, list) and frame_values:
+        # 头像框兑换卡：p.F[pity-1] || p.F_chance || 0，只有启用时才有保底
+        fallback = probabilities.get('F_chance') or 0.0
+        values = np.asarray(frame_values, dtype=np.float64)
+        values = np.clip(np.where(values > 0, values, fallback), 0.0, 1.0)
+        cap = (frame_settings.get('pityThreshold') or 0) if frame_settings.get('enabled') else None
+        chain.append(('F', values, cap, fallback))
+    return chain
+
+
+def joint_distribution(chain, target, inclusive):
+    """
+    从全部计数为零开始到下一次出 target 的抽数分布，同一抽中更高稀有度的抢占与保底都按页面处理：
+    V1 在抽取前按保底队列直接给出最高的保底稀有度，不再随机；
+    V2 先随机判定，计数加一后达到保底的稀有度只会提升结果，取两者中较高的一个。
+    出货前 target 的计数就是已抽数，状态只需保存其余稀有度的计数。
+    V2 的结果只会被更高的稀有度抢占，低于 target 的计数不影响分布；
+    V1 中低稀有度进入保底队列时本抽不再随机，需要保留全部计数
+    """
+    t = [rarity for rarity, *_ in chain].index(target)
+    _, _, cap, fallback = chain[t]
+    if cap is None and fallback <= 0:
+        # 无保底且概率表之后不再出货
+        return None
+    if inclusive:
+        chain = chain[:t + 1]
+    n = len(chain)
+    # 计数（加一之前）达到 max(概率表长度, 保底) 之后的行为都相同，可以合并
+    sizes = [1 if i == t else max(len(values), cap or 0) + 1
+             for i, (_, values, cap, _) in enumerate(chain)]
+
+    def lookup(i, counts):
+        _, values, cap, fallback = chain[i]
+        hazard = np.where(counts < len(values), values[np.minimum(counts, len(values) - 1)], fallback)
+        reached = counts + 1 if inclusive else counts
+        forced = reached >= cap if cap is not None else np.zeros(len(counts), dtype=bool)
+        shape = [1] * n
+        shape[i] = len(counts)
+        return hazard.reshape(shape), forced.reshape(shape)
+
+    fixed = [None if i == t else lookup(i, np.arange(sizes[i])) for i in range(n)]
+    mass = np.zeros(sizes)
+    mass[(0,) * n] = 1.0
+    pmf = []
+    for pulls in range(MAX_PULLS):
+        tables = [lookup(i, np.array([pulls])) if i == t else fixed[i] for i in range(n)]
+        # 随机判定：依次判定各稀有度
+        remaining = 1.0
+        chance = []
+        for hazard, _ in tables:
+            chance.append(remaining * hazard)
+            remaining = remaining * (1.0 - hazard)
+        any_forced = np.zeros(sizes, dtype=bool)
+        for _, forced in tables:
+            any_forced = any_forced | forced
+        outcomes = []
+        higher = np.zeros(sizes, dtype=bool)
+        above = 0.0
+        for i, (_, forced) in enumerate(tables):
+            if inclusive:
+                outcome = np.where(higher, 0.0, np.where(forced, 1.0 - above, chance[i]))
+            else:
+                outcome = np.where(forced & ~higher, 1.0, np.where(any_forced, 0.0, chance[i]))
+            outcomes.append(outcome)
+            higher = higher | forced
+            above = above + chance[i]
+
+        pmf.append(float((mass * outcomes[t]).sum()))
+        new = mass * (1.0 - sum(outcomes))
+        for axis in range(n):
+            new = _advance(new, axis)
+        for i, outcome in enumerate(outcomes):
+            if i == t:
+                continue
+            # 出货的稀有度计数归零，其余计数加一
+            hit = (mass * outcome).sum(axis=i, keepdims=True)
+            for axis in range(n):
+                if axis != i:
+                    hit = _advance(hit, axis)
+            index = [slice(None)] * n
+            index[i] = slice(0, 1)
+            new[tuple(index)] += hit
+        mass = new
+        if mass.sum() < TAIL_EPSILON:
+            break
+    pmf = np.array(pmf)
+    return pmf, np.cumsum(pmf)
+
+
+def _advance(mass, axis):
+    """沿 axis 的计数加一，最后一格为合并后的状态"""
+    if mass.shape[axis] == 1:
+        return mass
+    moved = np.moveaxis(mass, axis, 0)
+    result = np.empty_like(moved)
+    result[0] = 0.0
+    result[1:] = moved[:-1]
+    result[-1] += moved[-1]
+    return np.moveaxis(result, 0, axis)
+
+
+def summarize_pool(probabilities, config, pity_keys, inclusive, pull_cost, curves):
+    """计算单个奖池各稀有度的分布摘要，带保底计数的稀有度按联合状态精确计算"""
+    chain = pity_chain(probabilities, config, pity_keys, inclusive)
+    joint = {rarity: cap for rarity, _, cap, _ in chain}
+    rarities = {}
+    for rarity, values in probabilities.items():
+        if not isinstance(values, list) or not values:
+            continue
+        if rarity == 'S' and config.get('diff_A') == 3:
+            continue
+        if rarity in joint:
+            result = joint_distribution(chain, rarity, inclusive)
+            summary = distribution_summary(*result, joint[rarity], pull_cost, curves,
+                                           kind='joint') if result else None
+        elif len(values) == 1:
+            summary = geometric_summary(float(values[0]), pull_cost)
+        else:
+            summary = hazard_summary(values, None, inclusive, pull_cost, curves)
+        if summary:
+            rarities[rarity] = summary
+    return rarities
+
+
+def jyxb_distribution(model, rarity):
+    """
+    鉴影寻宝从零开始到下一次出 rarity 的抽数分布。状态为 (距上次奇珍的抽数, guaranteed80 标记)，
+    累计抽数就是当前是第几抽：计数加一后达到 pity 当抽必出奇珍，标记在出奇珍重置之后才按
+    guaranteeAfter 设置，所以第 80 抽出奇珍时下一抽仍然必出
+    """
+    target = model.rarities.index(rarity)
+    n_rarities = len(model.rarities)
+    rates = np.diff(np.concatenate([[0.0], model.thresholds, [1.0]]))
+    size = model.pity + 1 if model.pity else 1
+    forced = np.zeros((size, 2), dtype=bool)
+    forced[:, 1] = True
+    if model.pity:
+        forced[np.arange(size) + 1 >= model.pity] = True
+    outcome = np.where(forced[..., None], np.eye(n_rarities)[model.target], rates)
+
+    mass = np.zeros((size, 2))
+    mass[0, 0] = 1.0
+    pmf = []
+    for total in range(1, MAX_PULLS + 1):
+        split = mass[..., None] * outcome
+        pmf.append(split[..., target].sum())
+        new = np.zeros_like(mass)
+        for i in range(n_rarities):
+            if i == target:
+                continue
+            if i == model.target:
+                new[0, 0] += split[..., i].sum()
+            else:
+                new[1:] += split[:-1, :, i]
+                new[-1] += split[-1, :, i]
+        if model.marks[min(total, len(model.marks) - 1)]:
+            new[:, 1] += new[:, 0]
+            new[:, 0] = 0.0
+        mass = new
+        if mass.sum() < TAIL_EPSILON:
+            break
+    pmf = np.array(pmf)
+    return pmf, np.cumsum(pmf)
+
+
+def summarize_jyxb(pool_id, root, curves):
+    """按每期的页面规则计算各稀有度，返回 (单抽价格, 摘要)"""
+    model = jyxb.load_model(pool_id, root)
+    rarities = {}
+    for rarity in model.rarities:
+        pmf, cdf = jyxb_distribution(model, rarity)
+        cap = (model.pity or None) if rarity == jyxb.TARGET else None
+        rarities[rarity] = distribution_summary(pmf, cdf, cap, model.pull_cost, curves)
+    return model.pull_cost, rarities
+
+
+def summarize_tiers(tiers, pull_cost):
+    """幸运之骰按档位概率计算几何分布"""
+    rarities = {}
+    for tier in tiers:
+        summary = geometric_summary(float(tier.get('probability', 0)), pull_cost)
+        if summary:
+            rarities[tier.get('id') or tier.get('name')] = summary
+    return rarities
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_table(root=PROJECT_ROOT):
+    """遍历所有列表文件，生成全部奖池的分布表"""
+    curves = {}
+    pools = {}
+    for folder, list_path, default_cost, pity_keys in SOURCES:
+        full_list_path = os.path.join(root, list_path)
+        if not os.path.exists(full_list_path):
+            continue
+        for entry in load_json(full_list_path):
+            pool_id = entry.get('id')
+            if folder == JYXB_FOLDER:
+                pull_cost, rarities = summarize_jyxb(pool_id, root, curves)
+                pools[f"{folder}/{pool_id}"] = {
+                    'cost': pull_cost,
+                    'cost_type': entry.get('cost_type') or jyxb.DEFAULT_COST_TYPE,
+                    'rarities': rarities,
+                }
+                continue
+            pool_dir = os.path.join(root, folder, pool_id)
+            possibility_path = os.path.join(pool_dir, 'possibility.json')
+            if not os.path.exists(possibility_path):
+                continue
+            possibility = load_json(possibility_path)
+            pull_cost = int(entry['cost']) if entry.get('cost') else default_cost
+
+            if 'tiers' in possibility:
+                rarities = summarize_tiers(possibility['tiers'], pull_cost)
+            else:
+                pool_path = os.path.join(pool_dir, 'pool.json')
+                config = load_json(pool_path) if os.path.exists(pool_path) else {}
+                # V2 在计数增加后立即判定硬保底，V1 在下一次抽取时通过保底队列触发
+                inclusive = entry.get('version') == 'V2.html'
+                rarities = summarize_pool(possibility.get('probabilities', {}), config,
+                                          pity_keys, inclusive, pull_cost, curves)
+            pools[f"{folder}/{pool_id}"] = {
+                'cost': pull_cost,
+                'cost_type': entry.get('cost_type') or 'inspiration',
+                'rarities': rarities,
+            }
+    return {
+        'comment': '单抽模式下距离下一次出货的抽数分布。curve 为 CDF，curves[id][k-1] 为 k 抽内出货的概率。'
+                   'kind 为 joint 的行按全部保底计数的联合状态精确计算，包含同一抽中更高稀有度的抢占。',
+        'percentiles': list(PERCENTILES),
+        'pools': pools,
+        'curves': curves,
+    }
+
+
+def format_markdown(table):
+    """生成可粘贴到 possibility.md 的表格"""
+    lines = ['| 奖池 | 品质 | 保底 | 平均抽数 | 平均花费 | P50 | P90 | P99 |',
+             '| --- | --- | --- | --- | --- | --- | --- | --- |']
+    for pool_key, pool in table['pools'].items():
+        for rarity, s in pool['rarities'].items():
+            lines.append(f"| {pool_key} | {rarity} | {s.get('cap') or '-'} | {s['mean']:.2f} | "
+                         f"{s['cost_mean']:.0f} | {s['p50']} | {s['p90']} | {s['p99']} |")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据概率表精确计算所有奖池的出货抽数分布')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='输出 JSON 路径')
+    parser.add_argument('--markdown', default=None, help='同时输出 Markdown 表格到该路径')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build_table()
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    if args.markdown:
+        with open(args.markdown, 'w', encoding='utf-8') as f:
+            f.write(format_markdown(table))
+
+    print(f"已计算 {len(table['pools'])} 个奖池，{len(table['curves'])} 条不同曲线，耗时 {elapsed * 1000:.0f}ms")
+    print(f"输出文件: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import contextlib
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from stats import get_stats
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 流式下载的分块大小，峰值内存与资源大小无关
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = '.part'
+# .part 对应版本的 ETag / Last-Modified，续传时作为 If-Range；同样以 .part 结尾，资源扫描会一并忽略
+VALIDATOR_SUFFIX = '.validator' + PART_SUFFIX
+
+
+class FetchError(Exception):
+    """重试耗尽后仍然失败的请求"""
+
+
+class IncompleteDownload(FetchError):
+    """实际收到的字节数与 Content-Length 不一致"""
+
+
+def _expected_length(response):
+    """根据响应头得到完整文件的预期大小，无法确定时返回 None"""
+    if response.headers.get('content-encoding', 'identity') != 'identity':
+        # 经过压缩传输时 Content-Length 是压缩后的大小，无法直接比对
+        return None
+    if response.status_code == 206:
+        content_range = response.headers.get('content-range', '')
+        total = content_range.rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('content-length')
+    return int(length) if length and length.isdigit() else None
+
+
+def _resume_validator(response):
+    """可用于 If-Range 的校验值：强 ETag 优先，其次 Last-Modified，弱 ETag 不能用于 If-Range"""
+    etag = response.headers.get('etag', '')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('last-modified')
+
+
+def _range_start(response):
+    """Content-Range: bytes start-end/total 中的起始位置，无法解析时返回 None"""
+    unit, _, rest = response.headers.get('content-range', '').strip().partition(' ')
+    start = rest.partition('-')[0].strip()
+    return int(start) if unit == 'bytes' and start.isdigit() else None
+
+
+def _remove(path):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def _file_tail(path, size):
+    with open(path, 'rb') as f:
+        f.seek(max(os.fstat(f.fileno()).st_size - size, 0))
+        return f.read(size)
+
+
+def _file_head(path, size):
+    with open(path, 'rb') as f:
+        return f.read(size)
+
+
+def is_complete_file(path):
+    """
+    廉价的完整性检查：文件非空，且常见图片格式的结尾标记/头部长度正确，
+    用于识别中断下载留下的截断文件
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    if size == 0:
+        return False
+    head = _file_head(path, 12)
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _file_tail(path, 8) == b'IEND\xaeB`\x82'
+    if head.startswith(b'\xff\xd8'):
+        # JPEG 结尾可能带少量填充字节
+        return b'\xff\xd9' in _file_tail(path, 32)
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return _file_tail(path, 1) == b';'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return int.from_bytes(head[4:8], 'little') + 8 <= size
+    return True
+
+
+# 文件头标记 → 扩展名，按顺序匹配
+MAGIC_EXTENSIONS = [
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'%PDF', '.pdf'),
+    (b'PK\x03\x04', '.zip'),
+    (b'wOFF', '.woff'),
+    (b'wOF2', '.woff2'),
+    (b'OTTO', '.otf'),
+    (b'\x00\x01\x00\x00', '.ttf'),
+    (b'OggS', '.ogg'),
+    (b'ID3', '.mp3'),
+    (b'\x00\x00\x01\x00', '.ico'),
+]
+# 常见的 Content-Type 到扩展名映射
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/svg+xml': '.svg',
+    'application/json': '.json',
+    'text/html': '.html',
+    'text/css': '.css',
+    'application/javascript': '.js',
+    'text/plain': '.txt',
+    'application/pdf': '.pdf',
+    'application/zip': '.zip',
+    'application/x-zip-compressed': '.zip',
+    'audio/mpeg': '.mp3',
+    'video/mp4': '.mp4',
+    'font/woff': '.woff',
+    'font/woff2': '.woff2',
+    'application/octet-stream': '.bin',
+}
+
+
+def sniff_extension(path):
+    """根据文件头判断类型，替代下载前的 HEAD 请求。无法识别时返回空字符串"""
+    head = _file_head(path, 64)
+    for magic, extension in MAGIC_EXTENSIONS:
+        if head.startswith(magic):
+            return extension
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return '.webp'
+    if head[4:8] == b'ftyp':
+        return '.mp4'
+    if len(head) >= 2 and head[0] == 0xff and head[1] & 0xe0 == 0xe0:
+        # 不带 ID3 标签的 MPEG 音频帧
+        return '.mp3'
+    text = head.lstrip().lower()
+    if text.startswith(b'<svg') or (text.startswith(b'<?xml') and b'<svg' in head.lower()):
+        return '.svg'
+    if text.startswith((b'<!doctype html', b'<html')):
+        return '.html'
+    return ''
+
+
+def extension_from_content_type(content_type):
+    if not content_type:
+        return ''
+    return CONTENT_TYPE_EXTENSIONS.get(content_type.lower().split(';')[0].strip(), '')
+
+
+class HostLimiter:
+    """单个主机的并发数与请求间隔限制，线程安全"""
+
+    def __init__(self, max_concurrency, min_interval):
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait_turn(self):
+        """按最小间隔排队，返回前占用一个请求时间片"""
+        if self.min_interval <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Fetcher:
+    """
+    共享的下载层：复用 keep-alive 连接池，限制全局与单主机并发，
+    失败时按指数退避重试。同步接口供脚本直接调用，异步接口供流水线并发调度
+    """
+
+    def __init__(self, concurrency=16, per_host=4, host_rate=None, retries=3, backoff=0.5,
+                 timeout=60, session=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        # host_rate 为单主机每秒最多请求数，None 表示不限速
+        self.min_interval = 1.0 / host_rate if host_rate else 0.0
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._executor = None
+        self._semaphore = None
+        self._loop = None
+
+    def _limiter(self, url):
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                limiter = HostLimiter(self.per_host, self.min_interval)
+                self._hosts[host] = limiter
+            return limiter
+
+    def _retry_delay(self, attempt, response=None):
+        """指数退避加随机抖动，服务端给出 Retry-After 时优先使用"""
+        if response is not None:
+            retry_after = response.headers.get('retry-after', '')
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """发送请求，连接错误、超时和 429/5xx 会重试，其余错误直接抛出"""
+        return self._request(method, url, timeout, False, **kwargs)
+
+    def _request(self, method, url, timeout, hold_slot, **kwargs):
+        """hold_slot 为真时返回的响应继续占用主机的并发名额，由调用方释放"""
+        limiter = self._limiter(url)
+        timeout = timeout or self.timeout
+        last_error = None
+        for attempt in range(self.retries + 1):
+            limiter.semaphore.acquire()
+            keep = False
+            try:
+                limiter.wait_turn()
+                start = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    response = None
+                    last_error = e
+                get_stats().record_request(method, url, time.perf_counter() - start,
+                                           error=response is None or response.status_code >= 400)
+                keep = hold_slot and response is not None and response.status_code not in RETRY_STATUS
+            finally:
+                if not keep:
+                    limiter.semaphore.release()
+            if response is not None:
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                last_error = requests.HTTPError(f"{response.status_code} {response.reason}",
+                                                response=response)
+                response.close()
+            if attempt < self.retries:
+                time.sleep(self._retry_delay(attempt, response))
+        raise FetchError(f"{method} {url} 失败: {last_error}")
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('HEAD', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    @contextlib.contextmanager
+    def stream(self, url, timeout=None, **kwargs):
+        """流式 GET，读取响应体期间一直占用该主机的并发名额，退出时关闭响应并释放"""
+        response = self._request('GET', url, timeout, True, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            response.close()
+            self._limiter(url).semaphore.release()
+
+    def download(self, url, file_path, timeout=None, headers=None):
+        """
+        流式下载到临时文件：已有 .part 时通过 Range + If-Range 续传，校验 Content-Length 后原子改名。
+        传输中断时从已收到的位置继续，返回 (文件大小, 响应头)。
+        headers 可带 If-None-Match / If-Modified-Since，服务端返回 304 时文件大小为 None 且不写文件
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return self._download_once(url, file_path, timeout, headers)
+            except (IncompleteDownload, requests.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == self.retries:
+                    raise FetchError(f"GET {url} 失败: {e}")
+                time.sleep(self._retry_delay(attempt))
+
+    def _download_once(self, url, file_path, timeout=None, extra_headers=None):
+        part_path = file_path + PART_SUFFIX
+        validator_path = file_path + VALIDATOR_SUFFIX
+        resumed_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        validator = None
+        if resumed_from and os.path.exists(validator_path):
+            with open(validator_path, 'r', encoding='utf-8') as f:
+                validator = f.read().strip()
+        headers = dict(extra_headers or {})
+        if validator:
+            # 源文件已变化时服务端忽略 Range，返回完整的 200
+            headers['Range'] = f'bytes={resumed_from}-'
+            headers['If-Range'] = validator
+        else:
+            # 无法确认 .part 与当前版本一致，从头下载
+            resumed_from = 0
+
+        with self.stream(url, timeout=timeout, headers=headers) as response:
+            if response.status_code == 304:
+                # 本地副本仍然有效，续传到一半的新版本也不再需要
+                _remove(part_path)
+                _remove(validator_path)
+                return None, dict(response.headers)
+            # 416 说明续传范围无效；206 的起始位置与请求不符时拼接会损坏文件，都从头下载
+            restart = bool(resumed_from) and (
+                response.status_code == 416
+                or (response.status_code == 206 and _range_start(response) != resumed_from))
+            if not restart:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    # 服务端不支持 Range 或源文件已变化时整体重下
+                    resumed_from = 0
+                if not resumed_from:
+                    validator = _resume_validator(response)
+                    if validator:
+                        with open(validator_path, 'w', encoding='utf-8') as f:
+                            f.write(validator)
+                    else:
+                        _remove(validator_path)
+                expected = _expected_length(response)
+                received = resumed_from
+                start = time.perf_counter()
+                with open(part_path, 'ab' if resumed_from else 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        received += len(chunk)
+                response_headers = dict(response.headers)
+        if restart:
+            # 释放名额后从头下载
+            _remove(part_path)
+            _remove(validator_path)
+            return self._download_once(url, file_path, timeout, extra_headers)
+        get_stats().record_bytes(url, received - resumed_from, time.perf_counter() - start)
+
+        if expected is not None and received != expected:
+            # 保留 .part，下次运行时续传
+            raise IncompleteDownload(f"{url} 只收到 {received}/{expected} 字节")
+        os.replace(part_path, file_path)
+        _remove(validator_path)
+        return received, response_headers
+
+    async def run(self, func, *args):
+        """在下载线程池中执行同步函数，全局并发由信号量限制"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                                thread_name_prefix='fetch')
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            # 信号量绑定事件循环，每次 asyncio.run 需要重新创建
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def arequest(self, method, url, **kwargs):
+        return await self.run(lambda: self.request(method, url, **kwargs))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._semaphore = None
+        self._loop = None
+        self.session.close()
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_fetcher():
+    """进程内共享的默认下载器"""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+        return _default_fetcher
@@ -0,0 +1,329 @@
+import os
+import re
+import sys
+import json
+import time
+from pathlib import Path
+
+from manifest import hash_bytes
+from poolrepo import get_repository
+
+# 使用相对路径定位
+PROJECT_ROOT = Path(__file__).parent.absolute()
+CACHE_VERSION = 1
+
+# 更灵活的正则表达式定义分类规则
+pattern_type_b = re.compile(r"^S\d+Rank$")
+pattern_type_a_file = re.compile(r"^S\d+E\d+$")  # 注意这里不带.json，因为是文件夹名
+
+DEFAULT_ESSENCE_IMAGE = "/resource/f8d697b2b3c07042082adeb9fdc12737.png"
+DEFAULT_PITY_SETTINGS = {"gold": 250, "purple": 60, "blue": 10}
+DEFAULT_FRAGMENTS_INFO = {"name": "碎片", "img": "/resource/abb5919fc5926eb8e2da46469ff98487.png"}
+
+
+def filter_items_by_rarity(items, rarity, pool_category):
+    """
+    根据池子类别和稀有度进行筛选
+    """
+    filtered = []
+
+    if rarity == "A":
+        if pool_category == "A":
+            filtered = [item for item in items if item.get("type") == "时装"]
+    elif rarity == "S":
+        if pool_category == "S":
+            filtered = [item for item in items if item.get("type") == "随身物品"]
+    elif rarity == "B":
+        allowed_types = {"等待动作", "个性动作", "时装"}
+        filtered = [item for item in items if item.get("type") in allowed_types]
+    elif rarity == "C":
+        allowed_types = {"等待动作", "个性动作", "时装"}
+        filtered = [item for item in items if item.get("type") in allowed_types]
+
+    return filtered
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def load_excluded(list_path):
+    """list.json 支持两种格式：数组或对象中的 exclude 字段"""
+    list_content = read_json(list_path)
+    if isinstance(list_content, list):
+        return set(list_content)
+    if isinstance(list_content, dict) and "exclude" in list_content:
+        return set(list_content["exclude"])
+    return set()
+
+
+def discover_pools(base_dir, excluded):
+    """
+    收集所有 SxEy（A 类）与 SxRank（B 类）池子。按名称排序，
+    保证输出顺序与文件系统的遍历顺序无关
+    """
+    pools = []
+    for entry in sorted(base_dir.iterdir(), key=lambda e: e.name):
+        name = entry.name
+        if name == "jiusaiji" or name in excluded or not entry.is_dir():
+            continue
+        if pattern_type_b.match(name):
+            pool_type = "B"
+        elif pattern_type_a_file.match(name):
+            pool_type = "A"
+        else:
+            continue
+        if (entry / "pool.json").exists():
+            pools.append((name, pool_type, entry / "pool.json"))
+    return pools
+
+
+class FilterCache:
+    """
+    按池子缓存筛选结果：大小与修改时间没变直接复用，
+    否则比较内容哈希，只有内容真正变化的赛季才通过 PoolRepository 重新解析
+    """
+
+    def __init__(self, path, repo):
+        self.path = path
+        self.repo = repo
+        self.entries = {}
+        # 上次输出对应的输入签名与输出文件状态
+        self.output = {}
+        self.dirty = False
+        data = read_json(path, {})
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            self.entries = data.get("pools", {})
+            self.output = data.get("output", {})
+
+    def filtered_items(self, name, pool_type, pool_path):
+        """返回 ({稀有度: 筛选后的物品}, 是否重新解析)"""
+        st = os.stat(pool_path)
+        entry = self.entries.get(name)
+        if (entry is not None and entry["type"] == pool_type
+                and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns):
+            return entry["items"], False
+
+        with open(pool_path, "rb") as f:
+            raw = f.read()
+        digest = hash_bytes(raw)
+        if entry is not None and entry["type"] == pool_type and entry["hash"] == digest:
+            entry["size"], entry["mtime"] = st.st_size, st.st_mtime_ns
+            self.dirty = True
+            return entry["items"], False
+
+        # 内容已变化，丢弃仓库中该池子的旧缓存后重新加载
+        self.repo.invalidate(name)
+        groups = self.repo.get(name).groups
+        # 根据池子类型应用不同的过滤规则
+        category = "A" if pool_type == "A" else "S"
+        items = {rarity: filter_items_by_rarity([item.to_dict() for item in groups.get(rarity, ())],
+                                                rarity, category)
+                 for rarity in ["S", "A", "B", "C"]}
+        self.entries[name] = {
+            "type": pool_type,
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "hash": digest,
+            "items": items,
+        }
+        self.dirty = True
+        return items, True
+
+    def signature(self, names, extra_raw, list_raw):
+        """所有输入的内容签名：参与合并的池子及其哈希、extra.json、list.json"""
+        parts = [f"{name}|{self.entries[name]['type']}|{self.entries[name]['hash']}" for name in names]
+        parts.append(hash_bytes(extra_raw))
+        parts.append(hash_bytes(list_raw))
+        return hash_bytes("\n".join(parts).encode("utf-8"))
+
+    def output_is_current(self, signature, output_path):
+        try:
+            st = os.stat(output_path)
+        except OSError:
+            return False
+        return (self.output.get("signature") == signature
+                and self.output.get("size") == st.st_size
+                and self.output.get("mtime") == st.st_mtime_ns)
+
+    def record_output(self, signature, output_path, counts):
+        st = os.stat(output_path)
+        self.output = {"signature": signature, "size": st.st_size, "mtime": st.st_mtime_ns,
+                       "counts": counts}
+        self.dirty = True
+
+    def save(self, keep):
+        for name in set(self.entries) - set(keep):
+            del self.entries[name]
+            self.dirty = True
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "pools": self.entries, "output": self.output}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def merge_items(pool_results, extra_data):
+    """S/A/B 来自各赛季，C 为 extra.json 与各赛季之和，D 只来源于 extra.json；按 (name, type) 去重"""
+    merged_pool = {"S": [], "A": [], "B": [], "D": extra_data.get("D", [])}
+    collected_c_items = []
+    for items in pool_results:
+        for rarity in ["S", "A", "B"]:
+            merged_pool[rarity].extend(items[rarity])
+        collected_c_items.extend(items["C"])
+    merged_pool["C"] = extra_data.get("C", []) + collected_c_items
+
+    seen_keys = set()
+    unique_merged_pool = {}
+    skipped = []
+    for rarity, items in merged_pool.items():
+        unique_items = []
+        for item in items:
+            if isinstance(item, dict) and "name" in item and "type" in item:
+                key = (item["name"], item["type"])
+                if key not in seen_keys:
+                    seen_keys.add(key)
+                    unique_items.append(item)
+            else:
+                skipped.append(item)
+        unique_merged_pool[rarity] = unique_items
+    return unique_merged_pool, skipped
+
+
+def build_output(items, base_config, existing_config):
+    """list.json 为对象时优先使用其中的配置，其次沿用现有 pool.json"""
+    def setting(key, default):
+        return base_config.get(key, existing_config.get(key, default))
+
+    return {
+        "id": setting("id", "jiusaiji"),
+        "name": setting("name", "记忆珍宝·旧赛季"),
+        "essenceImage": setting("essenceImage", DEFAULT_ESSENCE_IMAGE),
+        "pitySettings": setting("pitySettings", DEFAULT_PITY_SETTINGS),
+        "items": items,
+        "diff_A": setting("diff_A", 0),
+        "discounts": setting("discounts", []),
+        "fragmentsInfo": setting("fragmentsInfo", DEFAULT_FRAGMENTS_INFO),
+    }
+
+
+def rebuild(root=PROJECT_ROOT, cache_path=None):
+    """
+    重新生成 pools/jiusaiji/pool.json，可被构建脚本反复调用。
+    输出与输入一一对应，内容没变时不写文件。
+    返回 {'written', 'pools', 'parsed', 'counts', 'skipped', 'skipped_pools'}，
+    无法读取或解析的赛季池子记入 skipped_pools 并跳过
+    """
+    root = Path(root)
+    base_dir = root / "pools"
+    jiusaiji_dir = base_dir / "jiusaiji"
+    list_path = jiusaiji_dir / "list.json"
+    extra_path = jiusaiji_dir / "extra.json"
+    output_path = jiusaiji_dir / "pool.json"
+    if cache_path is None:
+        cache_path = root / ".cache" / "jiusaiji_cache.json"
+
+    if not extra_path.exists():
+        raise FileNotFoundError(f"extra.json not found at {extra_path}")
+    with open(extra_path, "rb") as f:
+        extra_raw = f.read()
+    try:
+        with open(list_path, "rb") as f:
+            list_raw = f.read()
+    except OSError:
+        list_raw = b""
+
+    pools = discover_pools(base_dir, load_excluded(list_path))
+    cache = FilterCache(str(cache_path), get_repository(str(root)))
+    pool_results = []
+    parsed = []
+    names = []
+    skipped_pools = []
+    for name, pool_type, pool_path in pools:
+        try:
+            items, reparsed = cache.filtered_items(name, pool_type, pool_path)
+        except (OSError, ValueError) as e:
+            # 与原脚本一致：单个赛季的 pool.json 损坏时跳过该池子，不中断合并
+            skipped_pools.append({"pool": name, "error": str(e)})
+            continue
+        names.append(name)
+        pool_results.append(items)
+        if reparsed:
+            parsed.append(name)
+
+    signature = cache.signature(names, extra_raw, list_raw)
+    if cache.output_is_current(signature, output_path):
+        # 输入与输出都没有变化，无需合并与序列化
+        cache.save(names)
+        return {"written": False, "pools": names, "parsed": parsed,
+                "counts": cache.output.get("counts", {}), "skipped": [],
+                "skipped_pools": skipped_pools}
+
+    try:
+        extra_data = json.loads(extra_raw.decode("utf-8"))
+    except ValueError:
+        raise ValueError(f"Failed to read {extra_path}")
+    items, skipped = merge_items(pool_results, extra_data)
+    list_content = read_json(list_path)
+    base_config = list_content if isinstance(list_content, dict) else {}
+    output = json.dumps(build_output(items, base_config, read_json(output_path, {})),
+                        ensure_ascii=False, indent=2).encode("utf-8")
+
+    try:
+        with open(output_path, "rb") as f:
+            written = f.read() != output
+    except OSError:
+        written = True
+    if written:
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(output)
+        os.replace(tmp_path, output_path)
+
+    counts = {rarity: len(rarity_items) for rarity, rarity_items in items.items()}
+    cache.record_output(signature, output_path, counts)
+    cache.save(names)
+
+    return {
+        "written": written,
+        "pools": names,
+        "parsed": parsed,
+        "counts": counts,
+        "skipped": skipped,
+        "skipped_pools": skipped_pools,
+    }
+
+
+def main():
+    start = time.perf_counter()
+    try:
+        result = rebuild()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    for pool in result["skipped_pools"]:
+        print(f"[ERROR] Failed to load pool.json in {pool['pool']}: {pool['error']}")
+    for item in result["skipped"]:
+        print(f"[WARNING] Invalid item format skipped: {item}")
+    print(f"Pools: {len(result['pools'])}, re-parsed: {len(result['parsed'])}"
+          + (f" ({', '.join(result['parsed'])})" if result["parsed"] else ""))
+    print("Final counts: " + ", ".join(f"{r} {n}" for r, n in result["counts"].items()))
+    if result["written"]:
+        print("✅ SUCCESS: Merged pool updated")
+    else:
+        print("✅ Merged pool unchanged")
+    print(f"Done in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
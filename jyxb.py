@@ -0,0 +1,282 @@
+import os
+import sys
+import copy
+import json
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from collection import PERCENTILES, chunk_seed, rounded_summary
+from engine import get_item_key
+from poolrepo import get_repository
+from sampler import OwnedSet
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'more', 'jyxb.json')
+
+DEFAULT_PULL_COST = 10
+DEFAULT_COST_TYPE = 'huoqi'
+DEFAULT_PLAYERS = 1000000
+CHUNK_SIZE = 250000
+DEFAULT_SEED = 0
+MAX_SESSIONS = 100000
+
+# 每期的机制规则。键为 JYXB/list.json 中的 version（页面），pool.json 中的 rules 字段可逐项覆盖，
+# 补充第 1-11 期时只需添加数据，模拟循环不变
+RULESETS = {
+    # jianyingxunbao.html 中写死的机制（第 12 期）
+    'jianyingxunbao.html': {
+        # 稀有度 → 概率，按顺序累加判定，最后一项承接剩余概率；为 "possibility" 时使用 possibility.json
+        'rates': {'A': 0.05, 'B': 0.2, 'C': 0.75},
+        # 距上次奇珍达到该抽数时必出奇珍
+        'pity': 80,
+        # 累计抽数达到这些值后，下一抽必出奇珍（页面中只有 guaranteed80 会被使用）
+        'guaranteeAfter': [80],
+        # 各稀有度附带的资源
+        'rewards': {'B': {'fragments': 10}, 'C': {'clue': 10}},
+        # choose：每次抽取结束后若出过奇珍，从 A 列表前 choices 个中自选一个，本次的奇珍都换成它
+        # （模拟为选择未拥有的）；random：每个奇珍在 A 列表中等概率抽取
+        'selection': 'choose',
+        'choices': 10,
+    },
+}
+DEFAULT_VERSION = 'jianyingxunbao.html'
+TARGET = 'A'
+
+
+def load_rules(entry, config, probabilities, rates=None):
+    """按页面取默认规则，再用 pool.json 的 rules 覆盖；rates 参数可强制使用页面或 possibility.json 的概率"""
+    version = entry.get('version') or DEFAULT_VERSION
+    if version not in RULESETS:
+        raise ValueError(f"未定义 {version} 的鉴影寻宝规则")
+    rules = copy.deepcopy(RULESETS[version])
+    rules.update(config.get('rules') or {})
+    if rates == 'page' and RULESETS[version]['rates'] != 'possibility':
+        rules['rates'] = copy.deepcopy(RULESETS[version]['rates'])
+    elif rates == 'possibility' or rules['rates'] == 'possibility':
+        rules['rates'] = {rarity: float(values[0]) for rarity, values in probabilities.items()
+                          if isinstance(values, list) and values}
+    if TARGET not in rules['rates']:
+        raise ValueError(f"{entry.get('id')} 的概率中没有奇珍")
+    return rules
+
+
+class JyxbModel:
+    """一期鉴影寻宝编译后的规则：概率阈值、保底、奖励都转为数组，模拟循环只做查表"""
+
+    def __init__(self, pool, rules):
+        self.pool_id = pool.id
+        self.rules = rules
+        self.pull_cost = int(pool.entry['cost']) if pool.entry.get('cost') else DEFAULT_PULL_COST
+        self.cost_type = pool.entry.get('cost_type') or DEFAULT_COST_TYPE
+
+        self.rarities = list(rules['rates'])
+        self.target = self.rarities.index(TARGET)
+        # 累加阈值，最后一项承接剩余概率，不参与比较
+        self.thresholds = np.cumsum([rules['rates'][r] for r in self.rarities])[:-1]
+        self.pity = int(rules.get('pity') or 0)
+        marks = [int(m) for m in rules.get('guaranteeAfter') or []]
+        self.marks = np.zeros(max(marks, default=0) + 2, dtype=bool)
+        self.marks[marks] = True
+
+        self.resources = sorted({name for reward in rules.get('rewards', {}).values() for name in reward})
+        self.rewards = np.zeros((len(self.resources), len(self.rarities)), dtype=np.int64)
+        for rarity, reward in (rules.get('rewards') or {}).items():
+            for name, amount in reward.items():
+                self.rewards[self.resources.index(name), self.rarities.index(rarity)] = amount
+
+        a_items = [item for item in pool.items if item.rarity == TARGET]
+        self.choose = rules.get('selection', 'choose') == 'choose'
+        if self.choose:
+            a_items = a_items[:rules.get('choices') or len(a_items)]
+        keys = {}
+        self.a_key_ids = np.array([keys.setdefault(get_item_key(item), len(keys)) for item in a_items],
+                                  dtype=np.int64)
+        self.n_keys = len(keys)
+        if self.n_keys == 0:
+            raise ValueError(f"{pool.id} 没有可获得的奇珍")
+
+
+class JyxbEngine:
+    """
+    批量推进大量互相独立的玩家，直到拥有本期全部可选奇珍。
+    自选规则与页面一致：一次抽取（单抽或十连）结束后只弹出一次十选一，本次抽到的所有奇珍都换成
+    同一个选中的物品，所以每次抽取最多新增一个奇珍；模拟为总是选择未拥有的物品，只需计数。
+    随机规则不经过十选一界面，每个奇珍单独抽取，按物品记录拥有状态
+    """
+
+    def __init__(self, model, n_players, seed=None):
+        self.model = model
+        self.n = n_players
+        self.rng = np.random.default_rng(seed)
+        self.player_ids = np.arange(n_players)
+        self.total = np.zeros(n_players, dtype=np.int64)
+        self.pity = np.zeros(n_players, dtype=np.int32)
+        self.guaranteed = np.zeros(n_players, dtype=bool)
+        self.first_a = np.zeros(n_players, dtype=np.int64)
+        self.resources = np.zeros((len(model.resources), n_players), dtype=np.int64)
+        if model.choose:
+            self.owned_count = np.zeros(n_players, dtype=np.int32)
+        else:
+            self.owned = OwnedSet(n_players, model.n_keys)
+
+    _STATE_FIELDS = ('player_ids', 'total', 'pity', 'guaranteed', 'first_a')
+
+    def compress(self, keep):
+        for field in self._STATE_FIELDS:
+            setattr(self, field, getattr(self, field)[keep])
+        self.resources = self.resources[:, keep]
+        if self.model.choose:
+            self.owned_count = self.owned_count[keep]
+        else:
+            self.owned.take(keep)
+        self.n = len(self.player_ids)
+
+    def complete(self):
+        if self.model.choose:
+            return self.owned_count >= self.model.n_keys
+        return self.owned.complete()
+
+    def session(self, count=10):
+        model = self.model
+        any_a = np.zeros(self.n, dtype=bool)
+        for _ in range(count):
+            self.total += 1
+            self.pity += 1
+            u = self.rng.random(self.n)
+            r = np.zeros(self.n, dtype=np.int8)
+            for threshold in model.thresholds:
+                r += u >= threshold
+            # 保底或上一抽记录的累计抽数保底：必出奇珍并清除记录
+            forced = self.guaranteed.copy()
+            if model.pity:
+                forced |= self.pity >= model.pity
+            r[forced] = model.target
+
+            got_a = r == model.target
+            self.pity[got_a] = 0
+            self.guaranteed[got_a] = False
+            # 页面在重置之后才记录累计抽数保底，因此在第 80 抽出奇珍时下一抽仍然必出
+            self.guaranteed |= model.marks[np.minimum(self.total, len(model.marks) - 1)]
+            self.first_a[got_a & (self.first_a == 0)] = self.total[got_a & (self.first_a == 0)]
+
+            for row, reward in zip(self.resources, model.rewards):
+                row += reward[r]
+            if model.choose:
+                any_a |= got_a
+            else:
+                players = np.flatnonzero(got_a)
+                chosen = (self.rng.random(len(players)) * len(model.a_key_ids)).astype(np.int64)
+                self.owned.add(players, model.a_key_ids[chosen])
+        if model.choose:
+            # 十选一在本次抽取结束后进行，选中的物品替换本次全部奇珍
+            self.owned_count += any_a
+
+    def run(self, count=10, max_sessions=MAX_SESSIONS):
+        """返回 (集齐时的抽数, 首个奇珍的抽数, 各资源获得量)；集齐时所在的十连照常付费与获得资源"""
+        n_total = self.n
+        pulls = np.zeros(n_total, dtype=np.int64)
+        first_a = np.zeros(n_total, dtype=np.int64)
+        resources = np.zeros((len(self.model.resources), n_total), dtype=np.int64)
+        for _ in range(max_sessions):
+            if self.n == 0:
+                break
+            self.session(count)
+            done = self.complete()
+            if done.any():
+                ids = self.player_ids[done]
+                pulls[ids] = self.total[done]
+                first_a[ids] = self.first_a[done]
+                resources[:, ids] = self.resources[:, done]
+                self.compress(~done)
+        if self.n:
+            raise RuntimeError(f"{self.n} 名玩家在 {max_sessions} 次抽取内未集齐")
+        return pulls, first_a, resources
+
+
+def load_model(pool_id, root=PROJECT_ROOT, rates=None):
+    repo = get_repository(root)
+    pool = repo.get(pool_id, 'jyxb')
+    return JyxbModel(pool, load_rules(pool.entry, pool.config, pool.probabilities, rates))
+
+
+def simulate_chunk(root, pool_id, players, master_seed, chunk, rates, count):
+    """进程池任务：模拟一个分块的玩家"""
+    engine = JyxbEngine(load_model(pool_id, root, rates), players, seed=chunk_seed(master_seed, pool_id, chunk))
+    return engine.run(count)
+
+
+def build_table(root=PROJECT_ROOT, players=DEFAULT_PLAYERS, seed=DEFAULT_SEED, rates=None, count=10,
+                workers=None, only=None, chunk_size=CHUNK_SIZE, verbose=True):
+    repo = get_repository(root)
+    issues = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for pool_id in repo.ids('jyxb'):
+            if only and pool_id not in only:
+                continue
+            model = load_model(pool_id, root, rates)
+            futures = [executor.submit(simulate_chunk, root, pool_id, min(chunk_size, players - start), seed,
+                                       chunk, rates, count)
+                       for chunk, start in enumerate(range(0, players, chunk_size))]
+            # 按分块序号拼接，结果与进程数无关
+            parts = [future.result() for future in futures]
+            pulls = np.concatenate([part[0] for part in parts])
+            first_a = np.concatenate([part[1] for part in parts])
+            resources = np.concatenate([part[2] for part in parts], axis=1)
+            spent = pulls * model.pull_cost
+            issues[f"JYXB/{pool_id}"] = {
+                'cost': model.pull_cost,
+                'cost_type': model.cost_type,
+                'rules': model.rules,
+                'items': model.n_keys,
+                'pulls': rounded_summary(pulls),
+                'spent': rounded_summary(spent),
+                'firstA': rounded_summary(first_a),
+                'resources': {name: rounded_summary(values) for name, values in zip(model.resources, resources)},
+            }
+            if verbose:
+                print(f"  ✓ {pool_id}: 平均 {pulls.mean():.1f} 抽集齐 {model.n_keys} 个奇珍，"
+                      f"花费 {spent.mean():.0f} {model.cost_type}")
+    return {
+        'comment': '鉴影寻宝每期从零开始抽取直到拥有全部可选奇珍的抽数、花费、首个奇珍的抽数与附带资源。',
+        'seed': seed,
+        'players': players,
+        'count': count,
+        'percentiles': list(PERCENTILES),
+        'issues': issues,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='鉴影寻宝批量模拟：集齐每期奇珍的火漆花费')
+    parser.add_argument('issues', nargs='*', help='只模拟这些期数 ID（如 JYXB12），默认为 JYXB/list.json 中的全部')
+    parser.add_argument('--players', type=int, default=DEFAULT_PLAYERS, help='每期模拟的玩家数')
+    parser.add_argument('--rates', choices=['page', 'possibility'], default=None,
+                        help='page 使用页面中的概率，possibility 使用 possibility.json，默认按每期规则')
+    parser.add_argument('--count', type=int, default=10, choices=[1, 10], help='单抽或十连')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='主随机种子')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='输出 JSON 路径')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        table = build_table(PROJECT_ROOT, args.players, args.seed, args.rates, args.count, args.workers,
+                            set(args.issues) or None)
+    except ValueError as e:
+        print(f"规则错误: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"已模拟 {len(table['issues'])} 期，每期 {args.players} 名玩家，耗时 {elapsed:.1f}s")
+    print(f"输出文件: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
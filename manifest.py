@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data):
+    """文件内容哈希"""
+    return hashlib.sha1(data).hexdigest()
+
+
+class Manifest:
+    """
+    记录 路径 → (大小, 修改时间, 内容哈希, 是否含远程链接)，用于增量处理：
+    大小与修改时间未变且不含远程链接的文件无需再次打开
+    """
+
+    def __init__(self, path, root):
+        self.path = path
+        self.root = root
+        self.entries = {}
+        self.seen = set()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get('version') == MANIFEST_VERSION:
+            self.entries = data.get('files', {})
+
+    def key(self, file_path):
+        return os.path.relpath(file_path, self.root).replace(os.sep, '/')
+
+    def is_clean(self, file_path, st=None):
+        """大小与修改时间都没变，且上次处理后已不含远程链接"""
+        key = self.key(file_path)
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry is None or entry['remote']:
+            return False
+        st = st or os.stat(file_path)
+        return entry['size'] == st.st_size and entry['mtime'] == st.st_mtime_ns
+
+    def is_known_clean(self, file_path, data):
+        """修改时间变了但内容哈希相同且不含远程链接，只需刷新记录"""
+        entry = self.entries.get(self.key(file_path))
+        if entry is None or entry['remote'] or entry['hash'] != hash_bytes(data):
+            return False
+        self.record(file_path, data, False)
+        return True
+
+    def record(self, file_path, data, remote):
+        st = os.stat(file_path)
+        key = self.key(file_path)
+        self.seen.add(key)
+        self.entries[key] = {
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'hash': hash_bytes(data),
+            'remote': bool(remote),
+        }
+        self.dirty = True
+
+    def prune(self):
+        """移除本次运行没有见到的文件（已删除或被排除）"""
+        missing = set(self.entries) - self.seen
+        for key in missing:
+            del self.entries[key]
+        if missing:
+            self.dirty = True
+
+    def save(self):
+        """先写临时文件再原子替换，中断时不会留下损坏的清单"""
+        self.prune()
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, f,
+                      ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def default_manifest_path(root, name):
+    """清单统一放在 .cache 目录下，按脚本区分"""
+    return os.path.join(root, '.cache', f'{name}_manifest.json')
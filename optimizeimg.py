@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import glob
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from manifest import Manifest, default_manifest_path
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖，只有本脚本需要
+    Image = None
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+VARIANT_DIR = os.path.join('img', 'variants')
+
+# 变体名称 → 最长边像素，抽卡结果卡片用 thumb，详情/拥有物品弹窗用 display
+VARIANTS = {
+    'thumb': 160,
+    'display': 480,
+}
+WEBP_QUALITY = 80
+# method 6 只小约 4%，但编码慢二三十倍
+WEBP_METHOD = 4
+
+# 需要处理的物品数据文件
+DATA_PATTERNS = [
+    'pools/*/pool.json',
+    'XYZT/*/pool.json',
+    'JYXB/*/pool.json',
+    'store/goods.json',
+]
+
+
+def find_data_files(root):
+    files = []
+    for pattern in DATA_PATTERNS:
+        files.extend(sorted(glob.glob(os.path.join(root, pattern))))
+    return files
+
+
+def iter_item_records(data):
+    """递归找出所有带本地 img 字段的物品记录"""
+    if isinstance(data, dict):
+        img = data.get('img')
+        if isinstance(img, str) and img.startswith('./img/'):
+            yield data
+        for value in data.values():
+            yield from iter_item_records(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from iter_item_records(value)
+
+
+def variant_stem(img):
+    """
+    变体文件名前缀保留源文件扩展名（abc.png → abc-png），
+    否则 abc.png 与 abc.jpg 会写到同一个 abc-thumb.webp 上互相覆盖
+    """
+    stem, ext = os.path.splitext(os.path.basename(img))
+    return f"{stem}-{ext[1:]}" if ext else stem
+
+
+def variant_paths(img):
+    """./img/abc.png → {'thumb': {'webp': './img/variants/abc-png-thumb.webp', 'png': ...}, ...}"""
+    stem = variant_stem(img)
+    return {
+        name: {fmt: f"./img/variants/{stem}-{name}.{fmt}" for fmt in ('webp', 'png')}
+        for name in VARIANTS
+    }
+
+
+def _save_atomic(image, path, **options):
+    tmp_path = path + '.tmp'
+    image.save(tmp_path, **options)
+    os.replace(tmp_path, path)
+
+
+def render_variants(src_path, out_dir):
+    """在工作进程中生成一张图片的全部变体，返回 (源文件, 错误信息或 None)"""
+    try:
+        stem = variant_stem(src_path)
+        with Image.open(src_path) as source:
+            source.load()
+            if source.mode not in ('RGB', 'RGBA'):
+                source = source.convert('RGBA')
+            for name, size in VARIANTS.items():
+                image = source.copy()
+                # thumbnail 保持比例且不会放大小图
+                image.thumbnail((size, size), Image.LANCZOS)
+                base = os.path.join(out_dir, f"{stem}-{name}")
+                _save_atomic(image, base + '.webp', format='WEBP', quality=WEBP_QUALITY,
+                             method=WEBP_METHOD)
+                # PNG 兜底量化为 256 色调色板，体积约为真彩色的四分之一
+                palette = image.quantize(256, method=Image.Quantize.FASTOCTREE)
+                _save_atomic(palette, base + '.png', format='PNG', optimize=True)
+        return src_path, None
+    except Exception as e:
+        return src_path, str(e)
+
+
+def outputs_exist(root, img):
+    return all(os.path.exists(os.path.join(root, path))
+               for formats in variant_paths(img).values() for path in formats.values())
+
+
+def collect_images(root, data_files):
+    """读取数据文件，返回 ({文件: 数据}, 引用到的图片集合)"""
+    documents = {}
+    images = set()
+    for file_path in data_files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        documents[file_path] = data
+        for record in iter_item_records(data):
+            images.add(record['img'])
+    return documents, images
+
+
+def plan_work(root, images, manifest):
+    """
+    找出需要重新生成变体的图片：大小与修改时间没变或内容哈希没变，且变体都在时跳过。
+    返回 (待处理图片, 缺失的源图片)
+    """
+    pending = []
+    missing = []
+    for img in sorted(images):
+        src_path = os.path.join(root, img)
+        if not os.path.isfile(src_path):
+            missing.append(img)
+            continue
+        if not outputs_exist(root, img):
+            pending.append(img)
+            continue
+        if manifest.is_clean(src_path):
+            continue
+        with open(src_path, 'rb') as f:
+            data = f.read()
+        if not manifest.is_known_clean(src_path, data):
+            pending.append(img)
+    return pending, missing
+
+
+def update_records(documents, available):
+    """在物品记录的 img 旁写入 variants，内容不变的文件不写回。返回写回的文件数"""
+    written = 0
+    for file_path, data in documents.items():
+        for record in iter_item_records(data):
+            if record['img'] in available:
+                record['variants'] = variant_paths(record['img'])
+            else:
+                record.pop('variants', None)
+        output = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        with open(file_path, 'rb') as f:
+            original = f.read()
+        if output != original:
+            with open(file_path, 'wb') as f:
+                f.write(output)
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为物品图片生成缩略图与展示尺寸的 WebP/PNG 变体')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+    parser.add_argument('--full', action='store_true', help='忽略缓存，重新生成全部变体')
+    args = parser.parse_args()
+
+    if Image is None:
+        print("需要安装 Pillow: pip install Pillow")
+        return 1
+
+    start = time.perf_counter()
+    root = args.root
+    out_dir = os.path.join(root, VARIANT_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    documents, images = collect_images(root, find_data_files(root))
+    manifest = Manifest(default_manifest_path(root, 'optimizeimg'), root)
+    if args.full:
+        manifest.entries = {}
+    pending, missing = plan_work(root, images, manifest)
+    print(f"共引用 {len(images)} 张图片，需要处理 {len(pending)} 张，缺失 {len(missing)} 张")
+
+    failed = set()
+    try:
+        if pending:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                paths = [os.path.join(root, img) for img in pending]
+                results = executor.map(render_variants, paths, [out_dir] * len(paths),
+                                       chunksize=8)
+                for i, (img, (src_path, error)) in enumerate(zip(pending, results), 1):
+                    if error:
+                        print(f"  ✗ {img}: {error}")
+                        failed.add(img)
+                    else:
+                        with open(src_path, 'rb') as f:
+                            manifest.record(src_path, f.read(), False)
+                    if i % 100 == 0:
+                        print(f"  [{i}/{len(pending)}]")
+    finally:
+        manifest.save()
+
+    available = {img for img in images
+                 if img not in failed and img not in missing and outputs_exist(root, img)}
+    written = update_records(documents, available)
+
+    print(f"\n生成变体: {len(pending) - len(failed)} 张，失败 {len(failed)} 张")
+    print(f"更新数据文件: {written} 个，耗时 {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import os
+import re
+import sys
+import json
+import shutil
+import fnmatch
+import argparse
+import time
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from assetstore import ASSET_DIRS, IGNORED_SUFFIXES, REFERENCE_EXTENSIONS, find_reference_files, format_size
+from catalog import CATALOG_GLOB
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MOVE_DIR = 'orphans'
+
+# ./img/xxx、/img/xxx、img/xxx 与 /resource/xxx，允许子目录（如 fontawesome/css/all.min.css）。
+# 必须带扩展名，避免把注释里的 "img/type" 之类当成引用
+ASSET_REFERENCE_PATTERN = re.compile(
+    r'(?<![\w./-])\.?/?(?P<dir>img|resource)/(?P<path>[^"\'\s()<>?#\\`]+\.[A-Za-z0-9]+)(?![\w/])')
+# CSS 的 url(...)，可能是相对于样式表的路径
+CSS_URL_PATTERN = re.compile(r'url\(\s*([\'"]?)(?P<url>[^\'")]+)\1\s*\)')
+EXTERNAL_PREFIXES = ('data:', 'http:', 'https:', '//', '#', 'about:', 'blob:')
+# 脚本中的默认图片（如 jiusaiji.py 的 DEFAULT_ESSENCE_IMAGE）同样算作引用，
+# 但脚本里也有文档示例，只用来保留资源，不参与悬空引用检查
+SCRIPT_EXTENSIONS = {'.py'}
+SCAN_EXTENSIONS = REFERENCE_EXTENSIONS | SCRIPT_EXTENSIONS
+# 只在样式表与页面中解析 url()
+URL_EXTENSIONS = {'.css', '.html', '.htm'}
+# 列出全部文件的生成清单与物品目录，不能算作引用
+GENERATED_FILES = {'precache-manifest.json'}
+GENERATED_PATTERNS = (CATALOG_GLOB,)
+# 打包进 JS 的模板字符串，例如 tailwind 中的 url($1)
+TEMPLATE_CHARS = re.compile(r'[$`{}+]')
+
+
+def is_generated(rel_path):
+    """生成的清单与物品目录会列出全部资源，不参与引用扫描"""
+    rel_path = rel_path.replace(os.sep, '/')
+    return rel_path in GENERATED_FILES or any(fnmatch.fnmatch(rel_path, pattern)
+                                              for pattern in GENERATED_PATTERNS)
+
+
+def index_asset_tree(root):
+    """
+    只按路径建立资源索引，不打开任何图片。
+    返回 (所有文件的相对路径集合, 顶层文件 {相对路径: 大小})；子目录（fontawesome、variants、atlas）
+    由各自的工具维护，只参与悬空引用检查，不作为孤立资源候选
+    """
+    all_paths = set()
+    top_level = {}
+    for asset_dir in ASSET_DIRS:
+        folder = os.path.join(root, asset_dir)
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(IGNORED_SUFFIXES):
+                    rel_path = f"{asset_dir}/{entry.name}"
+                    all_paths.add(rel_path)
+                    top_level[rel_path] = entry.stat().st_size
+        for current, dirs, names in os.walk(folder):
+            if current == folder:
+                continue
+            rel_dir = os.path.relpath(current, root).replace(os.sep, '/')
+            all_paths.update(f"{rel_dir}/{name}" for name in names)
+    return all_paths, top_level
+
+
+def resolve_url(url, source_rel):
+    """把 CSS url() 解析为相对于根目录的路径，外部地址返回 None"""
+    url = url.strip().split('?')[0].split('#')[0]
+    if not url or url.startswith(EXTERNAL_PREFIXES) or TEMPLATE_CHARS.search(url):
+        return None
+    if url.startswith('/'):
+        return posixpath.normpath(url.lstrip('/'))
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_rel), url))
+
+
+def scan_file(root, path):
+    """读取一个文本文件，返回 (相对路径, [引用的相对路径])"""
+    rel_path = os.path.relpath(path, root).replace(os.sep, '/')
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+        content = f.read()
+    references = [f"{m.group('dir')}/{m.group('path')}" for m in ASSET_REFERENCE_PATTERN.finditer(content)]
+    if os.path.splitext(path)[1].lower() not in URL_EXTENSIONS:
+        return rel_path, references
+    for match in CSS_URL_PATTERN.finditer(content):
+        target = resolve_url(match.group('url'), rel_path)
+        if target is not None:
+            references.append(target)
+    return rel_path, references
+
+
+def build_reference_graph(root, workers=None, exclude_dir=DEFAULT_MOVE_DIR):
+    """
+    从项目中的 JSON/HTML/CSS/脚本出发并行扫描引用；被引用到的资源目录内样式表继续展开，
+    以便跟随其中的 url()。已移出的孤立资源目录不参与扫描。返回 {被引用路径: [引用它的文件]}
+    """
+    graph = {}
+    scanned = set()
+    excluded = os.path.join(root, exclude_dir) + os.sep
+    pending = [p for p in find_reference_files(root, SCAN_EXTENSIONS)
+               if not p.startswith(excluded) and not is_generated(os.path.relpath(p, root))]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        while pending:
+            scanned.update(pending)
+            next_pending = []
+            for rel_path, references in executor.map(lambda p: scan_file(root, p), pending):
+                for target in references:
+                    sources = graph.setdefault(target, [])
+                    if rel_path not in sources:
+                        sources.append(rel_path)
+                    target_path = os.path.join(root, target)
+                    if (target.endswith('.css') and target_path not in scanned
+                            and os.path.isfile(target_path)):
+                        scanned.add(target_path)
+                        next_pending.append(target_path)
+            pending = next_pending
+    return graph
+
+
+def find_orphans(top_level, graph):
+    """没有被任何文件引用的顶层资源，按大小降序"""
+    orphans = [(path, size) for path, size in top_level.items() if path not in graph]
+    orphans.sort(key=lambda item: (-item[1], item[0]))
+    return orphans
+
+
+def find_dangling(root, all_paths, graph):
+    """引用了不存在文件的位置。资源目录内查索引，其他路径（如 /fonts.ttf）才访问文件系统"""
+    dangling = {}
+    for target, sources in graph.items():
+        sources = [s for s in sources if os.path.splitext(s)[1].lower() not in SCRIPT_EXTENSIONS]
+        if not sources:
+            continue
+        if target.split('/', 1)[0] in ASSET_DIRS:
+            exists = target in all_paths
+        else:
+            exists = os.path.isfile(os.path.join(root, target))
+        if not exists:
+            dangling[target] = sorted(sources)
+    return dict(sorted(dangling.items()))
+
+
+def move_orphans(root, orphans, move_dir):
+    """把孤立资源移到 move_dir 下，保留 img/、resource/ 目录结构，可以原样移回"""
+    for rel_path, _ in orphans:
+        dst_path = os.path.join(move_dir, rel_path)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.move(os.path.join(root, rel_path), dst_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='找出 img/ 与 resource/ 中没有被引用的资源，并检查悬空引用')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    parser.add_argument('--move', nargs='?', const=DEFAULT_MOVE_DIR, default=None, metavar='DIR',
+                        help=f'把孤立资源移出到该目录（默认 {DEFAULT_MOVE_DIR}/，相对于根目录）')
+    parser.add_argument('--report', default=None, help='把结果写成 JSON 报告')
+    parser.add_argument('--workers', type=int, default=None, help='并行扫描线程数')
+    parser.add_argument('--quiet', action='store_true', help='不逐个列出孤立资源')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    root = args.root
+    all_paths, top_level = index_asset_tree(root)
+    graph = build_reference_graph(root, args.workers, args.move or DEFAULT_MOVE_DIR)
+    orphans = find_orphans(top_level, graph)
+    dangling = find_dangling(root, all_paths, graph)
+    elapsed = time.perf_counter() - start
+
+    orphan_bytes = sum(size for _, size in orphans)
+    if not args.quiet:
+        for rel_path, size in orphans:
+            print(f"  {format_size(size):>10}  {rel_path}")
+    print(f"资源 {len(top_level)} 个，被引用 {len(top_level) - len(orphans)} 个，"
+          f"孤立 {len(orphans)} 个 ({format_size(orphan_bytes)})，耗时 {elapsed:.2f}s")
+
+    if dangling:
+        print(f"\n❌ 发现 {len(dangling)} 个悬空引用:")
+        for target, sources in dangling.items():
+            print(f"  {target}  ← {', '.join(sources[:3])}{' …' if len(sources) > 3 else ''}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({
+                'assets': len(top_level),
+                'orphans': [{'path': p, 'size': s} for p, s in orphans],
+                'orphanBytes': orphan_bytes,
+                'dangling': dangling,
+                'seconds': round(elapsed, 3),
+            }, f, ensure_ascii=False, indent=2)
+
+    if args.move and orphans:
+        if dangling:
+            # 引用图不完整时移动文件可能误伤，先修复悬空引用
+            print("存在悬空引用，未移动任何文件")
+        else:
+            move_dir = os.path.join(root, args.move)
+            move_orphans(root, orphans, move_dir)
+            print(f"已移动 {len(orphans)} 个文件到 {move_dir}")
+
+    return 1 if dangling else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import threading
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 奖池类别 → (目录, 列表文件)
+SOURCES = {
+    'pools': ('pools', os.path.join('more', 'list.json')),
+    'xyzt': ('XYZT', os.path.join('XYZT', 'list.json')),
+    'jyxb': ('JYXB', os.path.join('JYXB', 'list.json')),
+}
+STORE_PATH = os.path.join('store', 'goods.json')
+
+# 单独存放在槽位中的字段，其余字段按原顺序放进 extra
+CORE_FIELDS = ('name', 'img', 'type', 'rarity', 'description', 'repeat')
+_MISSING = object()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Item:
+    """
+    紧凑的物品记录。type、rarity 与字段顺序都经过驻留，
+    仓库内内容相同的物品只保存一份
+    """
+
+    __slots__ = ('name', 'img', 'type', 'rarity', 'description', 'repeat', 'extra', 'layout')
+
+    def __init__(self, name, img, type, rarity, description, repeat, extra, layout):
+        self.name = name
+        self.img = img
+        self.type = type
+        self.rarity = rarity
+        self.description = description
+        self.repeat = repeat
+        self.extra = extra
+        self.layout = layout
+
+    @property
+    def key(self):
+        """与 V1.html 的 getItemKey 一致"""
+        return f"{self.name}|{self.type}|{self.img or ''}"
+
+    def get(self, field, default=None):
+        if field in CORE_FIELDS:
+            value = getattr(self, field)
+            return default if value is _MISSING else value
+        for key, value in self.extra:
+            if key == field:
+                return value
+        return default
+
+    def to_dict(self):
+        """按原字段顺序还原为字典，组内推断出的 rarity 不会写回"""
+        extra = dict(self.extra)
+        result = {}
+        for field in self.layout:
+            result[field] = getattr(self, field) if field in CORE_FIELDS else extra[field]
+        return result
+
+    def __repr__(self):
+        return f"Item({self.name!r}, {self.type!r}, {self.rarity!r})"
+
+
+class Pool:
+    """
+    一个奖池：列表条目、去掉 items 的配置，以及按文件顺序排列的物品。
+    groups 保留 pool.json 中按稀有度分组的原始分组（幸运之骰没有分组）
+    """
+
+    __slots__ = ('id', 'kind', 'entry', 'path', 'config', 'items', 'groups', 'frame_item', '_repo')
+
+    def __init__(self, repo, kind, pool_id, entry, path, config, items, groups, frame_item):
+        self._repo = repo
+        self.kind = kind
+        self.id = pool_id
+        self.entry = entry
+        self.path = path
+        self.config = config
+        self.items = items
+        self.groups = groups
+        self.frame_item = frame_item
+
+    @property
+    def name(self):
+        return self.entry.get('name') or self.config.get('name') or self.id
+
+    @property
+    def probabilities(self):
+        """possibility.json 中的概率表（幸运之骰为含 tiers 的整个文件），首次访问时才读取"""
+        data = self._repo.read_json(os.path.join(self.path, 'possibility.json'))
+        return data.get('probabilities', data)
+
+    def by_rarity(self):
+        groups = {}
+        for item in self.items:
+            groups.setdefault(item.rarity, []).append(item)
+        return groups
+
+    def __repr__(self):
+        return f"Pool({self.kind!r}, {self.id!r}, {len(self.items)} items)"
+
+
+class PoolRepository:
+    """
+    奖池数据的共享访问层：从各 list.json 发现奖池，按需加载并缓存。
+    每个文件在进程内只解析一次，相同的物品记录在所有奖池间共用
+    """
+
+    def __init__(self, root=PROJECT_ROOT):
+        self.root = root
+        self._lock = threading.RLock()
+        self._json = {}
+        self._pools = {}
+        self._items = {}
+        self._layouts = {}
+        self._store = None
+
+    def read_json(self, path):
+        """解析并缓存小型 JSON 文件（列表、概率表），路径相对于根目录或为绝对路径"""
+        path = os.path.join(self.root, path)
+        with self._lock:
+            if path not in self._json:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._json[path] = json.load(f)
+            return self._json[path]
+
+    def entries(self, kind='pools'):
+        """列表文件中的奖池条目，列表不存在时为空"""
+        folder, list_path = SOURCES[kind]
+        try:
+            return self.read_json(list_path)
+        except FileNotFoundError:
+            return []
+
+    def ids(self, kind='pools'):
+        return [entry['id'] for entry in self.entries(kind)]
+
+    def entry(self, pool_id, kind='pools'):
+        for entry in self.entries(kind):
+            if entry.get('id') == pool_id:
+                return entry
+        return {}
+
+    def get(self, pool_id, kind='pools'):
+        """加载单个奖池，目录存在但不在列表中的奖池（如 jiusaiji）同样可以加载"""
+        key = (kind, pool_id)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._load_pool(kind, pool_id)
+                self._pools[key] = pool
+            return pool
+
+    def pools(self, kind='pools'):
+        """按列表顺序遍历奖池，跳过缺少 pool.json 的条目"""
+        folder = SOURCES[kind][0]
+        for pool_id in self.ids(kind):
+            if os.path.exists(os.path.join(self.root, folder, pool_id, 'pool.json')):
+                yield self.get(pool_id, kind)
+
+    def all_pools(self):
+        for kind in SOURCES:
+            yield from self.pools(kind)
+
+    def store_items(self):
+        """商店商品，缺少 rarity 时视为 B"""
+        with self._lock:
+            if self._store is None:
+                path = os.path.join(self.root, STORE_PATH)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        goods = json.load(f)
+                except FileNotFoundError:
+                    goods = []
+                self._store = tuple(self._make_item(g, 'B') for g in goods if isinstance(g, dict))
+            return self._store
+
+    def unique_items(self):
+        """已加载的所有不同物品"""
+        with self._lock:
+            return list(self._items.values())
+
+    def invalidate(self, pool_id=None, kind='pools'):
+        """文件被修改后丢弃缓存；不带参数时清空全部"""
+        with self._lock:
+            if pool_id is None:
+                self._json.clear()
+                self._pools.clear()
+                self._store = None
+            else:
+                self._pools.pop((kind, pool_id), None)
+                folder = SOURCES[kind][0]
+                self._json.pop(os.path.join(self.root, folder, pool_id, 'possibility.json'), None)
+
+    def _load_pool(self, kind, pool_id):
+        folder = SOURCES[kind][0]
+        path = os.path.join(self.root, folder, pool_id)
+        with open(os.path.join(path, 'pool.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        raw_items = data.pop('items', {})
+        items = []
+        groups = {}
+        if isinstance(raw_items, dict):
+            for key, value in raw_items.items():
+                if isinstance(value, list):
+                    # 按稀有度分组
+                    groups[key] = tuple(self._make_item(i, key) for i in value if isinstance(i, dict))
+                    items.extend(groups[key])
+                elif isinstance(value, dict):
+                    # 幸运之骰以物品名为键
+                    items.append(self._make_item({'name': key, **value}, ''))
+
+        frame_item = None
+        frame = data.get('frameSettings') or {}
+        if frame.get('enabled') and isinstance(frame.get('item'), dict):
+            frame_item = self._make_item(frame['item'], 'F')
+        return Pool(self, kind, pool_id, self.entry(pool_id, kind), path, data, tuple(items),
+                    groups, frame_item)
+
+    def _make_item(self, data, rarity):
+        """构造并驻留物品记录，内容完全相同时返回已有对象"""
+        layout = tuple(data)
+        layout = self._layouts.setdefault(layout, tuple(sys.intern(k) for k in layout))
+        extra = tuple((k, v) for k, v in data.items() if k not in CORE_FIELDS)
+        fields = [_intern(data.get(f, _MISSING)) for f in CORE_FIELDS]
+        if fields[3] is _MISSING or not fields[3]:
+            fields[3] = _intern(rarity)
+        try:
+            key = (*fields, json.dumps(extra, ensure_ascii=False, sort_keys=True), layout)
+        except TypeError:
+            key = None
+        if key is not None:
+            item = self._items.get(key)
+            if item is not None:
+                return item
+        item = Item(*fields, extra, layout)
+        if key is not None:
+            self._items[key] = item
+        return item
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(root=PROJECT_ROOT):
+    """进程内按根目录共享的仓库实例"""
+    root = os.path.abspath(root)
+    with _repositories_lock:
+        repo = _repositories.get(root)
+        if repo is None:
+            repo = PoolRepository(root)
+            _repositories[root] = repo
+        return repo
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import time
+from urllib.parse import quote
+
+from assetstore import IGNORED_SUFFIXES, format_size
+from manifest import Manifest, default_manifest_path
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+PRECACHE_VERSION = 1
+OUTPUT_NAME = 'precache-manifest.json'
+SERVICE_WORKER_NAME = 'sw.js'
+
+# 页面离线运行需要的文件：页面、数据、样式脚本、图片与字体
+PRECACHE_EXTENSIONS = {
+    '.html', '.json', '.md', '.css', '.js',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.ico',
+    '.ttf', '.woff', '.woff2',
+}
+EXCLUDE_DIRS = {'.git', '.cache', '__pycache__', 'node_modules', 'orphans'}
+# fontawesome 的源码与单独图标页面不会用到，只保留 css 与 webfonts
+EXCLUDE_PATHS = {
+    'resource/fontawesome/js',
+    'resource/fontawesome/less',
+    'resource/fontawesome/metadata',
+    'resource/fontawesome/scss',
+    'resource/fontawesome/sprites',
+    'resource/fontawesome/svgs',
+}
+# 清单与 Service Worker 本身由浏览器单独检查更新
+EXCLUDE_FILES = {OUTPUT_NAME, SERVICE_WORKER_NAME}
+# 物品图片总量较大，安装时不下载，首次用到时再缓存；内容未变的图片跨版本保留
+LAZY_PREFIXES = ['/img/']
+HASH_LENGTH = 16
+
+
+def find_precache_files(root):
+    """列出需要预缓存的文件，返回按相对路径排序的列表"""
+    files = []
+    for current, dirs, names in os.walk(root):
+        rel_dir = os.path.relpath(current, root).replace(os.sep, '/')
+        rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+        dirs[:] = sorted(d for d in dirs
+                         if d not in EXCLUDE_DIRS and not d.startswith('.')
+                         and rel_dir + d not in EXCLUDE_PATHS)
+        for name in names:
+            rel_path = rel_dir + name
+            if rel_path in EXCLUDE_FILES or name.endswith(IGNORED_SUFFIXES):
+                continue
+            if os.path.splitext(name)[1].lower() in PRECACHE_EXTENSIONS:
+                files.append(rel_path)
+    return sorted(files)
+
+
+def file_entry(root, rel_path, manifest):
+    """借助哈希索引得到 (内容哈希, 大小)，大小与修改时间不变时不读文件"""
+    path = os.path.join(root, rel_path)
+    if not manifest.is_clean(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        manifest.record(path, data, False)
+    entry = manifest.entries[manifest.key(path)]
+    return entry['hash'][:HASH_LENGTH], entry['size']
+
+
+def build_precache(root, manifest):
+    """
+    生成预缓存清单：{'version', 'lazy', 'files': {URL 路径: [内容哈希, 大小]}}。
+    version 只由文件列表与内容决定，内容不变时重复构建得到相同结果
+    """
+    files = {}
+    for rel_path in find_precache_files(root):
+        files['/' + quote(rel_path)] = list(file_entry(root, rel_path, manifest))
+    digest = hashlib.sha1(f"{PRECACHE_VERSION}|".encode('utf-8'))
+    digest.update(json.dumps(files, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    return {
+        'version': digest.hexdigest()[:HASH_LENGTH],
+        'lazy': LAZY_PREFIXES,
+        'files': files,
+    }
+
+
+def serialize(precache):
+    # 清单有几千条，紧凑格式可以明显减小每次检查更新的下载量
+    return json.dumps(precache, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def load_precache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return data if isinstance(data.get('files'), dict) else None
+
+
+def diff_precache(old, new):
+    """两个版本之间需要重新下载与可以删除的路径：返回 (新增, 变化, 删除)"""
+    old_files = old['files'] if old else {}
+    new_files = new['files']
+    added = sorted(set(new_files) - set(old_files))
+    removed = sorted(set(old_files) - set(new_files))
+    changed = sorted(path for path in set(new_files) & set(old_files)
+                     if new_files[path][0] != old_files[path][0])
+    return added, changed, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成离线预缓存清单（路径 → 内容哈希、大小），供 sw.js 与客户端增量更新')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    parser.add_argument('--output', default=None, help=f'清单路径，默认为根目录下的 {OUTPUT_NAME}')
+    parser.add_argument('--check', action='store_true', help='只检查清单是否最新，过期时返回 1')
+    parser.add_argument('--diff', default=None, metavar='OLD', help='与旧清单比较，列出需要更新的文件')
+    parser.add_argument('--full', action='store_true', help='忽略哈希索引，重新读取全部文件')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    root = args.root
+    output = args.output or os.path.join(root, OUTPUT_NAME)
+    manifest = Manifest(default_manifest_path(root, 'precache'), root)
+    if args.full:
+        manifest.entries = {}
+    try:
+        precache = build_precache(root, manifest)
+    finally:
+        manifest.save()
+
+    total = sum(size for _, size in precache['files'].values())
+    lazy = sum(size for path, (_, size) in precache['files'].items()
+               if any(path.startswith(prefix) for prefix in LAZY_PREFIXES))
+    print(f"预缓存 {len(precache['files'])} 个文件，共 {format_size(total)}"
+          f"（安装时下载 {format_size(total - lazy)}），版本 {precache['version']}")
+
+    current = load_precache(output)
+    previous = load_precache(args.diff) if args.diff else current
+    added, changed, removed = diff_precache(previous, precache)
+    if args.diff:
+        for label, paths in (('+', added), ('~', changed), ('-', removed)):
+            for path in paths:
+                print(f"  {label} {path}")
+    print(f"相对{'旧清单' if args.diff else '当前清单'}: 新增 {len(added)}，变化 {len(changed)}，删除 {len(removed)}")
+
+    up_to_date = current is not None and current.get('version') == precache['version']
+    if args.check:
+        print("清单已是最新" if up_to_date else f"清单已过期，请运行 python {os.path.basename(__file__)}")
+        return 0 if up_to_date else 1
+    if not up_to_date:
+        tmp_path = output + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(serialize(precache))
+        os.replace(tmp_path, output)
+        print(f"已写入 {os.path.relpath(output, root)}")
+    print(f"耗时 {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+import os
+import sys
+import json
+import glob
+import struct
+import argparse
+from array import array
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SPEC_PATH = os.path.join(PROJECT_ROOT, 'more', 'probspec.json')
+SPEC_VERSION = 1
+
+# 按数组展开的稀有度，其余键（C_chance、D_chance）为标量
+CURVE_TIERS = ['S', 'A', 'B', 'F']
+DIGITS = 6
+
+BINARY_MAGIC = b'PSPC'
+BINARY_VERSION = 1
+
+
+class SpecError(Exception):
+    """概率描述文件格式错误"""
+
+
+def _value(slope, intercept, n):
+    if slope == 0:
+        # 常数段原样返回：保留整数 0 的写法，也保留 1e-20 这类极小概率
+        return intercept
+    return round(slope * n + intercept, DIGITS)
+
+
+def expand_curve(curve):
+    """
+    把曲线描述展开为数组。segments 为 [[结束抽数, 斜率, 截距], ...]，
+    第 n 抽的概率为 斜率 * n + 截距；last 给出时作为最后一抽（硬保底）的概率
+    """
+    length = curve['length']
+    last = curve.get('last')
+    values = []
+    n = 1
+    for end, slope, intercept in curve['segments']:
+        if end < n:
+            raise SpecError(f"分段结束位置 {end} 不能小于起点 {n}")
+        while n <= end:
+            values.append(_value(slope, intercept, n))
+            n += 1
+    if last is not None:
+        values.append(last)
+    if len(values) != length:
+        raise SpecError(f"曲线长度应为 {length}，分段展开后为 {len(values)}")
+    return values
+
+
+def fit_curve(values):
+    """贪心地把数组拆成尽量少的线性分段，expand_curve(fit_curve(v)) == v"""
+    values = list(values)
+    curve = {'length': len(values)}
+    body = values
+    if len(values) > 1 and values[-1] == 1.0 and values[-2] != 1.0:
+        body = values[:-1]
+        curve['last'] = values[-1]
+
+    segments = []
+    i = 0
+    while i < len(body):
+        n = i + 1
+        if i + 1 < len(body):
+            slope = round(body[i + 1] - body[i], DIGITS + 3)
+            intercept = round(body[i] - slope * n, DIGITS + 3)
+        else:
+            slope, intercept = 0, body[i]
+        if slope == 0 or _value(slope, intercept, n) != body[i]:
+            slope, intercept = 0, body[i]
+        end = i
+        while end + 1 < len(body) and _value(slope, intercept, end + 2) == body[end + 1]:
+            end += 1
+        segments.append([end + 1, slope, intercept])
+        i = end + 1
+    curve['segments'] = segments
+    return curve
+
+
+def load_spec(path=SPEC_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    if spec.get('version') != SPEC_VERSION:
+        raise SpecError(f"不支持的描述文件版本: {spec.get('version')}")
+    return spec
+
+
+def resolve_family(spec, pool_id):
+    """池子条目可以是家族名，也可以是 {"family": 名称, 覆盖的键...}"""
+    entry = spec['pools'][pool_id]
+    if isinstance(entry, str):
+        entry = {'family': entry}
+    family = spec['families'].get(entry['family'])
+    if family is None:
+        raise SpecError(f"{pool_id}: 未知的概率家族 {entry['family']}")
+    resolved = dict(family)
+    resolved.update({k: v for k, v in entry.items() if k != 'family'})
+    return resolved
+
+
+def compile_pool(spec, pool_id):
+    """展开为 possibility.json 的内容，键顺序与原文件一致"""
+    family = resolve_family(spec, pool_id)
+    probabilities = {}
+    for key, value in family.items():
+        if isinstance(value, str):
+            curve = spec['curves'].get(value)
+            if curve is None:
+                raise SpecError(f"{pool_id}: 未知的曲线 {value}")
+            probabilities[key] = expand_curve(curve)
+        else:
+            probabilities[key] = value
+    return {'comment': spec['comment'], 'probabilities': probabilities}
+
+
+def encode_possibility(data):
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def possibility_path(root, pool_id):
+    return os.path.join(root, 'pools', pool_id, 'possibility.json')
+
+
+def curve_name(tier, values, used):
+    """可读的曲线名：稀有度 + 长度，常数曲线附上取值"""
+    body = values[:-1] if len(values) > 1 and values[-1] == 1.0 else values
+    name = f"{tier}{len(values)}"
+    if body and all(v == body[0] for v in body):
+        name += f"-{body[0]}"
+    candidate, suffix = name, 2
+    while candidate in used:
+        candidate = f"{name}-{suffix}"
+        suffix += 1
+    return candidate
+
+
+def infer_spec(root):
+    """从现有的 possibility.json 归纳出曲线、家族与池子映射"""
+    curves = {}
+    curve_ids = {}
+    families = {}
+    family_ids = {}
+    pools = {}
+    comment = None
+
+    for path in sorted(glob.glob(os.path.join(root, 'pools', '*', 'possibility.json'))):
+        pool_id = os.path.basename(os.path.dirname(path))
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        comment = comment if comment is not None else data.get('comment', '')
+
+        family = {}
+        for key, value in data['probabilities'].items():
+            if key in CURVE_TIERS and isinstance(value, list):
+                signature = (key, json.dumps(value))
+                if signature not in curve_ids:
+                    name = curve_name(key, value, curves)
+                    curve_ids[signature] = name
+                    curves[name] = fit_curve(value)
+                family[key] = curve_ids[signature]
+            else:
+                family[key] = value
+
+        signature = json.dumps(family, sort_keys=False)
+        if signature not in family_ids:
+            kind = 'rank' if 'F' in family else 'essence'
+            name = f"{kind}-{family.get('B', '')}-c{family.get('C_chance')}-d{family.get('D_chance')}"
+            family_ids[signature] = name
+            families[name] = family
+        pools[pool_id] = family_ids[signature]
+
+    return {
+        'version': SPEC_VERSION,
+        'comment': comment or '',
+        'curves': curves,
+        'families': families,
+        'pools': pools,
+    }
+
+
+def write_spec(spec, path=SPEC_PATH):
+    """曲线与家族每项一行，新增赛季只需在 pools 里加一行"""
+    lines = ['{']
+    lines.append(f'  "version": {spec["version"]},')
+    lines.append(f'  "comment": {json.dumps(spec["comment"], ensure_ascii=False)},')
+    for section in ('curves', 'families', 'pools'):
+        lines.append(f'  "{section}": {{')
+        entries = [f'    {json.dumps(key, ensure_ascii=False)}: '
+                   f'{json.dumps(value, ensure_ascii=False, separators=(", ", ": "))}'
+                   for key, value in spec[section].items()]
+        lines.append(',\n'.join(entries))
+        lines.append('  },' if section != 'pools' else '  }')
+    lines.append('}')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def compile_all(spec, root, write=True):
+    """展开全部池子，内容不同才写回。返回 (写回的池子, 缺失目录的池子)"""
+    written = []
+    missing = []
+    for pool_id in spec['pools']:
+        path = possibility_path(root, pool_id)
+        if not os.path.isdir(os.path.dirname(path)):
+            missing.append(pool_id)
+            continue
+        data = encode_possibility(compile_pool(spec, pool_id))
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    continue
+        except OSError:
+            pass
+        if write:
+            with open(path, 'wb') as f:
+                f.write(data)
+        written.append(pool_id)
+    return written, missing
+
+
+def diff_probabilities(expected, actual):
+    """逐键比较，返回差异描述列表"""
+    differences = []
+    for key in sorted(set(expected) | set(actual)):
+        if key not in actual:
+            differences.append(f"缺少 {key}")
+        elif key not in expected:
+            differences.append(f"多出 {key}")
+        elif isinstance(expected[key], list) and isinstance(actual[key], list):
+            if len(expected[key]) != len(actual[key]):
+                differences.append(f"{key} 长度 {len(actual[key])}，应为 {len(expected[key])}")
+            for i, (e, a) in enumerate(zip(expected[key], actual[key])):
+                if e != a:
+                    differences.append(f"{key}[{i}] = {a}，应为 {e}")
+                    break
+        elif expected[key] != actual[key]:
+            differences.append(f"{key} = {actual[key]}，应为 {expected[key]}")
+    return differences
+
+
+def verify(spec, root):
+    """对比现有文件与描述展开的结果，返回 {池子: 差异列表}"""
+    problems = {}
+    spec_pools = set(spec['pools'])
+    for path in sorted(glob.glob(os.path.join(root, 'pools', '*', 'possibility.json'))):
+        pool_id = os.path.basename(os.path.dirname(path))
+        if pool_id not in spec_pools:
+            problems[pool_id] = ["描述文件中没有此池子"]
+            continue
+        with open(path, 'rb') as f:
+            raw = f.read()
+        expected = compile_pool(spec, pool_id)
+        if raw == encode_possibility(expected):
+            continue
+        actual = json.loads(raw)
+        differences = diff_probabilities(expected['probabilities'], actual.get('probabilities', {}))
+        if actual.get('comment') != expected['comment']:
+            differences.append("comment 不同")
+        problems[pool_id] = differences or ["格式不同（内容一致）"]
+    return problems
+
+
+def write_binary(spec, path):
+    """
+    紧凑的 Float32 表，小端序，曲线只存一份：
+    'PSPC' u32版本 u16曲线数 u32池子数；
+    每条曲线：u16长度 f32[长度]；
+    每个池子：u16长度+UTF-8 id，f32 C_chance，f32 D_chance，u8曲线数，
+    每条曲线引用：u8稀有度字符 u16曲线序号
+    """
+    names = list(spec['curves'])
+    curve_index = {name: i for i, name in enumerate(names)}
+    out = bytearray(BINARY_MAGIC)
+    out += struct.pack('<IHI', BINARY_VERSION, len(names), len(spec['pools']))
+    for name in names:
+        values = array('f', expand_curve(spec['curves'][name]))
+        if sys.byteorder != 'little':
+            values.byteswap()
+        out += struct.pack('<H', len(values)) + values.tobytes()
+    for pool_id in spec['pools']:
+        family = resolve_family(spec, pool_id)
+        encoded_id = pool_id.encode('utf-8')
+        out += struct.pack('<H', len(encoded_id)) + encoded_id
+        out += struct.pack('<ff', family.get('C_chance', 0), family.get('D_chance', 0))
+        tiers = [t for t in CURVE_TIERS if isinstance(family.get(t), str)]
+        out += struct.pack('<B', len(tiers))
+        for tier in tiers:
+            out += struct.pack('<BH', ord(tier), curve_index[family[tier]])
+    with open(path, 'wb') as f:
+        f.write(out)
+    return len(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='参数化的概率描述：归纳、展开与校验 possibility.json')
+    parser.add_argument('command', choices=['infer', 'compile', 'verify'],
+                        help='infer: 从现有文件生成描述; compile: 展开写回; verify: 对比差异')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    parser.add_argument('--spec', default=None, help='描述文件路径，默认为 more/probspec.json')
+    parser.add_argument('--binary', default=None, help='compile 时额外输出 Float32 二进制表')
+    parser.add_argument('--dry-run', action='store_true', help='compile 时只报告需要写回的池子')
+    args = parser.parse_args()
+
+    spec_path = args.spec or os.path.join(args.root, 'more', 'probspec.json')
+
+    if args.command == 'infer':
+        spec = infer_spec(args.root)
+        write_spec(spec, spec_path)
+        problems = verify(spec, args.root)
+        print(f"曲线 {len(spec['curves'])} 条，家族 {len(spec['families'])} 个，池子 {len(spec['pools'])} 个")
+        print(f"已写入 {spec_path}，往返校验{'通过' if not problems else '失败'}")
+        return 1 if problems else 0
+
+    spec = load_spec(spec_path)
+    if args.command == 'compile':
+        written, missing = compile_all(spec, args.root, write=not args.dry_run)
+        for pool_id in written:
+            print(f"  {'需要更新' if args.dry_run else '已更新'}: {pool_id}")
+        for pool_id in missing:
+            print(f"  跳过（没有池子目录）: {pool_id}")
+        print(f"展开 {len(spec['pools'])} 个池子，{'需要写回' if args.dry_run else '写回'} {len(written)} 个")
+        if args.binary:
+            size = write_binary(spec, args.binary)
+            print(f"二进制表: {args.binary} ({size} bytes)")
+        return 0
+
+    problems = verify(spec, args.root)
+    for pool_id, differences in problems.items():
+        print(f"✗ {pool_id}")
+        for difference in differences:
+            print(f"    {difference}")
+    print(f"校验 {len(spec['pools'])} 个池子，{len(problems)} 个不一致")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import zlib
+import argparse
+import time
+
+import numpy as np
+
+from collection import PERCENTILES, rounded_summary
+from engine import summarize
+from poolrepo import get_repository
+from sampler import OwnedSet
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'more', 'ranksim.json')
+
+# 稀有度编号按 V2.html 的 tierValue 排列，数值越大越稀有，硬保底的提升判断可以直接比较
+D, C, F, B, A, S = range(6)
+# 四个保底计数 pityGold / pityPurple / pityBlue / pityFrame 叠成一个 (4, 玩家) 数组，按此顺序判定
+PITY_RARITIES = 'SABF'
+PITY_CODES = np.array([S, A, B, F], dtype=np.int8)
+NO_PITY = np.iinfo(np.int32).max
+# 每个奖池需要集齐的稀有度
+TARGETS = ('S', 'SA')
+
+DEFAULT_ORDERS = 1000
+DEFAULT_PLAYERS = 100
+# 固定顺序只有几个，每个顺序使用更多玩家
+DEFAULT_NAMED_PLAYERS = 20000
+DEFAULT_SEED = 0
+MAX_SESSIONS = 100000
+# 十连消耗 10 个排位珍宝
+PULL_COST = 1
+
+
+def v2_table(values, fallback, length):
+    """
+    V2.html 按 p.X[pity - 1] || fallback 取概率：超出数组长度与值为 0 的位置都取 fallback。
+    所有奖池补齐到同一长度后叠成二维数组，按 (奖池, 计数) 一次查表
+    """
+    table = np.full(length, fallback, dtype=np.float64)
+    values = np.asarray(values or [], dtype=np.float64)[:length]
+    table[:len(values)] = np.where(values != 0, values, fallback)
+    return table
+
+
+def padded(rows, fill=-1):
+    width = max((len(row) for row in rows), default=0) or 1
+    array = np.full((len(rows), width), fill, dtype=np.int64)
+    for i, row in enumerate(rows):
+        array[i, :len(row)] = row
+    return array
+
+
+class RankModel:
+    """
+    全部排位珍宝叠在一起的参数表。每名玩家按自己的开启顺序处于不同的奖池，
+    所有按奖池区分的参数都以 (玩家所在奖池) 为下标批量取出
+    """
+
+    def __init__(self, pools, target='S'):
+        self.ids = [pool.id for pool in pools]
+        self.index = {pool_id: i for i, pool_id in enumerate(self.ids)}
+        self.target = target
+        n_pools = len(pools)
+
+        probabilities = [pool.probabilities for pool in pools]
+        length = max(len(p.get(r) or []) for p in probabilities for r in 'SABF') + 1
+        self.length = length
+        # 没有 F 数组的奖池不会随机出 F；有数组时超出部分取 F_chance
+        hazard = [[v2_table(p.get(rarity), 1.0, length) for p in probabilities] for rarity in 'SAB']
+        hazard.append([v2_table(p.get('F'), p.get('F_chance') or 0, length) if p.get('F') else np.zeros(length)
+                       for p in probabilities])
+        # (稀有度, 奖池, 计数) 展平后每抽用一次 take 取出四个概率
+        # 单精度足以表示这些概率，每抽处理的数据量减半
+        self.hazard = np.array(hazard, dtype=np.float32).ravel()
+        self.c_chance = np.array([p.get('C_chance') or 0 for p in probabilities], dtype=np.float32)
+
+        pity = [pool.config.get('pitySettings') or {} for pool in pools]
+        frames = [pool.config.get('frameSettings') or {} for pool in pools]
+        # 未启用 frameSettings 的奖池没有 F 硬保底，计数照常增加
+        self.caps = np.array([
+            [p.get('gold', 250) for p in pity],
+            [p.get('purple', 60) for p in pity],
+            [p.get('blue', 12) for p in pity],
+            [(f.get('pityThreshold') or 0) if f.get('enabled') else NO_PITY for f in frames],
+        ], dtype=np.int32)
+        # 出 F 时得到 frameSettings.item，没有配置物品的奖池不计入兑换卡
+        self.frame_item = np.array([pool.frame_item is not None for pool in pools])
+
+        discounts = [pool.config.get('discountInfo') or {} for pool in pools]
+        self.discount_chance = np.array([d.get('chance') or 0 for d in discounts])
+        self.discount_cost = np.array([np.floor(10 * PULL_COST * (d.get('rate') or 1.0) + 0.5)
+                                       for d in discounts], dtype=np.int64)
+        self.diff_A = np.array([pool.config.get('diff_A', 2) for pool in pools], dtype=np.int8)
+
+        # 物品在所有奖池间按 generateItemKey 统一编号，拥有状态跨奖池共享
+        keys, names = {}, {}
+        by_rarity = [pool.by_rarity() for pool in pools]
+        rows = {rarity: [[keys.setdefault(self.item_key(item, rarity), len(keys)) for item in groups.get(rarity, [])]
+                         for groups in by_rarity] for rarity in 'SA'}
+        self.n_keys = len(keys)
+        self.s_keys = padded(rows['S'])
+        self.s_count = np.array([len(row) for row in rows['S']], dtype=np.int64)
+        self.a_keys = padded(rows['A'])
+        self.a_count = np.array([len(row) for row in rows['A']], dtype=np.int64)
+        self.a_names = padded([[names.setdefault(item.name, len(names)) for item in groups.get('A', [])]
+                               for groups in by_rarity])
+        self.a_valid = np.arange(self.a_keys.shape[1]) < self.a_count[:, None]
+        # V2.html 的 diff_A=0 用物品模板自身的 rarity 生成 key 判断是否拥有，而拥有记录的 key
+        # 用的是抽出的稀有度，所以只有模板自带 rarity: "A" 的奇珍才能被识别为已拥有
+        self.a_checkable = padded([[int('rarity' in item.layout and item.rarity == 'A')
+                                    for item in groups.get('A', [])] for groups in by_rarity],
+                                  fill=0).astype(bool)
+        # 每个奖池的目标：拥有目标稀有度的全部物品
+        self.goal_keys = padded([sum((rows[r][i] for r in target), []) for i in range(n_pools)])
+        # 只有奇珍属于目标或规则依赖拥有/连续状态时才需要挑选具体的奇珍
+        self.track_a = 'A' in target or bool(np.isin(self.diff_A, (0, 1)).any())
+
+    def offsets(self, pools):
+        """(4, 玩家) 的展平下标起点，加上保底计数即为 hazard 中的位置"""
+        n_pools = len(self.ids)
+        rows = np.arange(len(PITY_RARITIES))[:, None] * n_pools + pools[None, :]
+        return rows * self.length - 1
+
+    @staticmethod
+    def item_key(item, rarity):
+        """与 V2.html 的 generateItemKey 一致，稀有度取最终抽出的稀有度"""
+        return f"{item.name}|{item.type}|{rarity}|{item.img or ''}"
+
+
+class RankEngine:
+    """
+    批量推进大量互相独立的玩家，每名玩家按自己的顺序依次开启排位珍宝，
+    在当前奖池达成目标后转到下一个。保底计数、折扣与奇珍规则状态按 V2.html 的 shared_pity_state 在奖池间共享
+    """
+
+    def __init__(self, model, orders, seed=None):
+        self.model = model
+        self.orders = np.asarray(orders, dtype=np.int64)
+        n_players, self.n_steps = self.orders.shape
+        self.n = n_players
+        self.rng = np.random.default_rng(seed)
+
+        self.player_ids = np.arange(n_players)
+        self.step = np.zeros(n_players, dtype=np.int64)
+        self.total = np.zeros(n_players, dtype=np.int64)
+        self.spent = np.zeros(n_players, dtype=np.int64)
+        self.frames = np.zeros(n_players, dtype=np.int64)
+        self.pity = np.zeros((len(PITY_RARITIES), n_players), dtype=np.int32)
+        self.discount = np.zeros(n_players, dtype=bool)
+        self.last_a_name = np.full(n_players, -1, dtype=np.int64)
+        self.consecutive_a = np.zeros(n_players, dtype=np.int32)
+        self.owned = OwnedSet(n_players, model.n_keys)
+        # 每一步完成时的累计花费，相邻两步之差即该奖池的花费
+        self.step_spent = np.zeros((n_players, self.n_steps), dtype=np.int64)
+
+    _STATE_FIELDS = ('player_ids', 'orders', 'step', 'total', 'spent', 'frames', 'discount', 'last_a_name',
+                     'consecutive_a', 'step_spent')
+
+    def compress(self, keep):
+        for field in self._STATE_FIELDS:
+            setattr(self, field, getattr(self, field)[keep])
+        self.pity = self.pity[:, keep]
+        self.owned.take(keep)
+        self.n = len(self.player_ids)
+
+    def current_pool(self):
+        return self.orders[np.arange(self.n), np.minimum(self.step, self.n_steps - 1)]
+
+    def _random_rarity(self, offsets, c_keep):
+        """
+        determineRandomRarity 依次用独立的随机数判定 S、A、B、F、C，等价于一个均匀随机数与累积阈值比较：
+        第 k 个阈值为 1 - prod(1 - p_1..p_k)，超过的阈值个数即稀有度从高到低的位次
+        """
+        model = self.model
+        keep = np.float32(1.0) - model.hazard.take(offsets + np.minimum(self.pity, model.length))
+        # u >= 1 - survival 等价于 1 - u <= survival，只需算一次 1 - u
+        v = np.float32(1.0) - self.rng.random(self.n, dtype=np.float32)
+        survival = keep[0]
+        rank = (v <= survival).astype(np.int8)
+        for row in keep[1:]:
+            survival = survival * row
+            rank += v <= survival
+        rank += v <= survival * c_keep
+        return S - rank
+
+    def _select_a(self, players, pools, u):
+        """
+        selectAItemBasedOnRules：候选物品不多，按 (玩家, 候选) 掩码一次挑选。
+        与页面一致只有 0/1/2 三种规则，其他取值（包括 V1 的 3）按 2 随机挑选；
+        规则 0 只排除模板自带 rarity: "A" 的已拥有物品，模板没有 rarity 时等同于随机
+        """
+        model = self.model
+        keys = model.a_keys[pools]
+        valid = model.a_valid[pools]
+        candidates = valid.copy()
+        diff = model.diff_A[pools]
+
+        unowned_rule = diff == 0
+        if unowned_rule.any():
+            checkable = model.a_checkable[pools]
+            for j in range(keys.shape[1]):
+                owned = self.owned.contains(players, np.maximum(keys[:, j], 0))
+                candidates[:, j] &= ~(unowned_rule & checkable[:, j] & owned)
+        last = self.last_a_name[players]
+        names = model.a_names[pools]
+        limited = (diff == 1) & (self.consecutive_a[players] >= 2) & (last >= 0)
+        if limited.any():
+            candidates &= ~(limited[:, None] & (names == last[:, None]))
+        empty = ~candidates.any(axis=1)
+        candidates[empty] = valid[empty]
+
+        k = (u * candidates.sum(axis=1)).astype(np.int64)
+        column = np.argmax(np.cumsum(candidates, axis=1) > k[:, None], axis=1)
+        rows = np.arange(len(players))
+        chosen, name = keys[rows, column], names[rows, column]
+
+        rule = diff == 1
+        if rule.any():
+            p, name = players[rule], name[rule]
+            same = name == self.last_a_name[p]
+            self.consecutive_a[p] = np.where(same, self.consecutive_a[p] + 1, 1)
+            self.last_a_name[p] = name
+        return chosen
+
+    def session(self, count=10):
+        """当前奖池中的一次单抽或十连"""
+        model = self.model
+        pools = self.current_pool()
+        if count == 10:
+            cost = np.where(self.discount, model.discount_cost[pools], 10 * PULL_COST)
+            self.discount[:] = False
+        else:
+            cost = np.full(self.n, PULL_COST * count, dtype=np.int64)
+        self.spent += cost
+        self.total += count
+
+        caps = model.caps[:, pools]
+        offsets = model.offsets(pools)
+        c_keep = np.float32(1.0) - model.c_chance[pools]
+        frame_item = model.frame_item[pools]
+        for _ in range(count):
+            self.pity += 1
+            r = self._random_rarity(offsets, c_keep)
+            # 硬保底在随机判定之后按 S > A > B > F 的顺序检查，只看第一个满足的条件且只会提升稀有度；
+            # 四者编号递减，第一个满足的条件就是满足条件中编号最大的
+            hard = (self.pity >= caps) * PITY_CODES[:, None]
+            r = np.maximum(r, hard.max(axis=0))
+
+            got_s = np.flatnonzero(r == S)
+            got_s = got_s[model.s_count[pools[got_s]] > 0]
+            if len(got_s):
+                column = (self.rng.random(len(got_s)) * model.s_count[pools[got_s]]).astype(np.int64)
+                self.owned.add(got_s, model.s_keys[pools[got_s], column])
+            if model.track_a:
+                got_a = np.flatnonzero(r == A)
+                got_a = got_a[model.a_count[pools[got_a]] > 0]
+                if len(got_a):
+                    chosen = self._select_a(got_a, pools[got_a], self.rng.random(len(got_a)))
+                    self.owned.add(got_a, chosen)
+            self.frames += (r == F) & frame_item
+
+            # 只重置抽到的稀有度自己的计数，S/A 不重置 F 计数
+            self.pity *= r != PITY_CODES[:, None]
+
+        # 每次抽取结束后判定折扣，已持有时不会重复获得
+        chance = model.discount_chance[pools]
+        if chance.any():
+            self.discount |= self.rng.random(self.n) < chance
+
+    def goal_met(self):
+        keys = self.model.goal_keys[self.current_pool()]
+        met = np.ones(self.n, dtype=bool)
+        players = np.arange(self.n)
+        for j in range(keys.shape[1]):
+            valid = keys[:, j] >= 0
+            met &= ~valid | self.owned.contains(players, np.maximum(keys[:, j], 0))
+        return met
+
+    def advance(self):
+        """达成目标的玩家转到下一个奖池；下一个奖池的目标已经拥有（跨奖池重复的物品）时直接跳过"""
+        while True:
+            active = self.step < self.n_steps
+            moving = active & self.goal_met()
+            if not moving.any():
+                return
+            players = np.flatnonzero(moving)
+            self.step_spent[players, self.step[players]] = self.spent[players]
+            self.step[players] += 1
+
+    def run(self, count=10, max_sessions=MAX_SESSIONS):
+        """返回每名玩家完成整个顺序时的 (每个奖池的花费, 抽数, 兑换卡数量)"""
+        n_total = self.n
+        step_cost = np.zeros((n_total, self.n_steps), dtype=np.int64)
+        pulls = np.zeros(n_total, dtype=np.int64)
+        frames = np.zeros(n_total, dtype=np.int64)
+        self.advance()
+        for _ in range(max_sessions):
+            done = self.step >= self.n_steps
+            if done.any():
+                ids = self.player_ids[done]
+                step_cost[ids] = np.diff(self.step_spent[done], axis=1, prepend=0)
+                pulls[ids] = self.total[done]
+                frames[ids] = self.frames[done]
+                self.compress(~done)
+            if self.n == 0:
+                break
+            self.session(count)
+            self.advance()
+        if self.n:
+            raise RuntimeError(f"{self.n} 名玩家在 {max_sessions} 次抽取内未完成")
+        return step_cost, pulls, frames
+
+
+def load_model(root=PROJECT_ROOT, target='S', only=None):
+    repo = get_repository(root)
+    pools = [pool for pool in repo.pools() if (pool.entry.get('version') or 'V1.html') == 'V2.html'
+             and (not only or pool.id in only)]
+    if not pools:
+        raise ValueError("没有找到 V2 排位珍宝")
+    return RankModel(pools, target)
+
+
+def named_orders(model):
+    """按赛季开放顺序、从新到旧两种常见顺序"""
+    chronological = list(range(len(model.ids)))
+    return {'chronological': chronological, 'reverse': chronological[::-1]}
+
+
+def order_seed(master_seed, name):
+    return np.random.SeedSequence(master_seed, spawn_key=(zlib.crc32(name.encode('utf-8')),))
+
+
+def simulate_orders(model, orders, players, seed, count=10):
+    """每个顺序模拟 players 名玩家，全部顺序放在同一批中推进；返回按顺序分组的结果"""
+    orders = np.asarray(orders, dtype=np.int64)
+    engine = RankEngine(model, np.repeat(orders, players, axis=0), seed=seed)
+    step_cost, pulls, frames = engine.run(count)
+    shape = (len(orders), players)
+    return step_cost.reshape(*shape, -1), pulls.reshape(shape), frames.reshape(shape)
+
+
+def describe_order(model, order, step_cost, spent, frames):
+    pool_cost = {}
+    for step, pool in enumerate(order):
+        pool_cost[model.ids[pool]] = round(float(step_cost[:, step].mean()), 2)
+    return {
+        'order': [model.ids[pool] for pool in order],
+        'spent': rounded_summary(spent),
+        'frames': rounded_summary(frames),
+        'pools': pool_cost,
+    }
+
+
+def build_table(root=PROJECT_ROOT, n_orders=DEFAULT_ORDERS, players=DEFAULT_PLAYERS,
+                named_players=DEFAULT_NAMED_PLAYERS, seed=DEFAULT_SEED, target='S', count=10, custom=None,
+                only=None, verbose=True):
+    model = load_model(root, target, only)
+    result = {
+        'comment': '按不同顺序开启排位珍宝、每个奖池获得目标稀有度全部物品为止的排位珍宝花费；保底计数在奖池间共享。',
+        'seed': seed,
+        'players': players,
+        'namedPlayers': named_players,
+        'target': target,
+        'count': count,
+        'percentiles': list(PERCENTILES),
+        'pools': model.ids,
+        'orders': {},
+    }
+
+    orders = named_orders(model)
+    if custom:
+        orders['custom'] = [model.index[pool_id] for pool_id in custom]
+    for name, order in orders.items():
+        step_cost, spent, frames = simulate_orders(model, [order], named_players, order_seed(seed, name), count)
+        result['orders'][name] = describe_order(model, order, step_cost[0], spent.ravel(), frames.ravel())
+        if verbose:
+            summary = result['orders'][name]
+            print(f"  ✓ {name}: 平均花费 {summary['spent']['mean']:.1f}，兑换卡 {summary['frames']['mean']:.2f}")
+
+    if n_orders:
+        rng = np.random.default_rng(order_seed(seed, 'random-orders'))
+        random_orders = np.array([rng.permutation(len(model.ids)) for _ in range(n_orders)])
+        step_cost, spent, frames = simulate_orders(model, random_orders, players,
+                                                   order_seed(seed, 'random'), count)
+        means = spent.mean(axis=1)
+        best, worst = int(means.argmin()), int(means.argmax())
+        result['random'] = {
+            'orders': n_orders,
+            'spentMean': {key: round(value, 2) for key, value in summarize(means, PERCENTILES).items()},
+            'framesMean': {key: round(value, 3) for key, value in summarize(frames.mean(axis=1), PERCENTILES).items()},
+            # 单个顺序平均花费的抽样误差；spentMean 的离散程度与之相当时，顺序之间没有可分辨的差异
+            'standardError': round(float(spent.std(axis=1).mean() / np.sqrt(players)), 2),
+            'spent': rounded_summary(spent.ravel()),
+            'best': describe_order(model, random_orders[best], step_cost[best], spent[best], frames[best]),
+            'worst': describe_order(model, random_orders[worst], step_cost[worst], spent[worst], frames[worst]),
+        }
+        if verbose:
+            print(f"  ✓ {n_orders} 个随机顺序: 平均花费 {means.min():.1f} ~ {means.max():.1f}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='排位珍宝共享保底模拟：比较不同开启顺序的花费分布')
+    parser.add_argument('--orders', type=int, default=DEFAULT_ORDERS, help='随机开启顺序的数量')
+    parser.add_argument('--players', type=int, default=DEFAULT_PLAYERS, help='每个随机顺序模拟的玩家数')
+    parser.add_argument('--named-players', type=int, default=DEFAULT_NAMED_PLAYERS,
+                        help='按赛季顺序、倒序与自定义顺序各模拟的玩家数')
+    parser.add_argument('--target', default='S', choices=TARGETS, help='每个奖池需要集齐的稀有度')
+    parser.add_argument('--order', help='额外模拟的自定义顺序，逗号分隔的奖池 ID，例如 S41Rank,S40Rank')
+    parser.add_argument('--pools', nargs='*', help='只使用这些奖池，默认为 more/list.json 中的全部 V2 奖池')
+    parser.add_argument('--count', type=int, default=10, choices=[1, 10], help='单抽或十连')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='主随机种子')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='输出 JSON 路径')
+    args = parser.parse_args()
+
+    custom = args.order.split(',') if args.order else None
+    only = set(args.pools or []) | set(custom or [])
+    start = time.perf_counter()
+    try:
+        table = build_table(PROJECT_ROOT, args.orders, args.players, args.named_players, args.seed, args.target,
+                            args.count, custom, only or None)
+    except (KeyError, ValueError) as e:
+        print(f"参数错误: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"已模拟 {len(table['pools'])} 个排位珍宝，耗时 {elapsed:.1f}s")
+    print(f"输出文件: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,20 @@
 import os
 import json
-import requests
+import asyncio
+import argparse
 from urllib.parse import urlparse
 import hashlib
 import traceback
 import mimetypes
+import mmap
 import re
+import time
+
+from fetcher import (Fetcher, get_fetcher, is_complete_file, extension_from_content_type,
+                     CONTENT_TYPE_EXTENSIONS)
+from manifest import Manifest, default_manifest_path
+from stats import RunStats, get_stats, set_stats, log
+from urlcache import UrlCache, default_cache_path, set_url_cache, cached_local_path, fetch_and_store
 
 def get_file_hash(url):
     """根据URL生成文件名哈希值"""
@@ -22,39 +31,28 @@ def get_extension_from_url(url):
 
 def get_extension_from_content_type(content_type):
     """根据Content-Type获取文件扩展名"""
-    if not content_type:
-        return ''
-    
-    # 常见的Content-Type到扩展名映射
-    type_map = {
-        'image/png': '.png',
-        'image/jpeg': '.jpg',
-        'image/jpg': '.jpg',
-        'image/gif': '.gif',
-        'image/webp': '.webp',
-        'application/json': '.json',
-        'text/html': '.html',
-        'text/css': '.css',
-        'application/javascript': '.js',
-        'text/plain': '.txt',
-        'application/pdf': '.pdf',
-        'application/zip': '.zip',
-        'application/x-zip-compressed': '.zip',
-        'audio/mpeg': '.mp3',
-        'video/mp4': '.mp4',
-        'font/woff': '.woff',
-        'font/woff2': '.woff2',
-        'application/octet-stream': '.bin'
-    }
-    
-    content_type = content_type.lower().split(';')[0].strip()
-    return type_map.get(content_type, '')
+    return extension_from_content_type(content_type)
+
+def find_legacy_file(resource_folder, url_hash, extension):
+    """旧版按URL哈希命名的文件；URL没有扩展名时逐个尝试可能的扩展名，无需 HEAD"""
+    candidates = [extension] if extension else sorted(set(CONTENT_TYPE_EXTENSIONS.values())) + ['.dat']
+    for candidate in candidates:
+        file_path = os.path.join(resource_folder, f"{url_hash}{candidate}")
+        if os.path.exists(file_path):
+            return file_path
+    return None
 
-def download_resource(url, resource_folder):
+def download_resource(url, resource_folder, fetcher=None):
     """下载资源并返回本地路径"""
+    fetcher = fetcher or get_fetcher()
     if not url or not isinstance(url, str) or not url.startswith(('http://', 'https://')):
         return url
     
+    # 链接缓存命中且文件仍在时直接返回，不访问网络
+    cached = cached_local_path('resource', url, resource_folder)
+    if cached is not None:
+        return cached
+    
     # 创建文件夹
     try:
         os.makedirs(resource_folder, exist_ok=True)
@@ -65,59 +63,52 @@ def download_resource(url, resource_folder):
     # 根据URL生成唯一文件名
     url_hash = get_file_hash(url)
     
-    # 确定文件扩展名
+    # 确定文件扩展名；URL中没有扩展名时下载后根据文件头判断
     extension = get_extension_from_url(url)
-    
-    # 如果URL中没有扩展名，尝试从Content-Type获取
-    if not extension:
-        try:
-            response = requests.head(url, timeout=10, allow_redirects=True)
-            content_type = response.headers.get('content-type', '')
-            extension = get_extension_from_content_type(content_type)
-        except:
-            pass
-    
-    # 如果仍然没有扩展名，使用默认扩展名
-    if not extension:
-        extension = '.dat'  # 默认二进制文件扩展名
-    
-    # 确保扩展名以点开头
     if extension and not extension.startswith('.'):
         extension = '.' + extension
     
-    # 生成最终文件名
-    filename = f"{url_hash}{extension}"
-    file_path = os.path.join(resource_folder, filename)
-    
-    # 如果文件已存在，跳过下载
-    if os.path.exists(file_path):
-        print(f"  文件已存在，跳过下载: {filename}")
-        return f"/resource/{filename}"
+    # 旧版按URL命名的文件已存在且完整，跳过下载
+    file_path = find_legacy_file(resource_folder, url_hash, extension)
+    if file_path is not None:
+        filename = os.path.basename(file_path)
+        if is_complete_file(file_path):
+            log(f"  文件已存在，跳过下载: {filename}")
+            get_stats().incr('cacheHits')
+            return f"/resource/{filename}"
+        log(f"  文件不完整，重新下载: {filename}")
+        os.remove(file_path)
     
-    # 下载文件
+    # 流式下载到以URL命名的临时文件，校验完整后按内容哈希改名，相同内容只保留一份
     try:
-        print(f"  开始下载: {url[:80]}{'...' if len(url) > 80 else ''}")
-        response = requests.get(url, timeout=60)  # 增加超时时间
-        response.raise_for_status()
-        
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
-        print(f"  下载成功: {filename} ({len(response.content)} bytes)")
-        return f"/resource/{filename}"
+        log(f"  开始下载: {url[:80]}{'...' if len(url) > 80 else ''}")
+        local_path, size = fetch_and_store(url, resource_folder, 'resource', '/resource/',
+                                           os.path.join(resource_folder, f"{url_hash}{extension}"),
+                                           fetcher, '.dat')
+        if size is None:
+            log(f"  服务端内容未变化: {os.path.basename(local_path)}")
+        else:
+            log(f"  下载成功: {os.path.basename(local_path)} ({size} bytes)")
+            get_stats().incr('downloads')
+        return local_path
     except Exception as e:
         print(f"  下载失败 {url}: {str(e)}")
+        get_stats().incr('downloadsFailed')
         return url
 
-def process_string_value(value, resource_folder):
+def process_string_value(value, resource_folder, url_map=None):
     """处理字符串值，如果是HTTPS链接则下载并替换"""
     if isinstance(value, str) and value.startswith('https://'):
+        if url_map is not None:
+            # 流水线模式：链接已统一下载，直接查表替换
+            return url_map.get(value, value)
         # 更宽松的检查，处理任何https链接
         # 可以添加一些过滤条件，比如排除特定域名
-        print(f"  发现HTTPS链接: {value[:80]}{'...' if len(value) > 80 else ''}")
+        log(f"  发现HTTPS链接: {value[:80]}{'...' if len(value) > 80 else ''}")
         return download_resource(value, resource_folder)
     return value
 
-def process_json_data(data, resource_folder, path=""):
+def process_json_data(data, resource_folder, path="", url_map=None):
     """递归处理JSON数据中的所有HTTPS链接"""
     try:
         if isinstance(data, dict):
@@ -125,17 +116,17 @@ def process_json_data(data, resource_folder, path=""):
                 current_path = f"{path}.{key}" if path else key
                 
                 if isinstance(value, str):
-                    data[key] = process_string_value(value, resource_folder)
+                    data[key] = process_string_value(value, resource_folder, url_map)
                 elif isinstance(value, dict):
-                    process_json_data(value, resource_folder, current_path)
+                    process_json_data(value, resource_folder, current_path, url_map)
                 elif isinstance(value, list):
-                    process_list_data(value, resource_folder, current_path)
+                    process_list_data(value, resource_folder, current_path, url_map)
                 elif isinstance(value, (int, float, bool)) and not isinstance(value, str):
                     # 跳过非字符串类型
                     pass
                     
         elif isinstance(data, list):
-            process_list_data(data, resource_folder, path)
+            process_list_data(data, resource_folder, path, url_map)
             
     except Exception as e:
         print(f"处理JSON数据时出错 (路径: {path}): {str(e)}")
@@ -143,28 +134,28 @@ def process_json_data(data, resource_folder, path=""):
     
     return data
 
-def process_list_data(data_list, resource_folder, path=""):
+def process_list_data(data_list, resource_folder, path="", url_map=None):
     """处理列表数据"""
     try:
         for i, item in enumerate(data_list):
             current_path = f"{path}[{i}]"
             
             if isinstance(item, str):
-                data_list[i] = process_string_value(item, resource_folder)
+                data_list[i] = process_string_value(item, resource_folder, url_map)
             elif isinstance(item, dict):
-                process_json_data(item, resource_folder, current_path)
+                process_json_data(item, resource_folder, current_path, url_map)
             elif isinstance(item, list):
-                process_list_data(item, resource_folder, current_path)
+                process_list_data(item, resource_folder, current_path, url_map)
             elif isinstance(item, (int, float, bool)) and not isinstance(item, str):
                 # 跳过非字符串类型
                 pass
     except Exception as e:
         print(f"处理列表数据时出错 (路径: {path}): {str(e)}")
 
-def process_json_file(file_path, resource_folder):
+def process_json_file(file_path, resource_folder, url_map=None):
     """处理单个JSON文件"""
     try:
-        print(f"\n开始处理JSON文件: {file_path}")
+        log(f"\n开始处理JSON文件: {file_path}")
         
         # 读取JSON文件
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -174,7 +165,7 @@ def process_json_file(file_path, resource_folder):
         data = json.loads(original_content)
         
         # 处理数据中的HTTPS链接
-        processed_data = process_json_data(data, resource_folder, "")
+        processed_data = process_json_data(data, resource_folder, "", url_map)
         
         # 生成处理后的内容
         new_content = json.dumps(processed_data, ensure_ascii=False, indent=2)
@@ -184,10 +175,12 @@ def process_json_file(file_path, resource_folder):
             # 写回原文件
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(new_content)
-            print(f"✓ 更新JSON文件: {file_path}")
+            log(f"✓ 更新JSON文件: {file_path}")
+            get_stats().incr('filesRewritten')
             return True
         else:
-            print(f"- JSON文件无变化: {file_path}")
+            log(f"- JSON文件无变化: {file_path}")
+            get_stats().incr('filesUnchanged')
             return True
             
     except json.JSONDecodeError as e:
@@ -205,7 +198,7 @@ def process_json_file(file_path, resource_folder):
 def find_all_files(root_dir, exclude_dirs=None):
     """递归查找所有文件"""
     if exclude_dirs is None:
-        exclude_dirs = ['resource', '__pycache__', '.git', '.vscode', 'node_modules']
+        exclude_dirs = ['resource', '__pycache__', '.git', '.vscode', 'node_modules', '.cache']
     
     all_files = []
     for root, dirs, files in os.walk(root_dir):
@@ -217,13 +210,115 @@ def find_all_files(root_dir, exclude_dirs=None):
             all_files.append(file_path)
     return all_files
 
-def process_text_file(file_path, resource_folder):
+# 写成 /{2}：本文件也会被当作文本扫描，模式本身不能匹配出一个“链接”
+HTTPS_PATTERN = re.compile(r'https:/{2}[^\s"\'<>\)\}\]]+')
+# 字节版本：逐字节匹配时需要显式排除 UTF-8 编码的 Unicode 空白，结果与文本版本一致
+_UNICODE_SPACES = rb'\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80'
+HTTPS_BYTES_PATTERN = re.compile(
+    rb'https:/{2}(?:(?!' + _UNICODE_SPACES + rb')[^\s"\'<>\)\}\]\x1c-\x1f])+')
+SKIP_WORDS = ['javascript:', 'mailto:', 'data:', 'about:']
+# 超过该大小的文本文件使用 mmap 按字节流式处理，不整体读入内存
+MMAP_THRESHOLD = 4 * 1024 * 1024
+MAX_TEXT_SIZE = 50 * 1024 * 1024
+
+def is_resource_url(url):
+    """过滤掉明显不是资源链接的内容"""
+    return not any(skip_word in url.lower() for skip_word in SKIP_WORDS)
+
+def find_text_urls(content):
+    """查找文本中所有HTTPS链接（去重），过滤掉明显不是资源链接的内容"""
+    return [match for match in set(HTTPS_PATTERN.findall(content)) if is_resource_url(match)]
+
+def find_buffer_urls(buffer):
+    """在字节缓冲区（如 mmap）中查找所有HTTPS链接（去重）"""
+    found = {match.decode('utf-8', errors='ignore') for match in set(HTTPS_BYTES_PATTERN.findall(buffer))}
+    return [url for url in found if is_resource_url(url)]
+
+def rewrite_text_urls(content, url_map):
+    """一次扫描完成所有链接替换，返回 (新内容, 替换的不同链接数)"""
+    replaced = set()
+    
+    def substitute(match):
+        url = match.group(0)
+        local_path = url_map.get(url, url)
+        if local_path != url:
+            replaced.add(url)
+        return local_path
+    
+    return HTTPS_PATTERN.sub(substitute, content), len(replaced)
+
+def resolve_urls(urls, resource_folder, url_map=None):
+    """得到 链接 → 本地路径 的映射，未提供 url_map 时逐个下载"""
+    if url_map is not None:
+        return {url: url_map.get(url, url) for url in urls}
+    resolved = {}
+    for url in urls:
+        log(f"  在文本中发现链接: {url[:60]}{'...' if len(url) > 60 else ''}")
+        resolved[url] = download_resource(url, resource_folder)
+    return resolved
+
+def process_large_text_file(file_path, resource_folder, url_map=None):
+    """
+    通过 mmap 在字节层面处理大文件：匹配结果之间的内容直接从映射区写出，
+    内存占用与文件大小无关。写入临时文件后原子替换，返回替换的不同链接数
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        resolved = resolve_urls(find_buffer_urls(mm), resource_folder, url_map)
+        byte_map = {url.encode('utf-8'): local_path.encode('utf-8')
+                    for url, local_path in resolved.items() if local_path != url}
+        if not byte_map:
+            return 0
+        
+        tmp_path = file_path + '.tmp'
+        view = memoryview(mm)
+        try:
+            with open(tmp_path, 'wb') as out:
+                position = 0
+                for match in HTTPS_BYTES_PATTERN.finditer(mm):
+                    local_path = byte_map.get(match.group(0))
+                    if local_path is None:
+                        continue
+                    out.write(view[position:match.start()])
+                    out.write(local_path)
+                    position = match.end()
+                out.write(view[position:])
+        finally:
+            view.release()
+    os.replace(tmp_path, file_path)
+    return len(byte_map)
+
+def find_json_urls(data, found=None):
+    """递归收集JSON数据中所有以 https:// 开头的字符串"""
+    if found is None:
+        found = set()
+    if isinstance(data, str):
+        if data.startswith('https://'):
+            found.add(data)
+    elif isinstance(data, dict):
+        for value in data.values():
+            find_json_urls(value, found)
+    elif isinstance(data, list):
+        for item in data:
+            find_json_urls(item, found)
+    return found
+
+def process_text_file(file_path, resource_folder, url_map=None):
     """处理文本文件中的HTTPS链接"""
     try:
         # 检查文件大小，避免处理过大的文件
         file_size = os.path.getsize(file_path)
-        if file_size > 50 * 1024 * 1024:  # 50MB
-            print(f"  跳过大文件: {file_path} ({file_size} bytes)")
+        if file_size > MAX_TEXT_SIZE:  # 50MB
+            log(f"  跳过大文件: {file_path} ({file_size} bytes)")
+            return True
+        
+        if file_size > MMAP_THRESHOLD:
+            replacement_count = process_large_text_file(file_path, resource_folder, url_map)
+            if replacement_count:
+                log(f"✓ 更新文本文件: {file_path} (替换了 {replacement_count} 个链接)")
+                get_stats().incr('filesRewritten')
+            else:
+                log(f"- 文本文件无变化: {file_path}")
+                get_stats().incr('filesUnchanged')
             return True
         
         # 读取文件内容
@@ -232,40 +327,24 @@ def process_text_file(file_path, resource_folder):
         
         original_content = content
         
-        # 查找所有HTTPS链接
-        https_pattern = r'https://[^\s"\'<>\)\}\]]+'
-        matches = re.findall(https_pattern, content)
-        
-        # 去重并按长度排序（优先处理长链接）
-        unique_matches = list(set(matches))
-        unique_matches.sort(key=len, reverse=True)
-        
-        replacement_count = 0
-        for match in unique_matches:
-            # 过滤掉明显不是资源链接的内容
-            if any(skip_word in match.lower() for skip_word in 
-                   ['javascript:', 'mailto:', 'data:', 'about:']):
-                continue
-                
-            print(f"  在文本中发现链接: {match[:60]}{'...' if len(match) > 60 else ''}")
-            local_path = download_resource(match, resource_folder)
-            
-            if local_path != match:  # 如果确实发生了替换
-                content = content.replace(match, local_path)
-                replacement_count += 1
+        # 解析出链接后用一次 re.sub 完成全部替换
+        resolved = resolve_urls(find_text_urls(content), resource_folder, url_map)
+        content, replacement_count = rewrite_text_urls(content, resolved)
         
         # 只有当内容发生变化时才写入文件
         if original_content != content and replacement_count > 0:
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(content)
-            print(f"✓ 更新文本文件: {file_path} (替换了 {replacement_count} 个链接)")
+            log(f"✓ 更新文本文件: {file_path} (替换了 {replacement_count} 个链接)")
+            get_stats().incr('filesRewritten')
             return True
         else:
-            print(f"- 文本文件无变化: {file_path}")
+            log(f"- 文本文件无变化: {file_path}")
+            get_stats().incr('filesUnchanged')
             return True
             
     except UnicodeDecodeError:
-        print(f"  跳过二进制文件: {file_path}")
+        log(f"  跳过二进制文件: {file_path}")
         return True
     except Exception as e:
         print(f"✗ 处理文本文件失败 {file_path}: {str(e)}")
@@ -293,24 +372,8 @@ def should_process_as_text(file_path):
     
     return False
 
-def main():
-    # 设置目录路径
-    current_dir = os.getcwd()
-    resource_folder = os.path.join(current_dir, 'resource')
-    
-    print(f"当前工作目录: {current_dir}")
-    print(f"资源保存目录: {resource_folder}")
-    
-    # 查找所有文件
-    all_files = find_all_files(current_dir)
-    
-    if not all_files:
-        print("未找到任何文件")
-        return
-    
-    print(f"总共找到 {len(all_files)} 个文件")
-    
-    # 分类处理文件
+def classify_files(all_files):
+    """按JSON文件、文本文件、其他文件分类"""
     json_files = []
     text_files = []
     other_files = []
@@ -322,57 +385,179 @@ def main():
             text_files.append(file_path)
         else:
             other_files.append(file_path)
+    return json_files, text_files, other_files
+
+def scan_file_urls(file_path, manifest=None):
+    """阶段一：读取文件并收集其中的链接，返回 (处理方式, 链接列表)"""
+    try:
+        st = os.stat(file_path)
+        if manifest is not None and manifest.is_clean(file_path, st):
+            # 增量模式：未修改且不含远程链接的文件无需打开
+            return 'clean', []
+        if st.st_size > MAX_TEXT_SIZE:  # 50MB
+            return 'skip', []
+        if st.st_size > MMAP_THRESHOLD and not file_path.endswith('.json'):
+            return scan_large_text_urls(file_path, manifest)
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        print(f"✗ 读取文件失败 {file_path}: {str(e)}")
+        return 'error', []
+    
+    if manifest is not None and manifest.is_known_clean(file_path, data):
+        return 'clean', []
     
+    content = data.decode('utf-8', errors='ignore')
+    kind = 'text'
+    urls = None
+    if file_path.endswith('.json'):
+        try:
+            kind, urls = 'json', sorted(find_json_urls(json.loads(content)))
+        except json.JSONDecodeError:
+            # 不是有效的JSON，当作普通文本文件处理
+            pass
+    if urls is None:
+        urls = sorted(find_text_urls(content))
+    if manifest is not None and not urls:
+        manifest.record(file_path, data, False)
+    return kind, urls
+
+def scan_large_text_urls(file_path, manifest=None):
+    """大文本文件通过 mmap 扫描链接，不整体读入内存"""
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if manifest is not None and manifest.is_known_clean(file_path, mm):
+            return 'clean', []
+        urls = sorted(find_buffer_urls(mm))
+        if manifest is not None and not urls:
+            manifest.record(file_path, mm, False)
+    return 'text', urls
+
+def refresh_manifest(file_path, manifest):
+    """文件改写后重新记录，下载失败仍保留远程链接的文件下次会继续处理"""
+    kind, urls = scan_file_urls(file_path)
+    if kind not in ('json', 'text'):
+        return
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                manifest.record(file_path, mm, bool(urls))
+        else:
+            manifest.record(file_path, f.read(), bool(urls))
+
+async def run_pipeline(root_dir, resource_folder, fetcher, exclude_dirs=None, manifest=None):
+    """
+    分阶段处理：扫描全部文件 → 全局去重链接 → 有界并发下载 → 每个文件的链接下载完成后立即改写
+    传入 manifest 时只打开有变化或仍含远程链接的文件。返回 (成功数, 失败文件列表)
+    """
+    stats = get_stats()
+    with stats.stage('discover'):
+        all_files = find_all_files(root_dir, exclude_dirs)
+        json_files, text_files, other_files = classify_files(all_files)
+    stats.incr('filesFound', len(all_files))
+    print(f"总共找到 {len(all_files)} 个文件")
     print(f"JSON文件: {len(json_files)} 个")
     print(f"文本文件: {len(text_files)} 个")
     print(f"其他文件: {len(other_files)} 个")
     
-    # 统计信息
-    total_processed = 0
-    success_count = 0
+    # 阶段一：扫描
+    scanned = {}
     failed_files = []
+    clean_count = 0
+    with stats.stage('scan'):
+        for file_path in json_files + text_files:
+            start = time.perf_counter()
+            kind, urls = scan_file_urls(file_path, manifest)
+            stats.record_file(file_path, time.perf_counter() - start)
+            if kind == 'error':
+                failed_files.append(file_path)
+            elif kind == 'clean':
+                clean_count += 1
+            elif urls:
+                scanned[file_path] = (kind, urls)
+    stats.incr('filesSkipped', clean_count)
+    stats.incr('filesScanned', len(json_files) + len(text_files) - clean_count)
+    stats.incr('urlsFound', sum(len(urls) for _, urls in scanned.values()))
+    if manifest is not None:
+        print(f"增量模式: {clean_count} 个文件未变化，已跳过")
     
-    # 处理JSON文件
-    if json_files:
-        print(f"\n{'='*50}")
-        print(f"开始处理 {len(json_files)} 个JSON文件")
-        print(f"{'='*50}")
-        
-        for i, json_file in enumerate(json_files, 1):
-            print(f"\n[{i}/{len(json_files)}] 正在处理: {json_file}")
-            result = process_json_file(json_file, resource_folder)
-            if result == True:
-                success_count += 1
-                total_processed += 1
-            elif result == "not_json":
-                # 如果不是有效的JSON，当作普通文本文件处理
-                if process_text_file(json_file, resource_folder):
-                    success_count += 1
-                    total_processed += 1
-                else:
-                    failed_files.append(json_file)
-            else:
-                failed_files.append(json_file)
+    # 阶段二：全局去重
+    unique_urls = sorted({url for _, urls in scanned.values() for url in urls})
+    stats.incr('urlsUnique', len(unique_urls))
+    print(f"\n{len(scanned)} 个文件中共发现 {len(unique_urls)} 个不重复链接")
     
-    # 处理文本文件
-    if text_files:
-        print(f"\n{'='*50}")
-        print(f"开始处理 {len(text_files)} 个文本文件")
-        print(f"{'='*50}")
-        
-        for i, text_file in enumerate(text_files, 1):
-            print(f"\n[{i}/{len(text_files)}] 正在处理: {text_file}")
-            if process_text_file(text_file, resource_folder):
-                success_count += 1
-                total_processed += 1
-            else:
-                failed_files.append(text_file)
+    # 阶段三：并发下载，同一链接只下载一次
+    url_tasks = {
+        url: asyncio.ensure_future(fetcher.run(download_resource, url, resource_folder, fetcher))
+        for url in unique_urls
+    }
+    
+    # 阶段四：文件中的链接全部完成后立即改写该文件
+    async def rewrite(file_path, kind, urls):
+        local_paths = await asyncio.gather(*(url_tasks[url] for url in urls))
+        url_map = dict(zip(urls, local_paths))
+        start = time.perf_counter()
+        if kind == 'json':
+            result = process_json_file(file_path, resource_folder, url_map)
+        else:
+            result = process_text_file(file_path, resource_folder, url_map)
+        if manifest is not None and result is True:
+            refresh_manifest(file_path, manifest)
+        # 改写在事件循环线程中同步执行，累计时间即为改写阶段的耗时
+        elapsed = time.perf_counter() - start
+        stats.add_time('rewrite', elapsed)
+        stats.record_file(file_path, elapsed)
+        return result
     
-    # 其他文件通常不需要处理内容，除非有特殊需求
+    file_paths = list(scanned)
+    with stats.stage('download_and_rewrite'):
+        results = await asyncio.gather(*(rewrite(path, *scanned[path]) for path in file_paths))
+    for file_path, result in zip(file_paths, results):
+        if result is not True:
+            failed_files.append(file_path)
+    stats.incr('filesFailed', len(failed_files))
+    
+    success_count = len(json_files) + len(text_files) - len(failed_files)
+    return success_count, failed_files
+
+def main():
+    parser = argparse.ArgumentParser(description='下载文件中的HTTPS资源并替换为本地路径')
+    parser.add_argument('--concurrency', type=int, default=16, help='全局最大并发下载数')
+    parser.add_argument('--per-host', type=int, default=4, help='单个主机最大并发数')
+    parser.add_argument('--host-rate', type=float, default=None, help='单个主机每秒最多请求数')
+    parser.add_argument('--retries', type=int, default=3, help='失败重试次数')
+    parser.add_argument('--full', action='store_true', help='忽略增量清单，重新扫描所有文件')
+    parser.add_argument('--refresh', action='store_true',
+                        help='对已缓存的链接发送条件请求，确认服务端内容是否变化')
+    parser.add_argument('--quiet', action='store_true', help='不输出逐个文件、逐个链接的进度')
+    parser.add_argument('--report', default=None, help='把阶段耗时与计数写成 JSON 报告')
+    args = parser.parse_args()
+    stats = set_stats(RunStats('replace', quiet=args.quiet))
+    
+    # 设置目录路径
+    current_dir = os.getcwd()
+    resource_folder = os.path.join(current_dir, 'resource')
+    
+    print(f"当前工作目录: {current_dir}")
+    print(f"资源保存目录: {resource_folder}")
+    
+    manifest = Manifest(default_manifest_path(current_dir, 'replace'), current_dir)
+    if args.full:
+        manifest.entries = {}
+    url_cache = set_url_cache(UrlCache(default_cache_path(current_dir), refresh=args.refresh))
+    
+    fetcher = Fetcher(concurrency=args.concurrency, per_host=args.per_host,
+                      host_rate=args.host_rate, retries=args.retries)
+    try:
+        success_count, failed_files = asyncio.run(
+            run_pipeline(current_dir, resource_folder, fetcher, manifest=manifest))
+    finally:
+        fetcher.close()
+        url_cache.close()
+        with stats.stage('manifest'):
+            manifest.save()
     
     print(f"\n{'='*60}")
     print(f"处理完成统计:")
-    print(f"总共处理: {total_processed} 个文件")
     print(f"成功处理: {success_count} 个文件")
     print(f"失败处理: {len(failed_files)} 个文件")
     
@@ -382,6 +567,11 @@ def main():
             print(f"  - {file}")
         if len(failed_files) > 20:
             print(f"  ... 还有 {len(failed_files) - 20} 个文件")
+    
+    print(f"\n{stats.summary()}")
+    if args.report:
+        stats.write(args.report)
+        print(f"报告已写入 {args.report}")
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,46 @@
 import os
 import json
-import requests
+import time
+import hashlib
+import argparse
 from urllib.parse import urlparse
 import traceback
 
-def download_image(url, folder_path):
+from fetcher import get_fetcher, is_complete_file
+from manifest import Manifest, default_manifest_path
+from stats import RunStats, get_stats, set_stats, log
+from urlcache import UrlCache, default_cache_path, set_url_cache, cached_local_path, fetch_and_store
+
+# 以远程链接作为取值的JSON字符串
+REMOTE_VALUE_MARKERS = (b'"http://', b'"https://')
+
+def has_remote_links(data):
+    """原始JSON内容中是否还有远程链接"""
+    return any(marker in data for marker in REMOTE_VALUE_MARKERS)
+
+# URL 没有扩展名时旧版可能使用的扩展名
+LEGACY_IMAGE_EXTENSIONS = ('.png', '.jpg', '.gif', '.webp', '')
+
+def find_legacy_file(folder_path, filename):
+    """旧版按URL文件名保存的图片；没有扩展名时逐个尝试，无需 HEAD"""
+    extensions = ('',) if os.path.splitext(filename)[1] else LEGACY_IMAGE_EXTENSIONS
+    for extension in extensions:
+        file_path = os.path.join(folder_path, filename + extension)
+        if os.path.isfile(file_path):
+            return file_path
+    return None
+
+def download_image(url, folder_path, fetcher=None):
     """下载图片并返回本地路径"""
+    fetcher = fetcher or get_fetcher()
     if not url or not isinstance(url, str) or not url.startswith(('http://', 'https://')):
         return url
     
+    # 链接缓存命中且文件仍在时直接返回，不访问网络
+    cached = cached_local_path('img', url, folder_path)
+    if cached is not None:
+        return cached
+    
     # 创建文件夹
     try:
         os.makedirs(folder_path, exist_ok=True)
@@ -23,41 +55,33 @@ def download_image(url, folder_path):
         
         # 处理特殊字符
         filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
+        if not filename:
+            filename = hashlib.md5(url.encode()).hexdigest()
         
-        # 如果URL没有明确的文件扩展名，则尝试从Content-Type获取
-        if not os.path.splitext(filename)[1]:
-            try:
-                response = requests.head(url, timeout=10)
-                content_type = response.headers.get('content-type', '').lower()
-                if 'png' in content_type:
-                    filename += '.png'
-                elif 'jpeg' in content_type or 'jpg' in content_type:
-                    filename += '.jpg'
-                elif 'gif' in content_type:
-                    filename += '.gif'
-                elif 'webp' in content_type:
-                    filename += '.webp'
-            except:
-                # 默认使用.png扩展名
-                filename += '.png'
-        
-        file_path = os.path.join(folder_path, filename)
-        
-        # 如果文件已存在，跳过下载
-        if os.path.exists(file_path):
-            print(f"  文件已存在，跳过下载: {filename}")
-            return f"./img/{filename}"
+        # 旧版按URL命名的文件已存在且完整，跳过下载
+        file_path = find_legacy_file(folder_path, filename)
+        if file_path is not None:
+            legacy_name = os.path.basename(file_path)
+            if is_complete_file(file_path):
+                log(f"  文件已存在，跳过下载: {legacy_name}")
+                get_stats().incr('cacheHits')
+                return f"./img/{legacy_name}"
+            log(f"  文件不完整，重新下载: {legacy_name}")
+            os.remove(file_path)
         
-        # 下载文件
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
-        print(f"  下载成功: {filename}")
-        return f"./img/{filename}"
+        # 流式下载到临时文件，校验完整后按内容哈希改名，相同内容只保留一份。
+        # URL没有扩展名时根据下载内容的文件头判断，默认使用.png
+        local_path, size = fetch_and_store(url, folder_path, 'img', './img/',
+                                           os.path.join(folder_path, filename), fetcher, '.png')
+        if size is None:
+            log(f"  服务端内容未变化: {os.path.basename(local_path)}")
+        else:
+            log(f"  下载成功: {os.path.basename(local_path)}")
+            get_stats().incr('downloads')
+        return local_path
     except Exception as e:
         print(f"  下载失败 {url}: {str(e)}")
+        get_stats().incr('downloadsFailed')
         return url
 
 def process_json_data(data, img_folder, file_path=""):
@@ -69,7 +93,7 @@ def process_json_data(data, img_folder, file_path=""):
             for field in image_fields:
                 if field in data and data[field]:
                     if isinstance(data[field], str) and data[field].startswith(('http://', 'https://')):
-                        print(f"  处理字段 {field}")
+                        log(f"  处理字段 {field}")
                         local_path = download_image(data[field], img_folder)
                         data[field] = local_path
             
@@ -78,7 +102,7 @@ def process_json_data(data, img_folder, file_path=""):
             if 'fragmentsInfo' in data and isinstance(data['fragmentsInfo'], dict):
                 if 'img' in data['fragmentsInfo'] and isinstance(data['fragmentsInfo']['img'], str):
                     if data['fragmentsInfo']['img'].startswith(('http://', 'https://')):
-                        print(f"  处理 fragmentsInfo.img")
+                        log(f"  处理 fragmentsInfo.img")
                         local_path = download_image(data['fragmentsInfo']['img'], img_folder)
                         data['fragmentsInfo']['img'] = local_path
             
@@ -89,7 +113,7 @@ def process_json_data(data, img_folder, file_path=""):
                         for i, item in enumerate(rarity_items):
                             if isinstance(item, dict) and 'img' in item and isinstance(item['img'], str):
                                 if item['img'].startswith(('http://', 'https://')):
-                                    print(f"  处理 items[{rarity_key}][{i}].img")
+                                    log(f"  处理 items[{rarity_key}][{i}].img")
                                     local_path = download_image(item['img'], img_folder)
                                     item['img'] = local_path
             
@@ -100,7 +124,7 @@ def process_json_data(data, img_folder, file_path=""):
                         for i, val in enumerate(award_value):
                             if isinstance(val, str) and val.startswith(('http://', 'https://')):
                                 if any(ext in val.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
-                                    print(f"  处理 award[{award_key}][{i}]")
+                                    log(f"  处理 award[{award_key}][{i}]")
                                     local_path = download_image(val, img_folder)
                                     award_value[i] = local_path
             
@@ -108,7 +132,7 @@ def process_json_data(data, img_folder, file_path=""):
             for key, value in data.items():
                 if isinstance(value, str) and value.startswith(('http://', 'https://')):
                     if any(ext in value.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
-                        print(f"  处理字段 {key}")
+                        log(f"  处理字段 {key}")
                         local_path = download_image(value, img_folder)
                         data[key] = local_path
                 elif isinstance(value, dict):
@@ -117,7 +141,7 @@ def process_json_data(data, img_folder, file_path=""):
                     for i, item in enumerate(value):
                         if isinstance(item, str) and item.startswith(('http://', 'https://')):
                             if any(ext in item.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
-                                print(f"  处理数组 {key}[{i}]")
+                                log(f"  处理数组 {key}[{i}]")
                                 local_path = download_image(item, img_folder)
                                 value[i] = local_path
                         elif isinstance(item, dict):
@@ -126,7 +150,7 @@ def process_json_data(data, img_folder, file_path=""):
                             for j, sub_item in enumerate(item):
                                 if isinstance(sub_item, str) and sub_item.startswith(('http://', 'https://')):
                                     if any(ext in sub_item.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
-                                        print(f"  处理数组 {key}[{i}][{j}]")
+                                        log(f"  处理数组 {key}[{i}][{j}]")
                                         local_path = download_image(sub_item, img_folder)
                                         item[j] = local_path
                                         
@@ -134,7 +158,7 @@ def process_json_data(data, img_folder, file_path=""):
             for i, item in enumerate(data):
                 if isinstance(item, str) and item.startswith(('http://', 'https://')):
                     if any(ext in item.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
-                        print(f"  处理数组 [{i}]")
+                        log(f"  处理数组 [{i}]")
                         local_path = download_image(item, img_folder)
                         data[i] = local_path
                 elif isinstance(item, dict):
@@ -143,32 +167,57 @@ def process_json_data(data, img_folder, file_path=""):
                     for j, sub_item in enumerate(item):
                         if isinstance(sub_item, str) and sub_item.startswith(('http://', 'https://')):
                             if any(ext in sub_item.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
-                                print(f"  处理数组 [{i}][{j}]")
+                                log(f"  处理数组 [{i}][{j}]")
                                 local_path = download_image(sub_item, img_folder)
                                 item[j] = local_path
     except Exception as e:
-        print(f"处理JSON数据时出错: {str(e)}")
+        log(f"处理JSON数据时出错: {str(e)}")
         traceback.print_exc()
     
     return data
 
-def process_json_file(file_path, img_folder):
-    """处理单个JSON文件"""
+def process_json_file(file_path, img_folder, manifest=None):
+    """处理单个JSON文件，返回 True / False / "clean"（增量模式下无需处理）"""
+    stats = get_stats()
     try:
-        print(f"\n开始处理文件: {file_path}")
+        if manifest is not None and manifest.is_clean(file_path):
+            stats.incr('filesSkipped')
+            return "clean"
         
         # 读取JSON文件
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            original = f.read()
+        stats.incr('filesScanned')
+        
+        if manifest is not None and manifest.is_known_clean(file_path, original):
+            stats.incr('cacheHits')
+            return "clean"
+        if not has_remote_links(original):
+            # 没有远程链接时不会有任何替换，无需解析和写回
+            if manifest is not None:
+                manifest.record(file_path, original, False)
+            return "clean"
+        
+        log(f"\n开始处理文件: {file_path}")
+        data = json.loads(original.decode('utf-8'))
+        stats.incr('urlsFound', sum(original.count(marker) for marker in REMOTE_VALUE_MARKERS))
         
         # 处理数据中的图片链接
         processed_data = process_json_data(data, img_folder, file_path)
         
-        # 写回原文件
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(processed_data, f, ensure_ascii=False, indent=2)
+        # 内容完全相同时不写回，避免改动修改时间和产生无意义的diff
+        output = json.dumps(processed_data, ensure_ascii=False, indent=2).encode('utf-8')
+        if output != original:
+            with open(file_path, 'wb') as f:
+                f.write(output)
+            log(f"✓ 成功处理文件: {file_path}")
+            stats.incr('filesRewritten')
+        else:
+            log(f"- 文件无变化: {file_path}")
+            stats.incr('filesUnchanged')
         
-        print(f"✓ 成功处理文件: {file_path}")
+        if manifest is not None:
+            manifest.record(file_path, output, has_remote_links(output))
         return True
         
     except json.JSONDecodeError as e:
@@ -182,16 +231,30 @@ def process_json_file(file_path, img_folder):
         traceback.print_exc()
         return False
 
-def find_all_json_files(root_dir):
+def find_all_json_files(root_dir, exclude_dirs=None):
     """递归查找所有JSON文件"""
+    if exclude_dirs is None:
+        exclude_dirs = ['img', 'resource', '__pycache__', '.git', '.cache', 'node_modules']
+    
     json_files = []
     for root, dirs, files in os.walk(root_dir):
+        # 排除不含JSON数据的目录
+        dirs[:] = [d for d in dirs if d not in exclude_dirs]
         for file in files:
             if file.endswith('.json'):
                 json_files.append(os.path.join(root, file))
     return json_files
 
 def main():
+    parser = argparse.ArgumentParser(description='下载JSON文件中的图片并替换为本地路径')
+    parser.add_argument('--full', action='store_true', help='忽略增量清单，重新扫描所有文件')
+    parser.add_argument('--refresh', action='store_true',
+                        help='对已缓存的链接发送条件请求，确认服务端内容是否变化')
+    parser.add_argument('--quiet', action='store_true', help='不输出逐个文件、逐个链接的进度')
+    parser.add_argument('--report', default=None, help='把阶段耗时与计数写成 JSON 报告')
+    args = parser.parse_args()
+    stats = set_stats(RunStats('replaceimg', quiet=args.quiet))
+    
     # 设置目录路径
     current_dir = os.getcwd()
     img_folder = os.path.join(current_dir, 'img')
@@ -200,7 +263,9 @@ def main():
     print(f"图片保存目录: {img_folder}")
     
     # 查找所有JSON文件（包括子目录）
-    json_files = find_all_json_files(current_dir)
+    with stats.stage('discover'):
+        json_files = find_all_json_files(current_dir)
+    stats.incr('filesFound', len(json_files))
     
     if not json_files:
         print("未找到任何JSON文件")
@@ -208,26 +273,52 @@ def main():
     
     print(f"总共找到 {len(json_files)} 个JSON文件")
     
+    # 增量清单：--full 时忽略已有记录
+    manifest = Manifest(default_manifest_path(current_dir, 'replaceimg'), current_dir)
+    if args.full:
+        manifest.entries = {}
+    url_cache = set_url_cache(UrlCache(default_cache_path(current_dir), refresh=args.refresh))
+    
     # 处理每个JSON文件
     success_count = 0
+    clean_count = 0
     failed_files = []
     
-    for i, json_file in enumerate(json_files, 1):
-        print(f"\n[{i}/{len(json_files)}] 正在处理: {json_file}")
-        if process_json_file(json_file, img_folder):
-            success_count += 1
-        else:
-            failed_files.append(json_file)
+    try:
+        with stats.stage('process'):
+            for i, json_file in enumerate(json_files, 1):
+                start = time.perf_counter()
+                result = process_json_file(json_file, img_folder, manifest)
+                stats.record_file(json_file, time.perf_counter() - start)
+                if result == "clean":
+                    success_count += 1
+                    clean_count += 1
+                elif result:
+                    log(f"[{i}/{len(json_files)}] 已处理: {json_file}")
+                    success_count += 1
+                else:
+                    failed_files.append(json_file)
+    finally:
+        url_cache.close()
+        with stats.stage('manifest'):
+            manifest.save()
+    stats.incr('filesFailed', len(failed_files))
     
     print(f"\n" + "="*50)
     print(f"处理完成统计:")
     print(f"成功处理: {success_count}/{len(json_files)} 个文件")
+    print(f"无需处理: {clean_count}/{len(json_files)} 个文件")
     print(f"失败处理: {len(failed_files)}/{len(json_files)} 个文件")
     
     if failed_files:
         print(f"\n失败的文件列表:")
         for file in failed_files:
             print(f"  - {file}")
+    
+    print(f"\n{stats.summary()}")
+    if args.report:
+        stats.write(args.report)
+        print(f"报告已写入 {args.report}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,161 @@
+import numpy as np
+
+WORD_BITS = 64
+
+
+def _index_dtype(size):
+    """下标数组用能放下 size 的最小整数类型，减少大批量玩家时的内存"""
+    return np.int16 if size <= np.iinfo(np.int16).max else np.int32
+
+
+class OwnedSet:
+    """
+    批量玩家的拥有标记：每名玩家一行按位存储的 bitset 加上尚未拥有的数量。
+    同一次调用中每名玩家最多出现一次，数组运算之间不会互相覆盖
+    """
+
+    def __init__(self, n_players, n_keys):
+        self.n_keys = n_keys
+        self.bits = np.zeros((n_players, (n_keys + WORD_BITS - 1) // WORD_BITS), dtype=np.uint64)
+        self.remaining = np.full(n_players, n_keys, dtype=np.int32)
+
+    def contains(self, players, keys):
+        words = self.bits[players, keys >> 6]
+        return ((words >> (keys & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+    def add(self, players, keys):
+        """标记为已拥有，返回每名玩家此前是否已经拥有（即本次为重复）"""
+        repeat = self.contains(players, keys)
+        new = ~repeat
+        if new.any():
+            players, keys = players[new], keys[new]
+            self.bits[players, keys >> 6] |= np.uint64(1) << (keys & 63).astype(np.uint64)
+            self.remaining[players] -= 1
+            self._on_owned(players, keys)
+        return repeat
+
+    def _on_owned(self, players, keys):
+        pass
+
+    def complete(self):
+        return self.remaining == 0
+
+    def take(self, keep):
+        """只保留部分玩家，与 Engine.compress 配合使用"""
+        self.bits = self.bits[keep]
+        self.remaining = self.remaining[keep]
+
+
+class UnownedSampler(OwnedSet):
+    """
+    在未拥有的物品中等概率抽取，对应 V1.html 中 diff_A=0/3 的 unownedAPool。
+    每名玩家保存物品下标数组 order，前 count 项为未拥有的物品，pos 为物品在 order 中的位置；
+    获得物品时与末尾交换后缩短，抽取与移除都是 O(1)，不需要每抽重新筛选整个池子。
+    key_ids 为每个物品的 getItemKey 编号，同一标识的多个物品会一起移除
+    """
+
+    def __init__(self, n_players, key_ids):
+        key_ids = np.asarray(key_ids, dtype=np.int64)
+        n_keys = int(key_ids.max()) + 1 if len(key_ids) else 0
+        super().__init__(n_players, n_keys)
+        self.n_items = len(key_ids)
+
+        dtype = _index_dtype(self.n_items)
+        width = int(np.bincount(key_ids).max()) if len(key_ids) else 1
+        self.key_items = np.full((max(n_keys, 1), width), -1, dtype=np.int64)
+        filled = np.zeros(max(n_keys, 1), dtype=np.int64)
+        for item, key in enumerate(key_ids):
+            self.key_items[key, filled[key]] = item
+            filled[key] += 1
+
+        self.order = np.tile(np.arange(self.n_items, dtype=dtype), (n_players, 1))
+        self.pos = self.order.copy()
+        self.count = np.full(n_players, self.n_items, dtype=np.int32)
+
+    def pick(self, players, u):
+        """u 为 [0, 1) 的均匀随机数；全部拥有后与网页一样在整个池子中抽取"""
+        count = self.count[players]
+        has_unowned = count > 0
+        k = (u * np.where(has_unowned, count, self.n_items)).astype(np.int64)
+        return np.where(has_unowned, self.order[players, k], k)
+
+    def _on_owned(self, players, keys):
+        for column in range(self.key_items.shape[1]):
+            items = self.key_items[keys, column]
+            valid = items >= 0
+            p, item = players[valid], items[valid]
+            i = self.pos[p, item]
+            last = self.count[p] - 1
+            moved = self.order[p, last]
+            self.order[p, i] = moved
+            self.pos[p, moved] = i
+            self.order[p, last] = item
+            self.pos[p, item] = last
+            self.count[p] = last
+
+    def take(self, keep):
+        super().take(keep)
+        self.order = self.order[keep]
+        self.pos = self.pos[keep]
+        self.count = self.count[keep]
+
+
+class ExcludingSampler:
+    """
+    在"组编号与给定组不同"的物品中等概率抽取，对应 diff_A=1 排除上一次奇珍的 differentPool。
+    预先为每组列出候选物品，抽取为一次查表；只有一组时退回到整个池子
+    """
+
+    def __init__(self, group_ids):
+        group_ids = np.asarray(group_ids, dtype=np.int64)
+        n_items = len(group_ids)
+        n_groups = int(group_ids.max()) + 1 if n_items else 0
+        self.others = np.zeros((max(n_groups, 1), max(n_items, 1)), dtype=_index_dtype(n_items))
+        self.count = np.zeros(max(n_groups, 1), dtype=np.int32)
+        for group in range(n_groups):
+            others = np.flatnonzero(group_ids != group)
+            if len(others) == 0:
+                others = np.arange(n_items)
+            self.others[group, :len(others)] = others
+            self.count[group] = len(others)
+
+    def pick(self, groups, u):
+        k = (u * self.count[groups]).astype(np.int64)
+        return self.others[groups, k].astype(np.int32)
+
+
+class AliasTable:
+    """
+    Walker/Vose 别名表：按任意权重抽取时每次只需一次查表与一次比较，与类别数无关。
+    prob[k] 为第 k 列保留自身的概率，否则取 alias[k]
+    """
+
+    def __init__(self, prob, alias):
+        self.prob = np.asarray(prob, dtype=np.float64)
+        self.alias = np.asarray(alias, dtype=_index_dtype(len(prob)))
+
+    @classmethod
+    def from_weights(cls, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        n = len(weights)
+        total = weights.sum()
+        if n == 0 or total <= 0:
+            raise ValueError("别名表需要至少一个正权重")
+        scaled = weights * (n / total)
+        prob = np.ones(n)
+        alias = np.arange(n)
+        small = [k for k in range(n) if scaled[k] < 1.0]
+        large = [k for k in range(n) if scaled[k] >= 1.0]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # 剩余的列只差浮点误差，直接保留自身
+        return cls(prob, alias)
+
+    def pick(self, u, v):
+        """u、v 为两组 [0, 1) 的均匀随机数"""
+        k = (u * len(self.prob)).astype(np.int64)
+        return np.where(v < self.prob[k], k, self.alias[k])
@@ -0,0 +1,491 @@
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import asyncio
+import argparse
+import mimetypes
+import stat as stat_module
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import parse_qsl, unquote
+
+from assetstore import file_digest
+from stats import log
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 预压缩副本：客户端接受时优先 br，其次 gzip
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+# 值得预压缩的文本类型；图片、音频本身已压缩
+COMPRESSIBLE_EXTENSIONS = {'.html', '.htm', '.json', '.css', '.js', '.md', '.svg', '.txt', '.ttf'}
+MIN_COMPRESS_SIZE = 1024
+
+# 超过该大小的文件用 sendfile 直接从页缓存发送，小文件缓存在内存里
+SENDFILE_THRESHOLD = 64 * 1024
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+
+# 内容变化时文件名也会变化的文件：img/、resource/ 顶层由 assetstore.content_name 命名的文件
+# （32 位十六进制），以及 catalog.py 生成的 more/catalog.<12 位十六进制>.json。
+# 旧版按 URL 命名的 img/ 文件不是内容哈希，仍需重新验证
+HASHED_NAME_PATTERN = re.compile(
+    r'^(?:(?:img|resource)/[0-9a-f]{32}\.[0-9a-z]+|more/catalog\.[0-9a-f]{12}\.json)$')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+MAX_HEADER_BYTES = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+RESOLVE_CACHE_SIZE = 65536
+
+CONTENT_TYPES = {
+    '.json': 'application/json; charset=utf-8',
+    '.md': 'text/markdown; charset=utf-8',
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.mp3': 'audio/mpeg',
+    '.ttf': 'font/ttf',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.webp': 'image/webp',
+    '.svg': 'image/svg+xml',
+}
+
+REASONS = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request',
+           403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+           416: 'Range Not Satisfiable', 500: 'Internal Server Error'}
+
+
+def content_type(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in CONTENT_TYPES:
+        return CONTENT_TYPES[extension]
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def cache_control(rel_path):
+    return IMMUTABLE_CACHE if HASHED_NAME_PATTERN.match(rel_path) else REVALIDATE_CACHE
+
+
+def accepted_encodings(header):
+    """Accept-Encoding 中 q 值不为 0 的编码集合"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def etag_matches(header, etag):
+    """If-None-Match 使用弱比较，W/ 前缀不影响匹配"""
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+def parse_range(header, size):
+    """
+    解析单个字节范围，返回 (起点, 终点)（含终点）。
+    格式不支持时返回 None（按整文件响应），范围无法满足时返回 False
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N：最后 N 个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+class FileEntry:
+    """一个文件表示（原文件或预压缩副本）的元数据；文件的 mtime 或大小变化时失效"""
+    __slots__ = ('path', 'stamp', 'size', 'etag', 'last_modified')
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        self.size = stat.st_size
+        # 强 ETag：内容哈希，编辑器保存同样内容时不会让缓存失效
+        self.etag = f'"{file_digest(path)[:32]}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+
+class FileCache:
+    """
+    路径 → FileEntry，每次请求只做一次 stat 校验。
+    小文件内容按 LRU 保存在内存中，总量不超过 max_bytes
+    """
+
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.bodies = OrderedDict()
+        self.body_bytes = 0
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not stat_module.S_ISREG(stat.st_mode):
+            return None
+        entry = self.entries.get(path)
+        if entry is None or entry.stamp != (stat.st_mtime_ns, stat.st_size):
+            self._drop_body(path)
+            entry = self.entries[path] = FileEntry(path, stat)
+        return entry
+
+    def body(self, entry):
+        """小文件的内容，读取后放入 LRU"""
+        if entry.path in self.bodies:
+            self.bodies.move_to_end(entry.path)
+            return self.bodies[entry.path]
+        with open(entry.path, 'rb') as f:
+            data = f.read()
+        if len(data) <= self.max_bytes:
+            self.bodies[entry.path] = data
+            self.body_bytes += len(data)
+            while self.body_bytes > self.max_bytes:
+                _, evicted = self.bodies.popitem(last=False)
+                self.body_bytes -= len(evicted)
+        return data
+
+    def _drop_body(self, path):
+        data = self.bodies.pop(path, None)
+        if data is not None:
+            self.body_bytes -= len(data)
+
+
+class StaticServer:
+    """
+    以项目根目录为根的静态文件服务器：HTTP/1.1 keep-alive，只支持 GET/HEAD。
+    按 Accept-Encoding 选择 .br/.gz 预压缩副本，强 ETag 与 304，
+    内容寻址资源标记为 immutable，Range 请求用于音乐的片段播放，大文件走 sendfile
+    """
+
+    def __init__(self, root=PROJECT_ROOT, access_log=False):
+        self.root = os.path.realpath(root)
+        self.access_log = access_log
+        self.files = FileCache()
+        self.requests = 0
+        # 请求路径 → 解析结果，省去每次请求的 realpath
+        self._resolved = {}
+        # 本地 JSON 接口：路径 → handler(参数字典) -> (状态码, 可序列化的结果)
+        self.routes = {}
+
+    def add_route(self, path, handler):
+        self.routes[path] = handler
+
+    def resolve(self, target):
+        """请求路径 → (相对路径, 绝对路径)，越出根目录或访问隐藏文件时返回 None"""
+        path = target.split('?', 1)[0].split('#', 1)[0]
+        if path in self._resolved:
+            return self._resolved[path]
+        result = self._resolve(unquote(path))
+        if len(self._resolved) >= RESOLVE_CACHE_SIZE:
+            self._resolved.clear()
+        self._resolved[path] = result
+        return result
+
+    def _resolve(self, path):
+        segments = [segment for segment in path.split('/') if segment and segment != '.']
+        if any(segment == '..' or segment.startswith('.') or '\\' in segment or '\0' in segment
+               for segment in segments):
+            return None
+        rel_path = '/'.join(segments)
+        full_path = os.path.join(self.root, *segments)
+        if not segments or path.endswith('/') or os.path.isdir(full_path):
+            rel_path = f"{rel_path}/index.html".lstrip('/')
+            full_path = os.path.join(full_path, 'index.html')
+        real = os.path.realpath(full_path)
+        if real != self.root and not real.startswith(self.root + os.sep):
+            return None
+        return rel_path, full_path
+
+    def select(self, full_path, headers):
+        """选择要发送的表示，返回 (FileEntry, 内容编码)；原文件不存在时返回 (None, None)"""
+        original = self.files.get(full_path)
+        if original is None:
+            return None, None
+        accepted = accepted_encodings(headers.get('accept-encoding', ''))
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            sibling = self.files.get(full_path + suffix)
+            # 预压缩副本比原文件旧时视为过期
+            if sibling is not None and sibling.stamp[0] >= original.stamp[0]:
+                return sibling, encoding
+        return original, None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_error(writer, 400, close=True)
+                    break
+                keep_alive = await self.respond(head, reader, writer)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, head, reader, writer):
+        """处理一个请求，返回连接是否保持"""
+        start = time.perf_counter()
+        self.requests += 1
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+            await self.send_error(writer, 400, close=True)
+            return False
+        method, target, version = parts
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = 'close' not in connection if version == 'HTTP/1.1' else 'keep-alive' in connection
+        # GET/HEAD 请求体不做处理，但必须读掉才能继续复用连接
+        length = headers.get('content-length', '0')
+        if length.isdigit() and int(length):
+            await reader.readexactly(int(length))
+
+        status = await self.serve(method, target, headers, writer, keep_alive)
+        if self.access_log:
+            log(f"{method} {target} {status} {(time.perf_counter() - start) * 1000:.1f}ms")
+        return keep_alive
+
+    async def serve(self, method, target, headers, writer, keep_alive):
+        if method not in ('GET', 'HEAD'):
+            await self.send_error(writer, 405, keep_alive, extra={'Allow': 'GET, HEAD'})
+            return 405
+        path, _, query = target.partition('?')
+        handler = self.routes.get(path)
+        if handler is not None:
+            try:
+                result = handler(dict(parse_qsl(query)))
+            except Exception as e:
+                # 接口内部出错时仍要返回响应，否则连接会被直接断开
+                log(f"接口异常 {path}: {type(e).__name__}: {e}")
+                result = 500, {'error': REASONS[500]}
+            return await self.send_json(writer, method, result, keep_alive)
+        resolved = self.resolve(target)
+        if resolved is None:
+            await self.send_error(writer, 403, keep_alive)
+            return 403
+        rel_path, full_path = resolved
+        entry, encoding = self.select(full_path, headers)
+        if entry is None:
+            await self.send_error(writer, 404, keep_alive)
+            return 404
+
+        # 预压缩副本的 ETag 是副本自身的内容哈希，不同编码的表示自然不会相同
+        etag = entry.etag
+        response_headers = {
+            'Content-Type': content_type(full_path),
+            'ETag': etag,
+            'Last-Modified': entry.last_modified,
+            'Cache-Control': cache_control(rel_path),
+            'Vary': 'Accept-Encoding',
+        }
+        if encoding is None:
+            response_headers['Accept-Ranges'] = 'bytes'
+        else:
+            response_headers['Content-Encoding'] = encoding
+
+        if self.not_modified(headers, etag, entry):
+            self.write_head(writer, 304, response_headers, keep_alive)
+            await writer.drain()
+            return 304
+
+        start, end, status = 0, entry.size - 1, 200
+        if encoding is None and 'range' in headers and self.range_applies(headers, etag, entry):
+            byte_range = parse_range(headers['range'], entry.size)
+            if byte_range is False:
+                await self.send_error(writer, 416, keep_alive,
+                                      extra={'Content-Range': f'bytes */{entry.size}'})
+                return 416
+            if byte_range is not None:
+                start, end = byte_range
+                status = 206
+                response_headers['Content-Range'] = f'bytes {start}-{end}/{entry.size}'
+        count = end - start + 1 if entry.size else 0
+        response_headers['Content-Length'] = str(count)
+        self.write_head(writer, status, response_headers, keep_alive)
+        if method == 'HEAD' or count == 0:
+            await writer.drain()
+            return status
+
+        if entry.size < SENDFILE_THRESHOLD:
+            body = self.files.body(entry)
+            writer.write(body if status == 200 else body[start:end + 1])
+            await writer.drain()
+        else:
+            await writer.drain()
+            with open(entry.path, 'rb') as f:
+                await asyncio.get_running_loop().sendfile(writer.transport, f, start, count)
+        return status
+
+    @staticmethod
+    def not_modified(headers, etag, entry):
+        if 'if-none-match' in headers:
+            return etag_matches(headers['if-none-match'], etag)
+        since = headers.get('if-modified-since')
+        if since:
+            try:
+                return int(parsedate_to_datetime(since).timestamp()) >= entry.stamp[0] // 10 ** 9
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def range_applies(headers, etag, entry):
+        """If-Range 与当前版本不一致时忽略 Range，返回完整文件"""
+        if_range = headers.get('if-range')
+        if not if_range:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        return if_range == entry.last_modified
+
+    @staticmethod
+    def write_head(writer, status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Date: {formatdate(usegmt=True)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+    async def send_json(self, writer, method, result, keep_alive):
+        """接口结果在内存中计算，不缓存也不做条件请求"""
+        status, payload = result
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(body)),
+                   'Cache-Control': 'no-store'}
+        self.write_head(writer, status, headers, keep_alive)
+        if method != 'HEAD':
+            writer.write(body)
+        await writer.drain()
+        return status
+
+    async def send_error(self, writer, status, keep_alive=False, close=False, extra=None):
+        body = f"{status} {REASONS[status]}\n".encode()
+        headers = {'Content-Type': 'text/plain; charset=utf-8', 'Content-Length': str(len(body))}
+        headers.update(extra or {})
+        self.write_head(writer, status, headers, keep_alive and not close)
+        writer.write(body)
+        await writer.drain()
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES,
+                                          reuse_address=True)
+
+
+def precompress(root, force=False):
+    """
+    为可压缩的文本文件生成 .gz（安装了 brotli 时同时生成 .br）副本，原文件更新后重新生成。
+    返回写入的副本数
+    """
+    written = 0
+    for current, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+        for name in names:
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(current, name)
+            stat = os.stat(path)
+            if stat.st_size < MIN_COMPRESS_SIZE:
+                continue
+            data = None
+            for encoding, suffix in ENCODINGS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                target = path + suffix
+                if not force and os.path.exists(target) and os.stat(target).st_mtime_ns >= stat.st_mtime_ns:
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                # 压缩后没有变小的文件不保留副本
+                if len(compressed) >= len(data):
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+    return written
+
+
+async def serve_forever(server_app, host, port):
+    server = await server_app.start(host, port)
+    addresses = ', '.join(f"http://{sock.getsockname()[0]}:{sock.getsockname()[1]}/"
+                          for sock in server.sockets)
+    print(f"静态服务器已启动: {addresses}（根目录 {server_app.root}）")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='以项目根目录为根的本地静态服务器')
+    parser.add_argument('--root', default=PROJECT_ROOT, help='项目根目录')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    parser.add_argument('--precompress', action='store_true',
+                        help='启动前为文本文件生成 .gz/.br 预压缩副本')
+    parser.add_argument('--access-log', action='store_true', help='逐个请求打印访问日志')
+    args = parser.parse_args()
+
+    if args.precompress:
+        written = precompress(args.root)
+        print(f"生成预压缩副本 {written} 个" + ('' if brotli else '（未安装 brotli，只生成 .gz）'))
+
+    app = StaticServer(args.root, access_log=args.access_log)
+    if uvloop is not None:
+        uvloop.install()
+    try:
+        asyncio.run(serve_forever(app, args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\n已停止，共处理 {app.requests} 个请求")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import threading
+import contextlib
+from urllib.parse import urlparse
+
+# 报告中列出的最慢主机与文件数量
+TOP_COUNT = 10
+
+
+class RunStats:
+    """
+    一次运行的计时与计数：各阶段耗时、文件与链接计数、按主机统计的请求，以及最慢的文件。
+    下载线程与主线程同时写入，所有方法线程安全
+    """
+
+    def __init__(self, name, quiet=False):
+        self.name = name
+        self.quiet = quiet
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.hosts = {}
+        self.files = {}
+
+    def log(self, *args, **kwargs):
+        """逐文件、逐链接的进度输出，安静模式下丢弃"""
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """累计一个阶段的墙钟时间，同名阶段多次进入时相加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _host(self, url):
+        host = urlparse(url).netloc or '(local)'
+        entry = self.hosts.get(host)
+        if entry is None:
+            entry = self.hosts[host] = {'requests': 0, 'seconds': 0.0, 'bytes': 0, 'errors': 0}
+        return entry
+
+    def record_request(self, method, url, seconds, error=False):
+        """记录一次 HTTP 请求（含重试中的每一次）"""
+        with self._lock:
+            key = f"{method.lower()}Requests"
+            self.counters[key] = self.counters.get(key, 0) + 1
+            entry = self._host(url)
+            entry['requests'] += 1
+            entry['seconds'] += seconds
+            if error:
+                entry['errors'] += 1
+
+    def record_bytes(self, url, amount, seconds=0.0):
+        """记录流式下载的正文字节数；正文传输时间计入该主机的耗时"""
+        with self._lock:
+            self.counters['bytesDownloaded'] = self.counters.get('bytesDownloaded', 0) + amount
+            entry = self._host(url)
+            entry['bytes'] += amount
+            entry['seconds'] += seconds
+
+    def record_file(self, path, seconds):
+        """累计单个文件的处理时间（扫描与改写分别调用时相加）"""
+        with self._lock:
+            self.files[path] = self.files.get(path, 0.0) + seconds
+
+    def to_dict(self, top=TOP_COUNT):
+        with self._lock:
+            hosts = sorted(self.hosts.items(), key=lambda item: -item[1]['seconds'])[:top]
+            files = sorted(self.files.items(), key=lambda item: -item[1])[:top]
+            return {
+                'name': self.name,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'seconds': round(time.perf_counter() - self._start, 4),
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'counters': dict(sorted(self.counters.items())),
+                'slowestHosts': [{'host': host, **entry, 'seconds': round(entry['seconds'], 4)}
+                                 for host, entry in hosts],
+                'slowestFiles': [{'path': path, 'seconds': round(seconds, 4)} for path, seconds in files],
+            }
+
+    def write(self, path):
+        report = self.to_dict()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+    def summary(self):
+        """一行阶段耗时加一行主要计数，供脚本结束时打印"""
+        report = self.to_dict(top=3)
+        stages = '，'.join(f"{name} {seconds:.2f}s" for name, seconds in report['stages'].items())
+        counters = '，'.join(f"{name} {value}" for name, value in report['counters'].items())
+        lines = [f"耗时 {report['seconds']:.2f}s（{stages}）", f"计数: {counters}"]
+        if report['slowestHosts']:
+            lines.append('最慢主机: ' + '，'.join(f"{h['host']} {h['seconds']:.2f}s/{h['requests']}次"
+                                              for h in report['slowestHosts']))
+        return '\n'.join(lines)
+
+
+_current = RunStats('default')
+_current_lock = threading.Lock()
+
+
+def get_stats():
+    """当前运行的统计对象；脚本未设置时为默认的非安静实例"""
+    return _current
+
+
+def set_stats(stats):
+    global _current
+    with _current_lock:
+        _current = stats
+    return stats
+
+
+def log(*args, **kwargs):
+    _current.log(*args, **kwargs)
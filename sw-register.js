@@ -0,0 +1,8 @@
+// 注册离线缓存（sw.js），清单由 precache.py 生成
+if ('serviceWorker' in navigator && location.protocol.startsWith('http')) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.warn('离线缓存注册失败:', error);
+        });
+    });
+}
@@ -0,0 +1,121 @@
+// 离线缓存：由 precache.py 生成的 precache-manifest.json 驱动
+// 每个清单版本一个缓存，内容哈希未变的文件从旧版本复制，只下载变化的文件；
+// 页面请求里的 cacheBuster 参数会被忽略，同一版本内直接使用缓存
+const MANIFEST_URL = '/precache-manifest.json';
+const CACHE_PREFIX = 'precache-v-';
+const META_CACHE = 'precache-meta';
+const FETCH_CONCURRENCY = 8;
+// 打开页面时最多每分钟检查一次清单是否更新
+const UPDATE_INTERVAL = 60 * 1000;
+
+let current = null;
+let lastCheck = 0;
+let updating = null;
+
+function cacheName(version) {
+    return CACHE_PREFIX + version;
+}
+
+function isLazy(manifest, path) {
+    return manifest.lazy.some(prefix => path.startsWith(prefix));
+}
+
+async function fetchManifest() {
+    const response = await fetch(MANIFEST_URL, { cache: 'no-cache' });
+    if (!response.ok) throw new Error(`预缓存清单加载失败: ${response.status}`);
+    return response.json();
+}
+
+async function loadCurrent() {
+    if (current) return current;
+    const meta = await caches.open(META_CACHE);
+    const stored = await meta.match(MANIFEST_URL);
+    current = stored ? await stored.json() : null;
+    return current;
+}
+
+async function install(manifest) {
+    const previous = await loadCurrent();
+    if (previous && previous.version === manifest.version) return;
+    const target = await caches.open(cacheName(manifest.version));
+    const old = previous ? await caches.open(cacheName(previous.version)) : null;
+    const paths = Object.keys(manifest.files);
+    let index = 0;
+
+    async function worker() {
+        while (index < paths.length) {
+            const path = paths[index++];
+            // 上次安装中断时已写入的文件
+            if (await target.match(path)) continue;
+            const before = previous && previous.files[path];
+            if (before && before[0] === manifest.files[path][0]) {
+                const cached = await old.match(path);
+                if (cached) {
+                    await target.put(path, cached);
+                    continue;
+                }
+            }
+            if (isLazy(manifest, path)) continue;
+            const response = await fetch(path, { cache: 'no-cache' });
+            if (!response.ok) throw new Error(`${path} 下载失败: ${response.status}`);
+            await target.put(path, response);
+        }
+    }
+
+    await Promise.all(Array.from({ length: FETCH_CONCURRENCY }, worker));
+    // 新版本的文件全部就绪后才切换，旧版本缓存随后删除
+    const meta = await caches.open(META_CACHE);
+    await meta.put(MANIFEST_URL, new Response(JSON.stringify(manifest), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+    current = manifest;
+    const names = await caches.keys();
+    await Promise.all(names
+        .filter(name => name.startsWith(CACHE_PREFIX) && name !== cacheName(manifest.version))
+        .map(name => caches.delete(name)));
+}
+
+function checkForUpdate(force = false) {
+    if (updating) return updating;
+    if (!force && Date.now() - lastCheck < UPDATE_INTERVAL) return Promise.resolve();
+    lastCheck = Date.now();
+    updating = fetchManifest()
+        .then(install)
+        .catch(error => console.warn('离线缓存更新失败:', error))
+        .finally(() => { updating = null; });
+    return updating;
+}
+
+async function respond(request, path) {
+    const manifest = await loadCurrent();
+    if (!manifest || !manifest.files[path]) return fetch(request);
+    const cache = await caches.open(cacheName(manifest.version));
+    const cached = await cache.match(path);
+    if (cached) return cached;
+    const response = await fetch(path);
+    if (response.ok) await cache.put(path, response.clone());
+    return response;
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(fetchManifest().then(install).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('message', event => {
+    if (event.data === 'precache-update') event.waitUntil(checkForUpdate(true));
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET' || request.headers.has('range')) return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+    const path = url.pathname.endsWith('/') ? url.pathname + 'index.html' : url.pathname;
+    if (path === MANIFEST_URL) return;
+    if (request.mode === 'navigate') event.waitUntil(checkForUpdate());
+    event.respondWith(respond(request, path));
+});
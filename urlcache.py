@@ -0,0 +1,158 @@
+import os
+import time
+import sqlite3
+import threading
+
+from assetstore import store_file
+from fetcher import sniff_extension, extension_from_content_type
+from stats import get_stats
+
+CACHE_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS urls (
+    scope TEXT NOT NULL,
+    url TEXT NOT NULL,
+    local_path TEXT NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER,
+    fetched_at REAL,
+    PRIMARY KEY (scope, url)
+)
+'''
+FIELDS = ('local_path', 'content_type', 'etag', 'last_modified', 'size', 'fetched_at')
+
+
+def default_cache_path(root):
+    """与增量清单一样放在 .cache 目录下，replace 与 replaceimg 共用"""
+    return os.path.join(root, '.cache', 'urlcache.sqlite')
+
+
+class UrlCache:
+    """
+    持久化的 链接 → {本地路径, Content-Type, ETag, Last-Modified, 大小} 映射。
+    scope 区分保存目录（resource / img），同一链接在两个脚本中各有一份本地文件。
+    下载线程会并发读写，连接共享并由锁保护
+    """
+
+    def __init__(self, path, refresh=False):
+        self.path = path
+        # refresh 时已缓存的链接也要向服务端确认，用条件请求避免重复下载
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+            self._db.execute('DROP TABLE IF EXISTS urls')
+            self._db.execute(f'PRAGMA user_version={CACHE_VERSION}')
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+    def get(self, scope, url):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(FIELDS)} FROM urls WHERE scope = ? AND url = ?",
+                (scope, url)).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def lookup(self, scope, url, folder):
+        """本地文件仍在时返回缓存记录，不访问网络"""
+        entry = self.get(scope, url)
+        if entry is None:
+            return None
+        if not os.path.exists(os.path.join(folder, os.path.basename(entry['local_path']))):
+            return None
+        return entry
+
+    def put(self, scope, url, local_path, headers, size):
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (scope, url, local_path, headers.get('content-type'), headers.get('etag'),
+                 headers.get('last-modified'), size, time.time()))
+            self._db.commit()
+
+    def touch(self, scope, url):
+        with self._lock:
+            self._db.execute('UPDATE urls SET fetched_at = ? WHERE scope = ? AND url = ?',
+                             (time.time(), scope, url))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def validator_headers(entry):
+    """条件请求头：有 ETag 时优先使用 If-None-Match"""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def get_url_cache():
+    """当前运行使用的链接缓存，脚本未设置时为 None（不缓存）"""
+    return _current
+
+
+def set_url_cache(cache):
+    global _current
+    with _current_lock:
+        _current = cache
+    return cache
+
+
+def cached_local_path(scope, url, folder):
+    """
+    不访问网络就能确定本地路径时返回该路径：缓存命中且文件存在，并且没有要求刷新
+    """
+    cache = get_url_cache()
+    if cache is None or cache.refresh:
+        return None
+    entry = cache.lookup(scope, url, folder)
+    if entry is None:
+        return None
+    get_stats().incr('urlCacheHits')
+    return entry['local_path']
+
+
+def fetch_and_store(url, folder, scope, prefix, temp_path, fetcher, fallback_extension):
+    """
+    下载到 temp_path 后按内容哈希存入 folder，返回 (本地路径, 下载字节数)，304 时字节数为 None。
+    temp_path 没有扩展名时根据 GET 响应的文件头判断类型，其次看 Content-Type，不再需要 HEAD。
+    刷新模式下对已缓存的链接发条件请求，304 时直接沿用本地文件
+    """
+    cache = get_url_cache()
+    entry = cache.lookup(scope, url, folder) if cache is not None else None
+    headers = validator_headers(entry) if entry is not None else None
+
+    size, response_headers = fetcher.download(url, temp_path, headers=headers)
+    if size is None:
+        get_stats().incr('revalidated')
+        cache.touch(scope, url)
+        return entry['local_path'], None
+
+    if not os.path.splitext(temp_path)[1]:
+        extension = (sniff_extension(temp_path)
+                     or extension_from_content_type(response_headers.get('content-type'))
+                     or fallback_extension)
+        os.replace(temp_path, temp_path + extension)
+        temp_path += extension
+    local_path = prefix + store_file(temp_path, folder)
+    if cache is not None:
+        cache.put(scope, url, local_path, response_headers, size)
+    return local_path, size
@@ -0,0 +1,339 @@
+import os
+import sys
+import math
+import asyncio
+import argparse
+import functools
+import threading
+
+import numpy as np
+
+from poolrepo import get_repository
+from server import StaticServer, serve_forever
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+API_PATH = '/api/whatif'
+
+DEFAULT_PULL_COST = 96
+DEFAULT_HORIZON = 10
+MAX_HORIZON = 10000
+# 没有硬保底时按剩余概率低于该值截断，之后的尾部按几何分布求和
+SURVIVAL_EPSILON = 1e-12
+MAX_PULLS = 100000
+CACHE_SIZE = 65536
+PERCENTILES = (50, 90, 99)
+
+# 查询的稀有度 → 影响它的保底计数（按 V1 判定顺序，高稀有度会覆盖低稀有度）
+RARITY_PITY = {'S': ('gold',), 'A': ('gold', 'purple'), 'B': ('gold', 'purple', 'blue')}
+PITY_KEYS = {'S': 'gold', 'A': 'purple', 'B': 'blue'}
+
+
+class QueryError(ValueError):
+    """查询参数无效"""
+
+
+def hazard_table(values, cap):
+    """
+    与 exactdist 的单抽语义相同：table[k-1] 为计数为 k 时的概率，超出长度取最后一个值；
+    有保底时计数达到 cap 仍未出货，下一抽由保底队列必出
+    """
+    table = np.clip(np.asarray(values or [0.0], dtype=np.float64), 0.0, 1.0)
+    if cap:
+        if len(table) < cap + 1:
+            table = np.concatenate([table, np.full(cap + 1 - len(table), table[-1])])
+        table = table[:cap + 1].copy()
+        table[-1] = 1.0
+    return table
+
+
+def _at(table, pity):
+    """计数 pity 之后的下一抽的概率"""
+    return table[np.minimum(pity, len(table) - 1)]
+
+
+class PoolTables:
+    """单个 V1 奖池的概率表与价格"""
+
+    def __init__(self, pool):
+        config = pool.config
+        probabilities = pool.probabilities
+        pity = config.get('pitySettings') or {}
+        self.pool_id = pool.id
+        self.has_gold = config.get('diff_A', 2) != 3
+        self.tables = {
+            'S': hazard_table(probabilities.get('S'), pity.get('gold', 250)) if self.has_gold
+            else np.zeros(1),
+            'A': hazard_table(probabilities.get('A'), pity.get('purple', 60)),
+            'B': hazard_table(probabilities.get('B'), pity.get('blue', 10)),
+        }
+        self.pull_cost = int(pool.entry['cost']) if pool.entry.get('cost') else DEFAULT_PULL_COST
+        self.cost_type = pool.entry.get('cost_type') or 'inspiration'
+        self.discounts = [(d.get('rate', 1.0), d.get('chance', 0.0))
+                          for d in config.get('discounts') or []]
+
+    def ten_pull_prices(self):
+        """
+        首次十连（假设当前没有折扣）与之后每次十连的期望价格。
+        每次十连会用掉持有的折扣，结束后重新判定，所以之后每次的折扣分布相同
+        """
+        full = self.pull_cost * 10
+        remaining = 1.0
+        later = 0.0
+        for rate, chance in self.discounts:
+            hit = remaining * chance
+            later += hit * math.floor(full * rate + 0.5)
+            remaining -= hit
+        return full, later + remaining * full
+
+
+def survival_top(table, pity, length):
+    """
+    最高稀有度不受其他计数影响：从计数 pity 起连续 length 抽都未出货的概率，
+    survival[k] 为 k 抽后仍未出货的概率，由后缀上的 (1 - p) 连乘一次向量化得到
+    """
+    terms = _at(table, pity + np.arange(length))
+    return np.concatenate([[1.0], np.cumprod(1.0 - terms)])
+
+
+def survival_joint(tables, rarity, pity, length):
+    """
+    低稀有度会被同一抽中更高的稀有度覆盖，按更高稀有度计数的分布向前递推。
+    状态只需保存到概率表末尾，之后的计数概率相同可以合并
+    """
+    s_table, a_table, b_table = tables['S'], tables['A'], tables['B']
+    n_s = len(s_table)
+    survival = np.empty(length + 1)
+    survival[0] = 1.0
+    if rarity == 'A':
+        mass = np.zeros(n_s)
+        mass[min(pity['gold'], n_s - 1)] = 1.0
+        for k in range(length):
+            hit_s = s_table
+            hit_a = (1.0 - hit_s) * _at(a_table, pity['purple'] + k)
+            moved = mass * (1.0 - hit_s - hit_a)
+            reset = (mass * hit_s).sum()
+            mass = np.empty(n_s)
+            mass[0] = reset
+            mass[1:] = moved[:-1]
+            mass[-1] += moved[-1]
+            survival[k + 1] = mass.sum()
+            if survival[k + 1] < SURVIVAL_EPSILON:
+                return survival[:k + 2]
+        return survival
+
+    n_a = len(a_table)
+    mass = np.zeros((n_s, n_a))
+    mass[min(pity['gold'], n_s - 1), min(pity['purple'], n_a - 1)] = 1.0
+    not_s = (1.0 - s_table)[:, None]
+    for k in range(length):
+        hit_b = _at(b_table, pity['blue'] + k)
+        to_s = mass * s_table[:, None]
+        to_a = mass * not_s * a_table[None, :]
+        rest = mass * not_s * (1.0 - a_table[None, :]) * (1.0 - hit_b)
+        mass = np.zeros((n_s, n_a))
+        # 出稀世：稀世计数归零，奇珍计数加一
+        column = to_s.sum(axis=0)
+        mass[0, 1:] += column[:-1]
+        mass[0, -1] += column[-1]
+        # 出奇珍：奇珍计数归零，稀世计数加一
+        row = to_a.sum(axis=1)
+        mass[1:, 0] += row[:-1]
+        mass[-1, 0] += row[-1]
+        # 都未出：两个计数都加一
+        mass[1:, 1:] += rest[:-1, :-1]
+        mass[-1, 1:] += rest[-1, :-1]
+        mass[1:, -1] += rest[:-1, -1]
+        mass[-1, -1] += rest[-1, -1]
+        survival[k + 1] = mass.sum()
+        if survival[k + 1] < SURVIVAL_EPSILON:
+            return survival[:k + 2]
+    return survival
+
+
+class WhatIf:
+    """
+    给定保底计数的条件查询：接下来 horizon 抽内出货的概率，以及到下一次出货的期望抽数与花费。
+    概率与期望按单抽语义精确计算；expectedSpendTen（一直十连时的期望花费）只是近似，
+    它按单抽的出货分布在每 10 抽处取值，没有模拟十连开始时建立保底队列的规则，
+    输出中以 expectedSpendTenApprox 标明。
+    结果按 (奖池, 稀有度, 相关保底计数, horizon) 缓存在 LRU 中
+    """
+
+    def __init__(self, root=PROJECT_ROOT, cache_size=CACHE_SIZE):
+        self.repo = get_repository(root)
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._query)
+
+    def tables(self, pool_id):
+        with self._lock:
+            tables = self._tables.get(pool_id)
+            if tables is None:
+                # 只接受 more/list.json 中的 ID，其余（包括 ../XYZT/term1 这类路径）一律视为不存在
+                if pool_id not in self.repo.ids():
+                    raise KeyError(pool_id)
+                entry = self.repo.entry(pool_id)
+                if (entry.get('version') or 'V1.html') != 'V1.html':
+                    raise QueryError(f"{pool_id} 是 V2 奖池，保底在排位珍宝之间共享，请使用 ranksim")
+                try:
+                    tables = PoolTables(self.repo.get(pool_id))
+                except FileNotFoundError:
+                    # 缺少 pool.json 或 possibility.json
+                    raise KeyError(pool_id) from None
+                self._tables[pool_id] = tables
+            return tables
+
+    def query(self, pool_id, rarity='S', gold=0, purple=0, blue=0, horizon=DEFAULT_HORIZON):
+        """Python 接口；返回的字典来自缓存，调用方不应修改"""
+        if rarity not in RARITY_PITY:
+            raise QueryError(f"不支持的稀有度: {rarity}")
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise QueryError(f"horizon 应在 1 到 {MAX_HORIZON} 之间")
+        counters = {'gold': gold, 'purple': purple, 'blue': blue}
+        if any(value < 0 for value in counters.values()):
+            raise QueryError("保底计数不能为负数")
+        # 只有影响该稀有度的计数进入缓存键
+        pity = tuple(counters[key] for key in RARITY_PITY[rarity])
+        return self._cached(pool_id, rarity, pity, horizon)
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def _query(self, pool_id, rarity, pity, horizon):
+        tables = self.tables(pool_id)
+        if rarity == 'S' and not tables.has_gold:
+            raise QueryError(f"{pool_id} 不包含稀世抽取 (diff_A=3)")
+        pity = dict(zip(RARITY_PITY[rarity], pity))
+        survival, tail = self._survival(tables, rarity, pity, horizon)
+
+        expected_pulls = survival[:-1].sum() + (survival[-1] / tail if tail else 0.0)
+        # 近似值：沿用单抽语义的 survival，只在每 10 抽处取值。实际十连的保底队列在开始时建立，
+        # 本次中途达到保底不会立即触发，排队的低稀有度保底也会占掉抽数；折扣价格按十连结算
+        first, later = tables.ten_pull_prices()
+        sessions = survival[10:-1:10]
+        spent_ten = first + later * sessions.sum()
+        if tail:
+            # 尾部为几何分布：剩余的十连次数按等比数列求和
+            last = (len(survival) - 1 + 9) // 10 * 10
+            remaining = survival[-1] * (1.0 - tail) ** (last - (len(survival) - 1))
+            spent_ten += later * remaining / (1.0 - (1.0 - tail) ** 10)
+        cdf = 1.0 - survival[1:horizon + 1]
+        if len(cdf) < horizon:
+            cdf = np.concatenate([cdf, np.full(horizon - len(cdf), 1.0 if not tail else np.nan)])
+            if tail:
+                k = np.arange(len(survival), horizon + 1)
+                cdf[len(survival) - 1:] = 1.0 - survival[-1] * (1.0 - tail) ** (k - len(survival) + 1)
+
+        result = {
+            'pool': pool_id,
+            'rarity': rarity,
+            'pity': pity,
+            'horizon': horizon,
+            'probability': round(float(cdf[-1]), 8),
+            'curve': np.round(cdf, 6).tolist(),
+            'expectedPulls': round(float(expected_pulls), 4),
+            'expectedSpend': round(float(expected_pulls * tables.pull_cost), 2),
+            'expectedSpendTen': round(float(spent_ten), 2),
+            'expectedSpendTenApprox': True,
+            'costType': tables.cost_type,
+        }
+        full_cdf = 1.0 - survival
+        for q in PERCENTILES:
+            index = int(np.searchsorted(full_cdf, q / 100 - 1e-12))
+            result[f'p{q}'] = index if index < len(survival) else None
+        return result
+
+    @staticmethod
+    def _survival(tables, rarity, pity, horizon):
+        """返回 (survival 数组, 截断后尾部的恒定概率；已截断到 0 时为 0)"""
+        key = PITY_KEYS[rarity]
+        table = tables.tables[rarity]
+        capped = table[-1] >= 1.0
+        if rarity == 'S':
+            length = max(len(table) - min(pity['gold'], len(table) - 1), 1)
+            if not capped and table[-1] > 0:
+                length += int(math.ceil(math.log(SURVIVAL_EPSILON) / math.log1p(-table[-1])))
+            length = min(max(length, horizon), MAX_PULLS)
+            survival = survival_top(table, pity[key], length)
+        else:
+            survival = survival_joint(tables.tables, rarity, pity, max(horizon, MAX_PULLS if not capped
+                                                                        else horizon + len(table)))
+        if survival[-1] < SURVIVAL_EPSILON or capped:
+            return survival, 0.0
+        if table[-1] <= 0:
+            raise QueryError(f"{tables.pool_id} 的 {rarity} 概率为 0，无法出货")
+        return survival, float(table[-1])
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_whatif():
+    """进程内共享的查询实例"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = WhatIf()
+        return _default
+
+
+def handle_request(params, whatif=None):
+    """HTTP 接口：GET /api/whatif?pool=S41E1&rarity=S&gold=137&horizon=20"""
+    whatif = whatif or get_whatif()
+    if 'pool' not in params:
+        return 400, {'error': '缺少 pool 参数'}
+    try:
+        kwargs = {key: int(params[key]) for key in ('gold', 'purple', 'blue', 'horizon') if key in params}
+    except ValueError:
+        return 400, {'error': '保底计数与 horizon 必须为整数'}
+    try:
+        return 200, whatif.query(params['pool'], params.get('rarity', 'S'), **kwargs)
+    except KeyError:
+        return 404, {'error': f"奖池不存在: {params['pool']}"}
+    except QueryError as e:
+        return 400, {'error': str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='V1 精华的保底条件查询：接下来若干抽内出货的概率与期望花费')
+    parser.add_argument('pool_id', nargs='?', help='pools/ 下的奖池 ID，例如 S41E1')
+    parser.add_argument('--rarity', default='S', choices=list(RARITY_PITY), help='目标稀有度')
+    parser.add_argument('--gold', type=int, default=0, help='距上次稀世的抽数 (pityGold)')
+    parser.add_argument('--purple', type=int, default=0, help='距上次奇珍的抽数 (pityPurple)')
+    parser.add_argument('--blue', type=int, default=0, help='距上次独特的抽数 (pityBlue)')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='接下来的抽数')
+    parser.add_argument('--serve', action='store_true', help=f'启动本地服务，提供 {API_PATH} 接口与静态文件')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    args = parser.parse_args()
+
+    whatif = get_whatif()
+    if args.serve:
+        app = StaticServer(PROJECT_ROOT)
+        app.add_route(API_PATH, lambda params: handle_request(params, whatif))
+        try:
+            asyncio.run(serve_forever(app, args.host, args.port))
+        except KeyboardInterrupt:
+            print(f"\n已停止，缓存: {whatif.cache_info()}")
+        return 0
+
+    if not args.pool_id:
+        parser.error('需要奖池 ID，或使用 --serve 启动服务')
+    try:
+        result = whatif.query(args.pool_id, args.rarity, args.gold, args.purple, args.blue, args.horizon)
+    except (KeyError, QueryError) as e:
+        print(f"查询失败: {e}")
+        return 1
+    pity = '，'.join(f"{key}={value}" for key, value in result['pity'].items())
+    print(f"奖池: {result['pool']}，目标: {result['rarity']}，当前计数: {pity}")
+    print(f"接下来 {result['horizon']} 抽内出货概率: {result['probability'] * 100:.4f}%")
+    print(f"到下一次出货的期望抽数: {result['expectedPulls']:.2f}")
+    print(f"期望花费({result['costType']}): 单抽 {result['expectedSpend']:.0f}，十连约 {result['expectedSpendTen']:.0f}（近似）")
+    print('分位数: ' + '，'.join(f"P{q}={result[f'p{q}']}" for q in PERCENTILES))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import time
+
+import numpy as np
+
+from collection import PERCENTILES, chunk_seed, rounded_summary
+from engine import get_item_key
+from manifest import Manifest, default_manifest_path
+from poolrepo import SOURCES, get_repository
+from sampler import AliasTable, UnownedSampler
+
+# 使用相对路径定位
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'more', 'xyzt.json')
+TABLE_CACHE_DIR = os.path.join('.cache', 'xyzt')
+
+# 编译规则变化时递增，旧的缓存表随之失效
+COMPILER_VERSION = 1
+DEFAULT_PULL_COST = 35
+DEFAULT_PLAYERS = 100000
+DEFAULT_SEED = 0
+MAX_SESSIONS = 100000
+
+
+class TermTable:
+    """
+    一期幸运之骰编译后的抽取表。xingyunzhitou.html 先按层级概率选层级、再按权重选物品，
+    两步合并为物品上的一个分布后只需一张别名表，每抽一次查表即可
+    """
+
+    FIELDS = ('prob', 'alias', 'key_ids', 'repeat', 'limit', 'conversion_rate')
+
+    def __init__(self, prob, alias, key_ids, repeat, limit, conversion_rate):
+        self.sampler = AliasTable(prob, alias)
+        self.key_ids = np.asarray(key_ids, dtype=np.int64)
+        self.repeat = np.asarray(repeat, dtype=np.int64)
+        self.limit = int(limit)
+        # fragmentsInfo.conversionRate，页面中没有使用，原样输出供参考
+        self.conversion_rate = float(conversion_rate)
+
+    @property
+    def n_items(self):
+        return len(self.key_ids)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, prob=self.sampler.prob, alias=self.sampler.alias, key_ids=self.key_ids,
+                 repeat=self.repeat, limit=np.int64(self.limit),
+                 conversion_rate=np.float64(self.conversion_rate))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(*(data[field] for field in cls.FIELDS))
+
+
+def item_weights(items, tiers):
+    """
+    按页面的 selectItemFromTiers 计算每个物品的最终概率：
+    累计概率超过 1 的部分不会被抽到，不足 1 的部分以及找不到物品的层级走 selectRandomItemFallback（整个池子等概率）
+    """
+    index = {item.name: i for i, item in enumerate(items)}
+    weights = np.zeros(len(items))
+    fallback = 0.0
+    cumulative = 0.0
+    for tier in tiers:
+        start = min(cumulative, 1.0)
+        cumulative += tier.get('probability') or 0
+        mass = min(cumulative, 1.0) - start
+        if mass <= 0:
+            continue
+        tier_items = tier.get('items') or []
+        if not tier_items:
+            fallback += mass
+            continue
+        # 页面中权重为 0 时按 1.0 处理（weight || 1.0）
+        tier_weights = [entry.get('weight') or 1.0 for entry in tier_items]
+        total = sum(tier_weights)
+        first = index.get(tier_items[0].get('name'))
+        for j, weight in enumerate(tier_weights):
+            # 命中的名字不在 items 中时，继续向后找第一个存在的物品，都没有时取层级第一个物品
+            target = next((index[e.get('name')] for e in tier_items[j:] if e.get('name') in index), first)
+            if target is None:
+                fallback += mass * weight / total
+            else:
+                weights[target] += mass * weight / total
+    fallback += max(1.0 - cumulative, 0.0)
+    if fallback > 0 and len(items):
+        weights += fallback / len(items)
+    return weights
+
+
+def compile_term(pool):
+    items = list(pool.items)
+    keys = {}
+    key_ids = [keys.setdefault(get_item_key(item), len(keys)) for item in items]
+    weights = item_weights(items, pool.probabilities.get('tiers') or [])
+    alias = AliasTable.from_weights(weights)
+    return TermTable(alias.prob, alias.alias, key_ids, [item.repeat or 0 for item in items],
+                     pool.config.get('completeDrawLimit') or 0,
+                     (pool.config.get('fragmentsInfo') or {}).get('conversionRate') or 0)
+
+
+class TableCache:
+    """
+    按 pool.json 与 possibility.json 的内容哈希缓存编译结果。
+    文件大小与修改时间未变时直接使用清单中的哈希，不需要读取或解析 JSON
+    """
+
+    def __init__(self, root=PROJECT_ROOT):
+        self.root = root
+        self.repo = get_repository(root)
+        self.manifest = Manifest(default_manifest_path(root, 'xyzt'), root)
+        self.hits = 0
+        self.misses = 0
+
+    def file_hash(self, path):
+        if not self.manifest.is_clean(path):
+            with open(path, 'rb') as f:
+                self.manifest.record(path, f.read(), False)
+        return self.manifest.entries[self.manifest.key(path)]['hash']
+
+    def get(self, term_id):
+        term_dir = os.path.join(self.root, SOURCES['xyzt'][0], term_id)
+        digest = hashlib.sha1(f"{COMPILER_VERSION}".encode())
+        for name in ('pool.json', 'possibility.json'):
+            digest.update(self.file_hash(os.path.join(term_dir, name)).encode())
+        path = os.path.join(self.root, TABLE_CACHE_DIR, f"{digest.hexdigest()}.npz")
+        try:
+            table = TermTable.load(path)
+            self.hits += 1
+            return table
+        except (OSError, KeyError, ValueError):
+            pass
+        table = compile_term(self.repo.get(term_id, 'xyzt'))
+        table.save(path)
+        self.misses += 1
+        return table
+
+    def save(self):
+        self.manifest.save()
+
+
+class DiceEngine:
+    """
+    批量推进大量互相独立的玩家直到集齐一期的全部物品。
+    累计抽数达到 completeDrawLimit 后每抽必出未拥有的物品，重复物品按 repeat 转换为碎片
+    """
+
+    def __init__(self, table, n_players, pull_cost=DEFAULT_PULL_COST, seed=None):
+        self.table = table
+        self.n = n_players
+        self.pull_cost = pull_cost
+        self.rng = np.random.default_rng(seed)
+        self.player_ids = np.arange(n_players)
+        self.total = np.zeros(n_players, dtype=np.int64)
+        self.spent = np.zeros(n_players, dtype=np.int64)
+        self.fragments = np.zeros(n_players, dtype=np.int64)
+        self.owned = UnownedSampler(n_players, table.key_ids)
+
+    def compress(self, keep):
+        for field in ('player_ids', 'total', 'spent', 'fragments'):
+            setattr(self, field, getattr(self, field)[keep])
+        self.owned.take(keep)
+        self.n = len(self.player_ids)
+
+    def session(self, count=10):
+        table = self.table
+        players = np.arange(self.n)
+        self.spent += self.pull_cost * count
+        for _ in range(count):
+            self.total += 1
+            u = self.rng.random((2, self.n))
+            items = table.sampler.pick(u[0], u[1])
+            if table.limit:
+                forced = np.flatnonzero((self.total >= table.limit) & (self.owned.count > 0))
+                if len(forced):
+                    items[forced] = self.owned.pick(forced, u[0][forced])
+            repeat = self.owned.add(players, table.key_ids[items])
+            self.fragments[repeat] += table.repeat[items[repeat]]
+
+    def run(self, count=10, max_sessions=MAX_SESSIONS):
+        """返回每名玩家集齐时的 (抽数, 花费, 碎片)；集齐时所在的十连照常付费，其中的重复同样计入"""
+        n_total = self.n
+        pulls = np.zeros(n_total, dtype=np.int64)
+        spent = np.zeros(n_total, dtype=np.int64)
+        fragments = np.zeros(n_total, dtype=np.int64)
+        for _ in range(max_sessions):
+            if self.n == 0:
+                break
+            self.session(count)
+            done = self.owned.complete()
+            if done.any():
+                ids = self.player_ids[done]
+                pulls[ids] = self.total[done]
+                spent[ids] = self.spent[done]
+                fragments[ids] = self.fragments[done]
+                self.compress(~done)
+        if self.n:
+            raise RuntimeError(f"{self.n} 名玩家在 {max_sessions} 次抽取内未集齐")
+        return pulls, spent, fragments
+
+
+def build_table(root=PROJECT_ROOT, players=DEFAULT_PLAYERS, seed=DEFAULT_SEED, count=10, only=None,
+                verbose=True):
+    repo = get_repository(root)
+    cache = TableCache(root)
+    terms = {}
+    for entry in repo.entries('xyzt'):
+        term_id = entry['id']
+        if only and term_id not in only:
+            continue
+        table = cache.get(term_id)
+        pull_cost = int(entry['cost']) if entry.get('cost') else DEFAULT_PULL_COST
+        engine = DiceEngine(table, players, pull_cost, seed=chunk_seed(seed, term_id, 0))
+        pulls, spent, fragments = engine.run(count)
+        terms[f"XYZT/{term_id}"] = {
+            'cost': pull_cost,
+            'items': int(table.key_ids.max()) + 1 if table.n_items else 0,
+            'completeDrawLimit': table.limit,
+            'conversionRate': table.conversion_rate,
+            'pulls': rounded_summary(pulls),
+            'spent': rounded_summary(spent),
+            'fragments': rounded_summary(fragments),
+            'net': rounded_summary(spent - fragments),
+        }
+        if verbose:
+            print(f"  ✓ {term_id}: 平均 {pulls.mean():.1f} 抽集齐，净花费 {(spent - fragments).mean():.0f} 碎片")
+    cache.save()
+    if verbose:
+        print(f"抽取表: {cache.hits} 个来自缓存，{cache.misses} 个重新编译")
+    return {
+        'comment': '幸运之骰每期从零开始抽取直到集齐全部物品的抽数、碎片花费、重复物品返还的碎片与净花费。',
+        'seed': seed,
+        'players': players,
+        'count': count,
+        'percentiles': list(PERCENTILES),
+        'terms': terms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='幸运之骰批量模拟：每期集齐全部物品的碎片花费')
+    parser.add_argument('terms', nargs='*', help='只模拟这些期数 ID（如 term1），默认为 XYZT/list.json 中的全部')
+    parser.add_argument('--players', type=int, default=DEFAULT_PLAYERS, help='每期模拟的玩家数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='主随机种子')
+    parser.add_argument('--count', type=int, default=10, choices=[1, 10], help='单抽或十连')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='输出 JSON 路径')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build_table(PROJECT_ROOT, args.players, args.seed, args.count, set(args.terms) or None)
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"已模拟 {len(table['terms'])} 期，每期 {args.players} 名玩家，耗时 {elapsed:.1f}s")
+    print(f"输出文件: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())